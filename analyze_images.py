@@ -0,0 +1,381 @@
+"""
+Analyze a directory or manifest of images in bulk, resuming after interruptions.
+
+Images are decoded and preprocessed on a process pool while earlier ones are
+being analyzed. Inference runs directly against Ollama (as the API would) or
+through a running API server over a pooled HTTP session; the server preprocesses
+what it receives, so in api mode the files are sent unchanged:
+
+    python analyze_images.py photos/ --output results.jsonl
+    python analyze_images.py manifest.txt --mode api --api-url http://gpu-box:8000 --concurrency 8
+    python analyze_images.py photos/ --output results.jsonl --parquet results.parquet
+
+Each result is appended to the JSONL output as soon as it is known, and a
+checkpoint file next to it records the run's settings and progress. Rerunning
+the same command skips every image that already has a successful result.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.core.settings import settings
+from app.services.batch_service import is_image_name
+from app.services.metrics import TOKENS
+from app.services.ollama_service import analyze_image_async, get_backend_pool
+from app.services.preprocess_service import preprocess_image
+
+RETRY_STATUSES = {429, 503}
+EVAL_TOKENS = re.compile(r'^clothing_tokens_total\{model="([^"]*)",phase="eval"\} (\S+)$', re.MULTILINE)
+CONTENT_TYPES = {".png": "image/png", ".webp": "image/webp", ".gif": "image/gif", ".bmp": "image/bmp"}
+
+def iter_image_paths(source: str) -> Iterator[str]:
+    """
+    Lists the images to analyze.
+
+    Args:
+        source: Directory (searched recursively) or manifest file with one image
+            path per line, relative to the manifest's directory
+
+    Returns:
+        Iterator of image paths, in a stable order
+    """
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if is_image_name(name):
+                    yield os.path.join(root, name)
+        return
+    base = os.path.dirname(source)
+    with open(source) as f:
+        for line in f:
+            path = line.strip()
+            if path and not path.startswith("#"):
+                yield os.path.join(base, path)
+
+def load_image(path: str, model: str, preprocess: bool) -> Tuple[bytes, Optional[Dict[str, Any]]]:
+    """
+    Reads and preprocesses one image; runs in a worker process.
+
+    Returns:
+        Tuple of the bytes to send and the preprocessing report (None if skipped)
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if not preprocess:
+        return data, None
+    try:
+        return preprocess_image(data, model)
+    except OSError:
+        # Let the model decide what to do with images Pillow cannot decode
+        return data, None
+
+def read_completed(output: str) -> Set[str]:
+    """
+    Collects the images that already have a successful result.
+
+    A line cut short by a crash is removed from the end of the file.
+
+    Args:
+        output: JSONL output of earlier runs
+
+    Returns:
+        Paths with a status of "ok"
+    """
+    completed: Set[str] = set()
+    if not os.path.exists(output):
+        return completed
+    valid_end = 0
+    with open(output, "rb") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            valid_end += len(line)
+            if record.get("status") == "ok":
+                completed.add(record["path"])
+    if valid_end < os.path.getsize(output):
+        with open(output, "r+b") as f:
+            f.truncate(valid_end)
+    return completed
+
+class Checkpoint:
+    """Progress of a run, saved atomically next to its output."""
+
+    def __init__(self, path: str, run: Dict[str, Any]):
+        self.path = path
+        self.run = run
+        self.state: Dict[str, Any] = {"run": run, "ok": 0, "failed": 0}
+        if os.path.exists(path):
+            with open(path) as f:
+                previous = json.load(f)
+            if previous.get("run") != run:
+                print(f"Warning: {path} was written with other settings ({previous.get('run')}); "
+                      "results of both runs are kept", file=sys.stderr)
+            self.state["ok"] = previous.get("ok", 0)
+            self.state["failed"] = previous.get("failed", 0)
+
+    def save(self, output_file) -> None:
+        # Results must be on disk before the checkpoint that counts them
+        output_file.flush()
+        os.fsync(output_file.fileno())
+        self.state["updated_at"] = time.time()
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.state, f)
+        os.replace(temp_path, self.path)
+
+class Progress:
+    """Prints images/s, tokens/s and ETA on one status line."""
+
+    def __init__(self, total: int, skipped: int):
+        self.total = total
+        self.skipped = skipped
+        self.ok = 0
+        self.failed = 0
+        self.tokens = 0.0
+        self.started = time.monotonic()
+        self._printed = 0.0
+
+    def update(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._printed < 1:
+            return
+        self._printed = now
+        elapsed = max(now - self.started, 1e-9)
+        done = self.ok + self.failed
+        rate = done / elapsed
+        remaining = self.total - done
+        eta = f"{remaining / rate / 60:.1f} min" if rate > 0 else "-"
+        tokens = f"{self.tokens / elapsed:.1f}" if self.tokens else "-"
+        print(f"\r{done}/{self.total} ({self.skipped} done before, {self.failed} failed)  "
+              f"{rate:.2f} images/s  {tokens} tokens/s  ETA {eta}   ",
+              end="", file=sys.stderr, flush=True)
+
+class DirectInference:
+    """Runs the model in this process through the same backend pool and scheduler as the API."""
+
+    def __init__(self, model: str):
+        self.model = model
+
+    async def start(self) -> None:
+        await get_backend_pool().start()
+
+    async def stop(self) -> None:
+        await get_backend_pool().stop()
+
+    async def analyze(self, path: str, data: bytes) -> Dict[str, Any]:
+        analysis = await analyze_image_async(data, self.model)
+        return analysis.model_dump()
+
+    def eval_tokens(self) -> float:
+        return TOKENS.value(self.model, "eval")
+
+class ApiInference:
+    """Sends images to a running API server over one pooled HTTP session."""
+
+    def __init__(self, model: str, api_url: str, concurrency: int, retries: int):
+        self.model = model
+        self.api_url = api_url.rstrip("/")
+        self.retries = retries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.http = ThreadPoolExecutor(concurrency)
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        self.http.shutdown()
+        self.session.close()
+
+    def _post(self, path: str, data: bytes) -> requests.Response:
+        content_type = CONTENT_TYPES.get(os.path.splitext(path)[1].lower(), "image/jpeg")
+        return self.session.post(
+            f"{self.api_url}/analyze-clothing/",
+            files={"image": (os.path.basename(path), data, content_type)},
+            data={"model": self.model},
+            timeout=settings.inference_queue_timeout + settings.inference_timeout
+        )
+
+    async def analyze(self, path: str, data: bytes) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.retries + 1):
+            try:
+                response = await loop.run_in_executor(self.http, self._post, path, data)
+            except requests.ConnectionError:
+                # The server may close a pooled connection that sat idle past its keep-alive
+                if attempt == self.retries:
+                    raise
+                continue
+            if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                break
+            # The server is shedding load; come back when it says so
+            await asyncio.sleep(float(response.headers.get("Retry-After", 2 ** attempt)))
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+        return response.json()
+
+    def eval_tokens(self) -> float:
+        # Tokens counted by the server for this model, including other clients' requests
+        try:
+            text = self.session.get(f"{self.api_url}/metrics", timeout=5).text
+        except requests.RequestException:
+            return 0.0
+        return sum(float(count) for model, count in EVAL_TOKENS.findall(text) if model == self.model)
+
+async def run(args: argparse.Namespace) -> int:
+    checkpoint_path = args.output + ".checkpoint.json"
+    # The API server preprocesses uploads itself; doing it here too would re-encode twice
+    preprocess = args.mode == "direct" and not args.no_preprocess
+    checkpoint = Checkpoint(checkpoint_path, {"source": os.path.abspath(args.source), "model": args.model,
+                                              "mode": args.mode, "preprocess": preprocess})
+    completed = read_completed(args.output)
+    paths = [path for path in iter_image_paths(args.source) if path not in completed]
+    progress = Progress(len(paths), len(completed))
+    if not paths:
+        print(f"Nothing to do: all {len(completed)} images already have results in {args.output}", file=sys.stderr)
+        return 0
+
+    if args.mode == "direct":
+        inference = DirectInference(args.model)
+    else:
+        inference = ApiInference(args.model, args.api_url, args.concurrency, args.retries)
+    loader: Executor = (ThreadPoolExecutor(args.workers) if args.thread_workers
+                        else ProcessPoolExecutor(args.workers))
+    # Bounded so preprocessing runs only a little ahead of inference
+    queue: asyncio.Queue = asyncio.Queue(maxsize=args.concurrency * 2)
+    loop = asyncio.get_running_loop()
+    tokens_at_start = 0.0
+
+    async def produce() -> None:
+        for path in paths:
+            future = loop.run_in_executor(loader, load_image, path, args.model, preprocess)
+            await queue.put((path, future))
+        for _ in range(args.concurrency):
+            await queue.put(None)
+
+    async def consume(output_file) -> None:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            path, future = item
+            started = time.perf_counter()
+            record: Dict[str, Any] = {"path": path}
+            try:
+                data, report = await future
+                record["result"] = await inference.analyze(path, data)
+                record["status"] = "ok"
+                if report is not None:
+                    record["preprocess"] = report
+                progress.ok += 1
+                checkpoint.state["ok"] += 1
+            except Exception as e:
+                record["status"] = "error"
+                record["error"] = str(e) or type(e).__name__
+                progress.failed += 1
+                checkpoint.state["failed"] += 1
+            record["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            output_file.write(json.dumps(record) + "\n")
+            output_file.flush()
+            if (progress.ok + progress.failed) % args.checkpoint_every == 0:
+                checkpoint.save(output_file)
+
+    async def report_progress() -> None:
+        while True:
+            await asyncio.sleep(1)
+            progress.tokens = await loop.run_in_executor(None, inference.eval_tokens) - tokens_at_start
+            progress.update()
+
+    await inference.start()
+    tokens_at_start = await loop.run_in_executor(None, inference.eval_tokens)
+    reporter = asyncio.create_task(report_progress())
+    try:
+        with open(args.output, "a") as output_file:
+            try:
+                await asyncio.gather(produce(), *(consume(output_file) for _ in range(args.concurrency)))
+            finally:
+                checkpoint.save(output_file)
+    finally:
+        reporter.cancel()
+        loader.shutdown(cancel_futures=True)
+        await inference.stop()
+    progress.update(force=True)
+    print(file=sys.stderr)
+    return 1 if progress.failed else 0
+
+def write_parquet(output: str, parquet_path: str) -> None:
+    """Converts the latest result per image from the JSONL output to a Parquet file."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        sys.exit("Parquet output needs pyarrow: pip install pyarrow")
+    latest: Dict[str, Dict[str, Any]] = {}
+    with open(output) as f:
+        for line in f:
+            record = json.loads(line)
+            if record["status"] == "ok" or record["path"] not in latest:
+                latest[record["path"]] = record
+    rows: List[Dict[str, Any]] = []
+    for record in latest.values():
+        result = record.get("result") or {}
+        rows.append({
+            "path": record["path"],
+            "status": record["status"],
+            "error": record.get("error"),
+            "elapsed_ms": record.get("elapsed_ms"),
+            **{field: result.get(field) for field in (
+                "clo_insulation", "clothing_type", "sleeve_length", "color", "glasses", "headwear",
+                "accessories", "description", "clo_insulation_text",
+            )},
+        })
+    pq.write_table(pa.Table.from_pylist(rows), parquet_path)
+    print(f"Wrote {len(rows)} rows to {parquet_path}", file=sys.stderr)
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="Directory of images, or a manifest file with one image path per line")
+    parser.add_argument("--output", default="results.jsonl", help="JSONL file results are appended to")
+    parser.add_argument("--parquet", help="Also write the results to this Parquet file when done (needs pyarrow)")
+    parser.add_argument("--model", default=settings.model_name, help="Ollama model to use")
+    parser.add_argument("--mode", choices=("direct", "api"), default="direct",
+                        help="Call Ollama from this process, or send images to a running API server")
+    parser.add_argument("--api-url", default=settings.endpoint_url, help="API server for --mode api")
+    parser.add_argument("--concurrency", type=int, default=settings.max_concurrent_inferences,
+                        help="Images being analyzed at once")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2,
+                        help="Processes decoding and preprocessing images")
+    parser.add_argument("--thread-workers", action="store_true",
+                        help="Preprocess on threads instead of processes")
+    parser.add_argument("--no-preprocess", action="store_true", help="Send the image files unchanged (always the case with --mode api)")
+    parser.add_argument("--retries", type=int, default=5, help="Retries of a request the API answers with 429/503")
+    parser.add_argument("--checkpoint-every", type=int, default=100, help="Results between checkpoint saves")
+    return parser.parse_args()
+
+def main() -> None:
+    args = parse_args()
+    try:
+        status = asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print("\nInterrupted; rerun the same command to resume", file=sys.stderr)
+        status = 130
+    if args.parquet and os.path.exists(args.output):
+        write_parquet(args.output, args.parquet)
+    sys.exit(status)
+
+if __name__ == "__main__":
+    main()
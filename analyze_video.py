@@ -0,0 +1,50 @@
+"""
+Analyze a video file or camera stream locally and print a CLO time series.
+
+Runs the same pipeline as POST /analyze-clothing/video without the web server:
+
+    python analyze_video.py recording.mp4 --interval 2
+    python analyze_video.py rtsp://camera.local/stream --model gemma3:4b --csv > clo.csv
+"""
+import argparse
+import asyncio
+import json
+from app.core.settings import settings
+from app.services.ollama_service import get_backend_pool
+from app.services.video_service import analyze_video, open_video, is_stream_url
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Print a CLO time series for a video file or stream")
+    parser.add_argument("source", help="Video file path, or an RTSP/HTTP (MJPEG) stream URL")
+    parser.add_argument("--model", default=settings.model_name, help="Ollama model to use")
+    parser.add_argument("--interval", type=float, default=settings.video_sample_interval,
+                        help="Seconds between sampled frames")
+    parser.add_argument("--threshold", type=float, default=settings.video_change_threshold,
+                        help="Frame difference (0-1) that triggers a new analysis")
+    parser.add_argument("--smoothing", type=float, default=settings.video_smoothing,
+                        help="Weight of the newest CLO value in the smoothed series")
+    parser.add_argument("--max-frames", type=int, default=settings.video_max_frames,
+                        help="Stop after this many sampled frames")
+    parser.add_argument("--csv", action="store_true", help="Print timestamp,clo,clo_smoothed,analyzed rows")
+    return parser.parse_args()
+
+async def main() -> None:
+    args = parse_args()
+    pool = get_backend_pool()
+    await pool.start()
+    try:
+        capture = open_video(args.source)
+        if args.csv:
+            print("timestamp,clo,clo_smoothed,analyzed")
+        async for point in analyze_video(capture, is_stream_url(args.source), args.model, args.interval,
+                                         args.threshold, args.smoothing, args.max_frames):
+            if not args.csv:
+                print(json.dumps(point), flush=True)
+            elif point["type"] == "point":
+                print(f"{point['timestamp']},{point.get('clo', '')},{point.get('clo_smoothed', '')},"
+                      f"{int(point['analyzed'])}", flush=True)
+    finally:
+        await pool.stop()
+
+if __name__ == "__main__":
+    asyncio.run(main())
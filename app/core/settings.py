@@ -1,12 +1,23 @@
 from pydantic_settings import BaseSettings
-from pydantic import Field
-from typing import List
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class PreprocessProfile(BaseModel):
+    """Image preprocessing parameters for a model"""
+    max_side: int = Field(default=1120, ge=32, description="Longest image side in pixels sent to the model")
+    jpeg_quality: int = Field(default=85, ge=1, le=100, description="JPEG quality used when re-encoding")
+
+class OllamaBackend(BaseModel):
+    """An Ollama host requests can be routed to"""
+    host: str = Field(..., description="Base URL of the Ollama server")
+    weight: float = Field(default=1.0, gt=0, description="Relative capacity used for least-loaded routing")
+    max_concurrency: int = Field(default=2, ge=1, description="Concurrent requests this host accepts")
+
 class Settings(BaseSettings):
     """Application settings"""
     # App settings
@@ -19,6 +30,127 @@ class Settings(BaseSettings):
     # Model settings
     model_name: str = Field(default="llama3.2-vision:11b", description="Name of the Ollama model to use")
     model_temperature: float = Field(default=0.0, description="Temperature for model generation")
+    prompt_version: str = Field(
+        default="v1",
+        description="Prompt version to use: 'v1' (full schema) or 'v1-trimmed' (leaves out the server-computed CLO fields)"
+    )
+    model_prompt_versions: Dict[str, str] = Field(
+        default={},
+        description="Prompt version per model name or family, overriding prompt_version"
+    )
+    
+    # Inference settings
+    ollama_host: Optional[str] = Field(default=None, description="Ollama server URL (defaults to OLLAMA_HOST or localhost)")
+    max_concurrent_inferences: int = Field(default=2, ge=1, description="Maximum number of concurrent calls to Ollama (single host)")
+    ollama_backends: List[OllamaBackend] = Field(
+        default=[],
+        description="Ollama hosts to spread requests over; overrides ollama_host and max_concurrent_inferences"
+    )
+    backend_health_interval: float = Field(default=15.0, description="Seconds between backend health checks")
+    backend_health_timeout: float = Field(default=5.0, description="Timeout in seconds of a backend health check")
+    inference_queue_timeout: float = Field(default=120.0, description="Seconds a request may wait for a free inference slot")
+    inference_timeout: float = Field(default=300.0, description="Seconds to wait for the model to answer a single request")
+    scheduler_max_wait: float = Field(default=30.0, description="Seconds a request for another model may wait before the scheduler switches models")
+    admission_enabled: bool = Field(default=True, description="Reject requests with 429/503 when they cannot be served in time")
+    admission_max_queue_per_model: int = Field(default=32, ge=1, description="Requests per model admitted at once, running or waiting; more get 429")
+    admission_initial_latency: float = Field(default=10.0, gt=0, description="Assumed inference latency in seconds of a model before its first call")
+    admission_latency_smoothing: float = Field(default=0.2, gt=0, le=1, description="Weight of the newest call in each model's moving-average latency")
+    ollama_keep_alive: Optional[str] = Field(
+        default=None,
+        description="How long Ollama keeps a model loaded after a request, e.g. '300s' (defaults to the server setting)"
+    )
+    
+    # Warm-up settings
+    warmup_enabled: bool = Field(default=True, description="Preload models on startup; /ready answers 503 until they are loaded")
+    warmup_models: List[str] = Field(default=[], description="Models to preload on startup (defaults to model_name)")
+    warmup_retry_interval: float = Field(default=10.0, description="Seconds between warm-up attempts while a model fails to load")
+    warmup_max_attempts: int = Field(default=3, ge=1, description="Warm-up rounds before a model no backend has installed stops counting for readiness")
+    keep_alive_interval: float = Field(default=240.0, description="Seconds between keep-alive refreshes of recently used models")
+    keep_alive_idle_timeout: float = Field(default=1800.0, description="Seconds without traffic after which a model is no longer kept alive")
+    
+    # Cascade settings
+    cascade_enabled: bool = Field(default=False, description="Try cascade_small_model first and escalate to the requested model on low confidence")
+    cascade_small_model: str = Field(default="gemma3:4b", description="Fast model answering first in cascade mode")
+    cascade_samples: int = Field(default=2, ge=1, description="Samples drawn from the small model to measure self-consistency")
+    cascade_temperature: float = Field(default=0.7, description="Sampling temperature of the small model when drawing several samples")
+    cascade_min_agreement: float = Field(default=0.8, ge=0, le=1, description="Agreement between samples below which the request escalates")
+    
+    # Upload settings
+    max_upload_bytes: int = Field(default=20_000_000, ge=1, description="Maximum accepted image upload size in bytes")
+    upload_to_temp_file: bool = Field(default=False, description="Write uploads to a temp file instead of sending bytes to Ollama")
+    
+    # Batch settings
+    batch_concurrency: int = Field(default=4, ge=1, description="Images of one batch analyzed at the same time")
+    batch_max_items: int = Field(default=1000, ge=1, description="Maximum number of images in one batch request")
+    batch_max_archive_bytes: int = Field(default=500_000_000, ge=1, description="Maximum size of a zip/tar archive in a batch request")
+    batch_max_total_bytes: int = Field(default=500_000_000, ge=1, description="Maximum combined size of all images and the archive in a batch request")
+    
+    # Video settings
+    video_sample_interval: float = Field(default=1.0, gt=0, description="Seconds between frames sampled from a video or stream")
+    video_change_threshold: float = Field(default=0.05, ge=0, le=1, description="Mean thumbnail difference (0-1) from the last analyzed frame that triggers a new analysis")
+    video_smoothing: float = Field(default=0.3, gt=0, le=1, description="Weight of the newest CLO value in the smoothed series (1 disables smoothing)")
+    video_max_frames: int = Field(default=3600, ge=1, description="Maximum number of frames sampled per video request")
+    video_max_upload_bytes: int = Field(default=500_000_000, ge=1, description="Maximum size of an uploaded video")
+    video_allow_stream_urls: bool = Field(default=False, description="Allow /video requests to name RTSP/HTTP stream URLs for the server to open")
+    
+    # Job queue settings
+    jobs_enabled: bool = Field(default=True, description="Enable the asynchronous /jobs API")
+    jobs_db_path: str = Field(default="data/jobs.db", description="SQLite file holding the job queue")
+    jobs_workers: int = Field(default=2, ge=1, description="Number of job workers per process")
+    jobs_max_attempts: int = Field(default=3, ge=1, description="Attempts per job before it is marked failed")
+    jobs_retry_backoff: float = Field(default=5.0, description="Base delay in seconds between attempts; doubles each retry")
+    jobs_lease_seconds: float = Field(default=450.0, description="Seconds before a running job whose worker vanished is retried")
+    jobs_poll_interval: float = Field(default=1.0, description="Seconds an idle worker waits before checking the queue again")
+    jobs_webhook_timeout: float = Field(default=10.0, description="Timeout in seconds for webhook calls")
+    jobs_webhook_attempts: int = Field(default=3, ge=1, description="Delivery attempts per webhook")
+    jobs_webhook_allowed_hosts: List[str] = Field(default=[], description="Hosts webhooks may be sent to; empty allows any public host")
+    jobs_webhook_allow_private: bool = Field(default=False, description="Allow webhooks to loopback, private and other non-public addresses")
+    
+    # Preprocessing settings
+    preprocess_enabled: bool = Field(default=True, description="EXIF-correct, downscale and re-encode images before inference")
+    preprocess_default_profile: PreprocessProfile = Field(
+        default=PreprocessProfile(),
+        description="Preprocessing profile for models without their own entry"
+    )
+    preprocess_profiles: Dict[str, PreprocessProfile] = Field(
+        default={
+            # llama3.2-vision tiles images into up to 4 tiles of 560x560
+            "llama3.2-vision": PreprocessProfile(max_side=1120),
+            # gemma3's vision encoder works on 896x896 inputs
+            "gemma3": PreprocessProfile(max_side=896),
+        },
+        description="Preprocessing profiles keyed by model name or model family"
+    )
+    
+    # Person crop settings (part of preprocessing)
+    person_crop_enabled: bool = Field(default=False, description="Crop images to the largest detected person before inference")
+    person_crop_padding: float = Field(default=0.15, ge=0.0, description="Padding added around the person box, as a fraction of its size")
+    person_detect_max_side: int = Field(default=640, ge=128, description="Longest side of the image the person detector runs on")
+    person_detect_min_score: float = Field(default=0.5, description="Minimum HOG detector score for a person box")
+    person_closeup_face_ratio: float = Field(default=0.12, description="Skip cropping when a face is at least this fraction of the shorter image side")
+
+    # Multi-person settings
+    people_max_per_frame: int = Field(default=8, ge=1, description="Maximum number of people analyzed per image, largest first")
+    people_max_concurrency: int = Field(default=4, ge=1, description="Maximum number of person crops of one image analyzed at a time")
+    
+    # Result cache settings
+    cache_enabled: bool = Field(default=True, description="Reuse analyses of identical images")
+    cache_max_entries: int = Field(default=1024, ge=1, description="Maximum number of analyses kept in memory")
+    cache_ttl_seconds: float = Field(default=86400.0, description="Seconds a cached analysis stays valid (0 = forever)")
+    cache_db_path: Optional[str] = Field(default=None, description="SQLite file for the persistent cache tier (disabled if unset)")
+    phash_enabled: bool = Field(default=False, description="Reuse analyses of near-duplicate images (re-encoded, resized)")
+    phash_max_distance: int = Field(default=4, ge=0, le=64, description="Largest Hamming distance between 64-bit pHashes that counts as a duplicate")
+    phash_max_entries: int = Field(default=100_000, ge=1, description="Maximum number of images in the near-duplicate index")
+    phash_index_path: Optional[str] = Field(default=None, description="File the near-duplicate index is saved to (memory only if unset)")
+    phash_save_every: int = Field(default=50, ge=1, description="Save the near-duplicate index after this many new entries")
+    
+    # Monitoring settings
+    loop_lag_interval: float = Field(default=0.25, ge=0, description="Seconds between event loop lag samples exported on /metrics (0 disables)")
+    
+    # Analysis store settings
+    store_enabled: bool = Field(default=False, description="Record every analysis served for /analytics")
+    store_db_path: str = Field(default="data/analyses.db", description="SQLite file holding the recorded analyses")
+    store_retention_days: float = Field(default=0, ge=0, description="Days recorded analyses are kept (0 = forever)")
     
     # Debug settings
     debug: bool = Field(default=False, description="Debug mode")
@@ -45,5 +177,14 @@ class Settings(BaseSettings):
         super().__init__(**kwargs)
         logger.info(f"Loaded settings: MODEL_NAME={self.model_name}")
 
+    def get_ollama_backends(self) -> List[OllamaBackend]:
+        """Returns the configured backends, or the single ollama_host backend."""
+        if self.ollama_backends:
+            return self.ollama_backends
+        return [OllamaBackend(
+            host=self.ollama_host or "http://127.0.0.1:11434",
+            max_concurrency=self.max_concurrent_inferences
+        )]
+
 settings = Settings()
 logger.info(f"Settings initialized with model_name: {settings.model_name}")
\ No newline at end of file
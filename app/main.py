@@ -1,12 +1,42 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes.analyze import router as analyze_router
+from app.routes.analytics import router as analytics_router
+from app.routes.health import router as health_router
+from app.routes.jobs import router as jobs_router
 from app.core.settings import settings
+from app.services.analytics_service import open_analysis_store, close_analysis_store
+from app.services.detection_service import check_person_detection
+from app.services.job_service import start_job_workers, stop_job_workers
+from app.services.metrics import start_loop_lag_monitor, stop_loop_lag_monitor
+from app.services.ollama_service import get_backend_pool
+from app.services.phash_service import phash_index
+from app.services.prompt_registry import build_prompt_registry
+from app.services.warmup_service import get_warmup_manager
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    check_person_detection()
+    build_prompt_registry()
+    start_loop_lag_monitor(settings.loop_lag_interval)
+    await get_backend_pool().start()
+    await get_warmup_manager().start()
+    open_analysis_store()
+    start_job_workers()
+    yield
+    await stop_job_workers()
+    close_analysis_store()
+    await get_warmup_manager().stop()
+    await get_backend_pool().stop()
+    phash_index.save()
+    await stop_loop_lag_monitor()
 
 app = FastAPI(
     title=settings.app_name,
     version=settings.api_version,
-    debug=settings.debug
+    debug=settings.debug,
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -18,4 +48,7 @@ app.add_middleware(
     allow_credentials=True,
 )
 
-app.include_router(analyze_router, prefix="/analyze-clothing")
\ No newline at end of file
+app.include_router(health_router)
+app.include_router(analyze_router, prefix="/analyze-clothing")
+app.include_router(jobs_router, prefix="/jobs")
+app.include_router(analytics_router, prefix="/analytics")
\ No newline at end of file
@@ -0,0 +1,64 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Optional
+from app.services import analytics_service
+import time
+
+router = APIRouter()
+
+def get_analysis_store() -> analytics_service.AnalysisStore:
+    if analytics_service.analysis_store is None:
+        raise HTTPException(status_code=503, detail="Analysis store is disabled (STORE_ENABLED)")
+    return analytics_service.analysis_store
+
+def parse_percentiles(value: str) -> List[float]:
+    try:
+        percentiles = [float(p) for p in value.split(",") if p.strip()]
+    except ValueError:
+        percentiles = []
+    if not percentiles or any(not 0 <= p <= 100 for p in percentiles):
+        raise HTTPException(status_code=400, detail="percentiles must be comma-separated numbers from 0 to 100")
+    return percentiles
+
+@router.get("/")
+async def analytics(
+    since: Optional[float] = Query(None, description="Start of the period in Unix seconds (default: 24 hours ago)"),
+    until: Optional[float] = Query(None, description="End of the period in Unix seconds (default: now)"),
+    model: Optional[str] = None,
+    source_id: Optional[str] = None,
+    garment: Optional[str] = None,
+    window: float = Query(3600, gt=0, description="Length of the rolling window in seconds"),
+    step: Optional[float] = Query(None, gt=0, description="Seconds between rolling points (default: window)"),
+    percentiles: str = Query("10,50,90", description="Comma-separated CLO percentiles")
+):
+    """
+    Aggregate CLO statistics over the recorded analyses.
+
+    Returns the overall CLO mean and percentiles, CLO percentiles over a rolling
+    window, and how often each garment was seen, for the records matching the filters.
+    """
+    store = get_analysis_store()
+    until = time.time() if until is None else until
+    since = until - 86400 if since is None else since
+    if since >= until:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    step = window if step is None else step
+    if (until - since) / step > 10_000:
+        raise HTTPException(status_code=400, detail="step is too small for the period (at most 10000 points)")
+    points = parse_percentiles(percentiles)
+
+    columns = await run_in_threadpool(store.columns, since, until, model, source_id, garment)
+    return await run_in_threadpool(analytics_service.summarize, columns, since, until, window, step, points)
+
+@router.get("/analyses")
+async def list_analyses(
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    model: Optional[str] = None,
+    source_id: Optional[str] = None,
+    garment: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """List the newest recorded analyses matching the filters."""
+    store = get_analysis_store()
+    return await run_in_threadpool(store.query, since, until, model, source_id, garment, limit)
@@ -1,31 +1,108 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, Form
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, File, UploadFile, HTTPException, Form, Header, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from app.schemas.clothing import ClothingAnalysis
-from app.services.ollama_service import analyze_image
-from app.utils.file_handler import save_spooled_temp_image, remove_temp_image
+from app.schemas.people import MultiPersonAnalysis
+from app.core.settings import settings
+from app.services.admission_service import AdmissionError, AdmissionQueueFullError, parse_deadline
+from app.services.analysis_service import analyze_cached, stream_analysis, inflight_analyses, phash_scope
+from app.services.batch_service import analyze_batch, iter_archive_images, rejected_item, BatchError
+from app.services.cache_service import analysis_cache
+from app.services.cascade_service import cascade_stats
+from app.services.ollama_service import InferenceQueueFullError, InferenceTimeoutError, get_scheduler, get_backend_pool, get_admission_controller
+from app.services.people_service import analyze_people, ImageDecodeError
+from app.services.metrics import start_request_timings, timed, server_timing_header
+from app.services.phash_service import perceptual_hash, phash_index
+from app.services.preprocess_service import preprocess_stats
+from app.services.prompt_registry import prompt_stats
+from app.services.video_service import analyze_video, open_video, is_stream_url, VideoError
+from app.utils.file_handler import read_upload_bytes, save_temp_image, remove_temp_image, image_suffix, UploadTooLargeError
+from app.utils.lazy_import import MissingDependencyError
 from datetime import datetime
+from typing import List, Optional
+import hashlib
 import json
+import time
 import traceback
 
 router = APIRouter()
 
+def set_metadata_headers(response: Response, metadata: dict):
+    """Expose pipeline metadata as response headers."""
+    response.headers["X-Cache"] = metadata["cache"]
+    response.headers["X-Prompt-Version"] = metadata["prompt_version"]
+    if "cascade" in metadata:
+        cascade = metadata["cascade"]
+        response.headers["X-Cascade-Tier"] = f"{cascade['tier']}; model={cascade['model']}; agreement={cascade['agreement']}"
+    if "preprocess" in metadata:
+        report = metadata["preprocess"]
+        response.headers["X-Preprocess"] = (
+            f"bytes_in={report['bytes_in']}; bytes_out={report['bytes_out']}; "
+            f"bytes_saved={report['bytes_saved']}; ms={report['elapsed_ms']}"
+        )
+        if "crop_box" in report:
+            box = report["crop_box"]
+            response.headers["X-Crop-Box"] = ",".join(str(v) for v in box) if box else "none"
+
+def admission_http_error(error: AdmissionError) -> HTTPException:
+    """Turns a rejected admission into 429 (model queue full) or 503 (deadline cannot be met)."""
+    status_code = 429 if isinstance(error, AdmissionQueueFullError) else 503
+    return HTTPException(status_code=status_code, detail=str(error), headers={"Retry-After": str(error.retry_after)})
+
+def read_deadline(x_deadline: Optional[str]) -> Optional[float]:
+    """Parses the X-Deadline header, answering 400 when it is malformed."""
+    try:
+        return parse_deadline(x_deadline)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="X-Deadline must be a positive number of seconds")
+
 @router.post("/",  response_model=ClothingAnalysis)
 async def analyze_clothing(
+    response: Response,
     image: UploadFile = File(...),
-    model: str = Form("llama3.2-vision:11b")
+    model: str = Form("llama3.2-vision:11b"),
+    source_id: Optional[str] = Form(None),
+    x_deadline: Optional[str] = Header(None)
 ):
+    """
+    Analyze an image.
+
+    source_id (e.g. a camera id) is kept with the analysis when the analysis store is enabled.
+
+    An optional X-Deadline header gives the seconds the client is willing to wait.
+    Requests that cannot be answered in time are rejected at once with 503, and
+    with 429 when too many requests for the model are queued; both carry Retry-After.
+    """
     if not image.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="File uploaded is not an image")
-        
-    temp_path = save_spooled_temp_image(image)
+    budget = read_deadline(x_deadline)
+
+    started = time.perf_counter()
+    timings = start_request_timings()
+    try:
+        with timed("upload_read", model):
+            image_bytes = await read_upload_bytes(image, settings.max_upload_bytes)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    image_digest = hashlib.sha256(image_bytes).hexdigest()
 
     try:
         try:
-            # The analyze_image function now returns a ClothingAnalysis object directly
-            analysis = analyze_image(temp_path, model)
+            with get_admission_controller().request(budget):
+                analysis, metadata = await analyze_cached(image_bytes, image_digest, model, image.content_type, source_id)
+            set_metadata_headers(response, metadata)
+            timings["total"] = time.perf_counter() - started
+            response.headers["Server-Timing"] = server_timing_header(timings)
             return analysis.model_dump()
+        except AdmissionError as e:
+            raise admission_http_error(e)
+        except InferenceQueueFullError as e:
+            retry_after = get_admission_controller().retry_after(model)
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(retry_after)})
+        except InferenceTimeoutError as e:
+            raise HTTPException(status_code=504, detail=str(e))
         except Exception as e:
-            # Capture any errors from the analyze_image function
+            # Capture any errors from the analysis pipeline
             error_detail = str(e)
             stack_trace = traceback.format_exc()
             return JSONResponse(
@@ -37,4 +114,306 @@ async def analyze_clothing(
                 }
             )
     finally:
-        remove_temp_image(temp_path)
+        await image.close()
+
+@router.post("/people", response_model=MultiPersonAnalysis)
+async def analyze_clothing_people(
+    response: Response,
+    image: UploadFile = File(...),
+    model: str = Form("llama3.2-vision:11b"),
+    source_id: Optional[str] = Form(None),
+    x_deadline: Optional[str] = Header(None)
+):
+    """
+    Analyze every person in an image.
+
+    Each detected person is cropped and analyzed on their own, several at a time;
+    the response lists every person's box and analysis with the mean CLO value.
+    Without any detected person the whole image is analyzed. X-Deadline and
+    source_id work as for a single analysis.
+    """
+    if not image.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="File uploaded is not an image")
+    budget = read_deadline(x_deadline)
+
+    started = time.perf_counter()
+    timings = start_request_timings()
+    try:
+        with timed("upload_read", model):
+            image_bytes = await read_upload_bytes(image, settings.max_upload_bytes)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    finally:
+        await image.close()
+
+    try:
+        with get_admission_controller().request(budget):
+            result = await analyze_people(image_bytes, model, source_id)
+    except AdmissionError as e:
+        raise admission_http_error(e)
+    except MissingDependencyError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except ImageDecodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except InferenceQueueFullError as e:
+        retry_after = get_admission_controller().retry_after(model)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(retry_after)})
+    except InferenceTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ConnectionError as e:
+        raise HTTPException(status_code=503, detail=f"No Ollama backend reachable: {e}")
+    except Exception as e:
+        # Capture any errors from the analysis pipeline
+        return JSONResponse(
+            status_code=500,
+            content={
+                "detail": "Error processing image",
+                "error": str(e),
+                "trace": traceback.format_exc()
+            }
+        )
+    timings["total"] = time.perf_counter() - started
+    response.headers["Server-Timing"] = server_timing_header(timings)
+    return result
+
+def sse_event(event: str, data) -> str:
+    """Formats one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/stream")
+async def analyze_clothing_stream(
+    image: UploadFile = File(...),
+    model: str = Form("llama3.2-vision:11b"),
+    source_id: Optional[str] = Form(None),
+    x_deadline: Optional[str] = Header(None)
+):
+    """
+    Analyze an image and stream the answer as Server-Sent Events.
+
+    Events: "metadata" (cache status and prompt version), "token" (raw model
+    output), "field" (each field of the answer as soon as it is complete),
+    then "result" (the full analysis with the calculated CLO value) or "error".
+    Admission works as for /analyze-clothing/, including X-Deadline.
+    """
+    if not image.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="File uploaded is not an image")
+    budget = read_deadline(x_deadline)
+    try:
+        image_bytes = await read_upload_bytes(image, settings.max_upload_bytes)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    finally:
+        await image.close()
+    image_digest = hashlib.sha256(image_bytes).hexdigest()
+
+    async def analysis_events():
+        with get_admission_controller().request(budget):
+            async for event, data in stream_analysis(image_bytes, image_digest, model, source_id):
+                yield event, data
+
+    stream = analysis_events()
+    try:
+        # The first event follows the cache lookup and admission, so a rejection
+        # is answered before the response starts, while a status code can still be sent
+        first = await stream.__anext__()
+    except AdmissionError as e:
+        raise admission_http_error(e)
+
+    async def events():
+        try:
+            yield sse_event(*first)
+            async for event, data in stream:
+                if event == "result":
+                    data = data.model_dump()
+                yield sse_event(event, data)
+        except InferenceQueueFullError as e:
+            yield sse_event("error", {"status": 503, "detail": str(e)})
+        except InferenceTimeoutError as e:
+            yield sse_event("error", {"status": 504, "detail": str(e)})
+        except Exception as e:
+            yield sse_event("error", {"status": 500, "detail": "Error processing image", "error": str(e)})
+        finally:
+            # Releases the admission slot when the client disconnects mid-stream
+            await stream.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/video")
+async def analyze_clothing_video(
+    video: Optional[UploadFile] = File(None),
+    source: Optional[str] = Form(None),
+    model: str = Form("llama3.2-vision:11b"),
+    interval: Optional[float] = Form(None, gt=0),
+    change_threshold: Optional[float] = Form(None, ge=0, le=1),
+    smoothing: Optional[float] = Form(None, gt=0, le=1),
+    source_id: Optional[str] = Form(None)
+):
+    """
+    Analyze an uploaded video or a camera stream and stream a CLO time series as NDJSON.
+
+    Frames are sampled every `interval` seconds and only analyzed when they changed
+    from the last analyzed frame; each line is one sampled frame with the raw and
+    smoothed CLO value, and the last line is a summary. Analyzed frames are
+    recorded under source_id when the analysis store is enabled.
+    """
+    interval = settings.video_sample_interval if interval is None else interval
+    change_threshold = settings.video_change_threshold if change_threshold is None else change_threshold
+    smoothing = settings.video_smoothing if smoothing is None else smoothing
+    if (video is None) == (source is None):
+        raise HTTPException(status_code=400, detail="Provide either a video file or a stream source")
+    if source is not None and not (settings.video_allow_stream_urls and is_stream_url(source)):
+        raise HTTPException(status_code=400, detail="Stream sources are disabled or not an RTSP/HTTP URL")
+
+    temp_path = None
+    try:
+        if video is not None:
+            try:
+                data = await read_upload_bytes(video, settings.video_max_upload_bytes)
+            finally:
+                await video.close()
+            temp_path = await run_in_threadpool(save_temp_image, data, image_suffix(None, video.filename))
+            source = temp_path
+        capture = await run_in_threadpool(open_video, source)
+    except (UploadTooLargeError, VideoError, MissingDependencyError) as e:
+        if temp_path:
+            remove_temp_image(temp_path)
+        status_code = 413 if isinstance(e, UploadTooLargeError) else 501 if isinstance(e, MissingDependencyError) else 400
+        raise HTTPException(status_code=status_code, detail=str(e))
+
+    async def ndjson():
+        try:
+            async for point in analyze_video(capture, temp_path is None, model, interval, change_threshold,
+                                             smoothing, settings.video_max_frames, source_id):
+                yield json.dumps(point) + "\n"
+        finally:
+            if temp_path:
+                remove_temp_image(temp_path)
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+@router.post("/near-duplicates")
+async def find_near_duplicates(
+    images: List[UploadFile] = File(...),
+    model: str = Form("llama3.2-vision:11b"),
+    max_distance: Optional[int] = Form(None)
+):
+    """
+    Look many images up in the near-duplicate index without running the model.
+
+    Like /batch, the request is refused before anything is read if it has more
+    than settings.batch_max_items images or any part is not an image.
+    """
+    if len(images) > settings.batch_max_items:
+        raise HTTPException(status_code=413, detail=f"Request exceeds the {settings.batch_max_items} image limit")
+    for upload in images:
+        if not upload.content_type or not upload.content_type.startswith('image/'):
+            raise HTTPException(status_code=400, detail=f"File uploaded is not an image: {upload.filename}")
+    max_distance = settings.phash_max_distance if max_distance is None else max_distance
+    names, hashes, errors = [], [], {}
+    try:
+        for upload in images:
+            data = await read_upload_bytes(upload, settings.max_upload_bytes)
+            await upload.close()
+            try:
+                hashes.append(await run_in_threadpool(perceptual_hash, data))
+                names.append(upload.filename)
+            except OSError as e:
+                errors[upload.filename] = str(e)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    matches = await run_in_threadpool(phash_index.query_many, hashes, phash_scope(model), max_distance)
+    results = [
+        {
+            "filename": name,
+            "phash": f"{image_hash:016x}",
+            "distance": match[0] if match else None,
+            "result": match[1].model_dump() if match else None,
+        }
+        for name, image_hash, match in zip(names, hashes, matches)
+    ]
+    results.extend({"filename": name, "error": error} for name, error in errors.items())
+    return results
+
+@router.post("/batch")
+async def analyze_clothing_batch(
+    images: List[UploadFile] = File(default=[]),
+    archive: Optional[UploadFile] = File(None),
+    model: str = Form("llama3.2-vision:11b")
+):
+    """
+    Analyze many images and stream one NDJSON line per image as each finishes.
+
+    Parts that are not images, or exceed the per-image limit, are reported as
+    error lines. The whole request is refused if it has too many images or its
+    parts together exceed settings.batch_max_total_bytes.
+    """
+    if len(images) > settings.batch_max_items:
+        # Checked before reading anything
+        raise HTTPException(status_code=413, detail=f"Batch exceeds the {settings.batch_max_items} image limit")
+    if not images and archive is None:
+        raise HTTPException(status_code=400, detail="No images provided")
+
+    total_error = f"Batch exceeds the {settings.batch_max_total_bytes} byte total limit"
+    remaining = settings.batch_max_total_bytes
+    items = []
+    try:
+        for upload in images:
+            if not upload.content_type or not upload.content_type.startswith('image/'):
+                items.append(rejected_item(upload.filename, f"{upload.filename} is not an image"))
+                continue
+            limit = min(settings.max_upload_bytes, remaining)
+            try:
+                data = await read_upload_bytes(upload, limit)
+            except UploadTooLargeError as e:
+                if limit < settings.max_upload_bytes:
+                    raise HTTPException(status_code=413, detail=total_error)
+                items.append(rejected_item(upload.filename, f"{upload.filename}: {e}"))
+                continue
+            finally:
+                await upload.close()
+            remaining -= len(data)
+            items.append((upload.filename, lambda data=data: data))
+
+        if archive is not None:
+            limit = min(settings.batch_max_archive_bytes, remaining)
+            try:
+                data = await read_upload_bytes(archive, limit)
+            except UploadTooLargeError as e:
+                detail = str(e) if limit == settings.batch_max_archive_bytes else total_error
+                raise HTTPException(status_code=413, detail=detail)
+            finally:
+                await archive.close()
+            items.extend(iter_archive_images(data, archive.filename))
+    except BatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not items:
+        raise HTTPException(status_code=400, detail="No images provided")
+    if len(items) > settings.batch_max_items:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds the {settings.batch_max_items} image limit")
+
+    async def ndjson():
+        async for result in analyze_batch(items, model, settings.batch_concurrency):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+@router.get("/stats")
+async def analysis_stats():
+    return {
+        "cache": analysis_cache.stats(),
+        "near_duplicates": phash_index.stats(),
+        "admission": get_admission_controller().stats(),
+        "singleflight": inflight_analyses.stats(),
+        "preprocess": preprocess_stats(),
+        "prompts": prompt_stats(),
+        "cascade": cascade_stats(),
+        "scheduler": get_scheduler().stats(),
+        "backends": get_backend_pool().stats(),
+    }
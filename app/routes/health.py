@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.services.metrics import render_metrics
+from app.services.warmup_service import get_warmup_manager
+
+router = APIRouter()
+
+@router.get("/health")
+async def health():
+    """Liveness probe: the process is up and serving requests."""
+    return {"status": "ok"}
+
+@router.get("/ready")
+async def ready():
+    """Readiness probe: answers 503 until the configured models are loaded."""
+    stats = get_warmup_manager().stats()
+    return JSONResponse(status_code=200 if stats["ready"] else 503, content=stats)
+
+@router.get("/metrics")
+async def metrics():
+    """Prometheus metrics: stage latency histograms, token counts and throughput per model."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
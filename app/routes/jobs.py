@@ -0,0 +1,55 @@
+from fastapi import APIRouter, File, UploadFile, HTTPException, Form
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional
+from app.core.settings import settings
+from app.schemas.jobs import JobStatus
+from app.services import job_service
+from app.utils.file_handler import read_upload_bytes, UploadTooLargeError
+
+router = APIRouter()
+
+def get_job_store() -> job_service.JobStore:
+    if job_service.job_store is None:
+        raise HTTPException(status_code=503, detail="Job queue is disabled")
+    return job_service.job_store
+
+@router.post("/", status_code=202)
+async def submit_job(
+    image: UploadFile = File(...),
+    model: str = Form("llama3.2-vision:11b"),
+    priority: int = Form(0),
+    webhook_url: Optional[str] = Form(None)
+):
+    """Queue an image for analysis and return its job id immediately."""
+    store = get_job_store()
+    if not image.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="File uploaded is not an image")
+    if webhook_url:
+        try:
+            await run_in_threadpool(job_service.check_webhook_url, webhook_url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        image_bytes = await read_upload_bytes(image, settings.max_upload_bytes)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    finally:
+        await image.close()
+
+    job_id = await run_in_threadpool(
+        store.submit, image_bytes, model, priority, image.content_type, webhook_url
+    )
+    job_service.job_workers.notify()
+    return {"job_id": job_id, "status": "queued"}
+
+@router.get("/stats")
+async def job_stats():
+    return {"jobs": await run_in_threadpool(get_job_store().counts)}
+
+@router.get("/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    job = await run_in_threadpool(get_job_store().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -0,0 +1,19 @@
+from pydantic import BaseModel, Field
+from typing import Literal, Optional
+from app.schemas.clothing import ClothingAnalysis
+
+class JobStatus(BaseModel):
+    job_id: str
+    status: Literal['queued', 'running', 'succeeded', 'failed']
+    model: str
+    priority: int = Field(..., description="Higher priorities are processed first")
+    attempts: int = Field(..., description="Number of analysis attempts made so far")
+    created_at: float
+    updated_at: float
+    result: Optional[ClothingAnalysis] = None
+    error: Optional[str] = None
+    webhook_url: Optional[str] = None
+    webhook_status: Optional[str] = Field(
+        default=None,
+        description="'pending' until the webhook has been called, then 'delivered' or the last delivery error"
+    )
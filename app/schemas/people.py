@@ -0,0 +1,21 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from app.schemas.clothing import ClothingAnalysis
+
+class PersonAnalysis(BaseModel):
+    box: Optional[List[int]] = Field(
+        ...,
+        description=(
+            "Person box (x, y, width, height) in the upright image, padded as sent to the model; "
+            "null when nobody was detected and the whole frame was analyzed"
+        )
+    )
+    analysis: Optional[ClothingAnalysis] = None
+    cache: Optional[str] = Field(default=None, description="Cache outcome of this person's analysis")
+    error: Optional[str] = None
+
+class MultiPersonAnalysis(BaseModel):
+    people: List[PersonAnalysis] = Field(..., description="One entry per detected person, largest first")
+    person_count: int = Field(..., description="Number of people detected, 0 when the whole frame was analyzed")
+    mean_clo: Optional[float] = Field(..., description="Mean CLO value of the people analyzed successfully")
+    image_size: List[int] = Field(..., description="Width and height of the upright image")
@@ -0,0 +1,217 @@
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+from app.core.settings import settings
+from app.services.metrics import Counter, METRICS
+
+ADMISSIONS = Counter("clothing_admission_total", "Admission decisions per model", ("model", "outcome"))
+METRICS.append(ADMISSIONS)
+
+# Monotonic time by which the current request must be answered
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+# Whether the model calls of the current request go through admission control
+_admission_required: ContextVar[bool] = ContextVar("admission_required", default=False)
+
+class AdmissionError(Exception):
+    """Raised when a request is rejected before it reaches the model."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionQueueFullError(AdmissionError):
+    """Raised when too many requests for a model are already admitted."""
+
+
+class DeadlineExceededError(AdmissionError):
+    """Raised when the estimated wait would overrun the request's deadline."""
+
+
+def parse_deadline(value: Optional[str]) -> Optional[float]:
+    """
+    Parses an X-Deadline header.
+
+    Args:
+        value: Seconds the client is willing to wait for the answer, or None
+
+    Returns:
+        The budget in seconds, or None without a header
+
+    Raises:
+        ValueError: If the value is not a positive number
+    """
+    if value is None:
+        return None
+    budget = float(value)
+    if not budget > 0 or math.isinf(budget):
+        raise ValueError(f"X-Deadline must be a positive number of seconds, got {value!r}")
+    return budget
+
+def remaining_time() -> Optional[float]:
+    """Returns the seconds left until the current request's deadline, or None without one."""
+    deadline = _deadline.get()
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+def queue_timeout() -> float:
+    """Returns how long the current request may wait for an inference slot."""
+    remaining = remaining_time()
+    if remaining is None:
+        return settings.inference_queue_timeout
+    return min(settings.inference_queue_timeout, remaining)
+
+class AdmissionController:
+    """
+    Rejects requests that cannot be served in time, before they queue for a model.
+
+    Only model calls are admitted: answers from the cache or the near-duplicate
+    index never are. Every admitted call counts against its model until it
+    finishes. The wait of a new call is estimated from the admitted backlog and a
+    moving average of each model's inference latency, spread over the backends'
+    capacity. A call is refused with AdmissionQueueFullError when its model
+    already has max_queue calls admitted, and with DeadlineExceededError when the
+    estimate overruns the request's remaining deadline (or, without one, the
+    inference queue timeout). Failing fast lets the calls that are admitted
+    finish instead of all timing out.
+    """
+
+    def __init__(self, capacity: int, max_queue: int):
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.in_flight: Dict[str, int] = {}
+        self.latency: Dict[str, float] = {}
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "deadline": 0}
+
+    def observe(self, model: str, seconds: float) -> None:
+        """
+        Records how long an inference for model took.
+
+        Args:
+            model: Name of the model that answered
+            seconds: Duration of the inference call
+        """
+        previous = self.latency.get(model)
+        smoothing = settings.admission_latency_smoothing
+        self.latency[model] = seconds if previous is None else smoothing * seconds + (1 - smoothing) * previous
+
+    def expected_latency(self, model: str) -> float:
+        """Returns the moving-average inference latency of model, or the configured guess before any call."""
+        return self.latency.get(model, settings.admission_initial_latency)
+
+    def estimate_wait(self) -> float:
+        """Returns the estimated seconds a new request waits for an inference slot."""
+        if sum(self.in_flight.values()) < self.capacity:
+            return 0.0
+        backlog = sum(count * self.expected_latency(model) for model, count in self.in_flight.items())
+        return backlog / self.capacity
+
+    def check(self, model: str, budget: Optional[float]) -> None:
+        """
+        Decides whether a request for model can be served.
+
+        Args:
+            model: Name of the model the request will run
+            budget: Seconds the client is willing to wait, or None
+
+        Raises:
+            AdmissionQueueFullError: If max_queue requests for model are already admitted
+            DeadlineExceededError: If the request is not expected to finish in time
+        """
+        latency = self.expected_latency(model)
+        if self.in_flight.get(model, 0) >= self.max_queue:
+            self.rejected["queue_full"] += 1
+            ADMISSIONS.inc(model, "queue_full")
+            raise AdmissionQueueFullError(
+                f"{self.max_queue} requests for {model} are already queued",
+                max(1, math.ceil(latency / self.capacity))
+            )
+        wait = self.estimate_wait()
+        if budget is not None and wait + latency > budget:
+            overrun = wait + latency - budget
+        elif budget is None and wait > settings.inference_queue_timeout:
+            overrun = wait - settings.inference_queue_timeout
+        else:
+            return
+        self.rejected["deadline"] += 1
+        ADMISSIONS.inc(model, "deadline")
+        raise DeadlineExceededError(
+            f"Estimated wait of {wait + latency:.1f}s for {model} exceeds the deadline",
+            max(1, math.ceil(overrun))
+        )
+
+    @contextmanager
+    def request(self, budget: Optional[float]) -> Iterator[None]:
+        """
+        Subjects the model calls made in the block to admission control.
+
+        The deadline also bounds how long the calls wait for an inference slot.
+
+        Args:
+            budget: Seconds the client is willing to wait, or None
+        """
+        if not settings.admission_enabled:
+            yield
+            return
+        previous = _deadline.get(), _admission_required.get()
+        _deadline.set(None if budget is None else time.monotonic() + budget)
+        _admission_required.set(True)
+        try:
+            yield
+        finally:
+            # Not reset(): a stream closed on disconnect may exit in another context
+            _deadline.set(previous[0])
+            _admission_required.set(previous[1])
+
+    @contextmanager
+    def admit(self, model: str) -> Iterator[None]:
+        """
+        Admits a model call for the duration of the block.
+
+        Entered on the cache miss path, just before the model is called. Outside
+        a request() block (batches, jobs, video), calls are not admission controlled.
+
+        Args:
+            model: Name of the model to call
+
+        Raises:
+            AdmissionQueueFullError: If max_queue calls for model are already admitted
+            DeadlineExceededError: If the call is not expected to finish before the request's deadline
+        """
+        if not settings.admission_enabled or not _admission_required.get():
+            yield
+            return
+        self.check(model, remaining_time())
+        self.admitted += 1
+        ADMISSIONS.inc(model, "admitted")
+        self.in_flight[model] = self.in_flight.get(model, 0) + 1
+        try:
+            yield
+        finally:
+            self.in_flight[model] -= 1
+            if not self.in_flight[model]:
+                del self.in_flight[model]
+
+    def retry_after(self, model: str) -> int:
+        """Returns a Retry-After value for a request that timed out waiting for a slot."""
+        return max(1, math.ceil(self.estimate_wait() + self.expected_latency(model)))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns admission counters.
+
+        Returns:
+            Dictionary with admitted and rejected counts, requests in flight per
+            model, the latency estimates and the current estimated wait
+        """
+        return {
+            "enabled": settings.admission_enabled,
+            "max_queue_per_model": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "in_flight": dict(self.in_flight),
+            "latency_seconds": {model: round(value, 3) for model, value in self.latency.items()},
+            "estimated_wait_seconds": round(self.estimate_wait(), 3),
+        }
@@ -0,0 +1,328 @@
+import logging
+import sqlite3
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple, Union
+from fastapi.concurrency import run_in_threadpool
+from app.schemas.clothing import ClothingAnalysis
+from app.core.settings import settings
+from app.services import analytics_service
+from app.services.cache_service import analysis_cache, make_cache_key
+from app.services.cascade_service import analyze_cascade, uses_cascade
+from app.services.metrics import ANALYSES, current_request_timings, start_request_timings, timed
+from app.services.ollama_service import analyze_image_async, analyze_image_stream, get_admission_controller
+from app.services.phash_service import perceptual_hash, phash_index
+from app.services.prompt_registry import get_prompt
+from app.services.preprocess_service import preprocess_image, get_preprocess_profile
+from app.services.singleflight import SingleFlight
+from app.utils.file_handler import save_temp_image, remove_temp_image, image_suffix
+
+logger = logging.getLogger(__name__)
+
+# Shared across requests so identical concurrent uploads run the model once
+inflight_analyses = SingleFlight()
+
+def pipeline_version(model: str) -> str:
+    """
+    Identifies everything besides the image and model that shapes the answer.
+
+    Args:
+        model: Name of the Ollama model to use
+
+    Returns:
+        Version string combining the prompt hash and preprocessing profile
+    """
+    version = get_prompt(model).hash
+    cascade = uses_cascade(model)
+    if cascade:
+        small = settings.cascade_small_model
+        version += (
+            f":cascade:{small}:{get_prompt(small).hash}:{settings.cascade_samples}"
+            f"x{settings.cascade_temperature}@{settings.cascade_min_agreement}"
+        )
+    if settings.preprocess_enabled:
+        profile = get_preprocess_profile(model)
+        version += f":pre{profile.max_side}q{profile.jpeg_quality}"
+        if cascade:
+            small_profile = get_preprocess_profile(settings.cascade_small_model)
+            version += f":small{small_profile.max_side}q{small_profile.jpeg_quality}"
+        if settings.person_crop_enabled:
+            version += f":crop{settings.person_crop_padding}"
+    return version
+
+async def prepare_image(image_bytes: bytes, model: str, metadata: Dict[str, Any]) -> Tuple[bytes, bool]:
+    """
+    Preprocesses an image for the model, recording the report in metadata.
+
+    Args:
+        image_bytes: Encoded image bytes as uploaded
+        model: Name of the Ollama model to use
+        metadata: Pipeline metadata to add the preprocessing report to
+
+    Returns:
+        Tuple of the image bytes to send and whether they were re-encoded as JPEG
+    """
+    if not settings.preprocess_enabled:
+        return image_bytes, False
+    try:
+        with timed("preprocess", model):
+            image_bytes, metadata["preprocess"] = await run_in_threadpool(preprocess_image, image_bytes, model)
+        return image_bytes, True
+    except OSError as e:
+        # Let Ollama decide what to do with images Pillow cannot decode
+        logger.warning(f"Skipping preprocessing: {e}")
+        return image_bytes, False
+
+@asynccontextmanager
+async def model_input(image_bytes: bytes, model: str, content_type: Optional[str], prepared: bool,
+                      metadata: Dict[str, Any]) -> AsyncIterator[Union[str, bytes]]:
+    """
+    Prepares an image for a model and provides what to send it.
+
+    Args:
+        image_bytes: Encoded image bytes as uploaded
+        model: Name of the Ollama model the image is for
+        content_type: MIME type of the upload, used to name the optional temp file
+        prepared: The image is already a JPEG sized for the model, so preprocessing is skipped
+        metadata: Pipeline metadata to add the preprocessing report to
+
+    Returns:
+        Async context manager yielding the image bytes, or the path of a temp file
+        holding them that is removed on exit
+    """
+    if prepared:
+        content_type = "image/jpeg"
+    else:
+        image_bytes, reencoded = await prepare_image(image_bytes, model, metadata)
+        if reencoded:
+            content_type = "image/jpeg"
+
+    # Images are sent to Ollama as bytes; the temp file is an opt-in fallback
+    if not settings.upload_to_temp_file:
+        yield image_bytes
+        return
+
+    with timed("temp_write", model):
+        temp_path = await run_in_threadpool(save_temp_image, image_bytes, image_suffix(content_type))
+    try:
+        yield temp_path
+    finally:
+        remove_temp_image(temp_path)
+
+async def run_pipeline(image_bytes: bytes, model: str, content_type: Optional[str] = None,
+                       prepared: bool = False) -> Tuple[ClothingAnalysis, Dict[str, Any]]:
+    """
+    Prepares an image and runs it through the model.
+
+    With the cascade, each tier gets the image prepared for its own model. A
+    prepared image (a person crop) is already sized for model and sent to both.
+
+    Args:
+        image_bytes: Encoded image bytes as uploaded
+        model: Name of the Ollama model to use
+        content_type: MIME type of the upload, used to name the optional temp file
+        prepared: The image is already a JPEG sized for the model, so preprocessing is skipped
+
+    Returns:
+        Tuple of the ClothingAnalysis and metadata describing the stages that ran
+    """
+    metadata: Dict[str, Any] = {}
+    inputs: Dict[Any, Union[str, bytes]] = {}
+    async with AsyncExitStack() as stack:
+        async def image_for(tier_model: str) -> Union[str, bytes]:
+            # Models with the same profile share one prepared image
+            key = None
+            if settings.preprocess_enabled and not prepared:
+                profile = get_preprocess_profile(tier_model)
+                key = (profile.max_side, profile.jpeg_quality)
+            if key not in inputs:
+                inputs[key] = await stack.enter_async_context(
+                    model_input(image_bytes, tier_model, content_type, prepared, metadata)
+                )
+            return inputs[key]
+
+        # Only answers that need the model are admission controlled, not cache hits
+        with get_admission_controller().admit(model):
+            if not uses_cascade(model):
+                return await analyze_image_async(await image_for(model), model), metadata
+            analysis, metadata["cascade"] = await analyze_cascade(image_for, model)
+            return analysis, metadata
+
+def phash_scope(model: str) -> str:
+    """Scope of near-duplicate matches: answers are only shared under the same model and pipeline."""
+    return f"{model}|{pipeline_version(model)}|{settings.model_temperature}"
+
+def _hash_and_query(image_bytes: bytes, model: str) -> Tuple[Optional[int], Optional[Tuple[int, ClothingAnalysis]]]:
+    try:
+        image_hash = perceptual_hash(image_bytes)
+    except OSError:
+        return None, None
+    return image_hash, phash_index.query(image_hash, phash_scope(model), settings.phash_max_distance)
+
+async def find_near_duplicate(image_bytes: bytes, model: str) -> Tuple[Optional[int], Optional[Tuple[int, ClothingAnalysis]]]:
+    """
+    Looks an image up in the near-duplicate index.
+
+    Args:
+        image_bytes: Encoded image bytes as uploaded
+        model: Name of the Ollama model to use
+
+    Returns:
+        Tuple of the image's pHash (None if it could not be computed or the index
+        is disabled) and the (distance, analysis) match, or None without a match
+    """
+    if not settings.phash_enabled:
+        return None, None
+    return await run_in_threadpool(_hash_and_query, image_bytes, model)
+
+async def remember_near_duplicate(image_hash: Optional[int], model: str, analysis: ClothingAnalysis) -> None:
+    """Adds a fresh analysis to the near-duplicate index."""
+    if image_hash is not None:
+        await run_in_threadpool(phash_index.add, image_hash, phash_scope(model), analysis)
+
+async def record_analysis(analysis: ClothingAnalysis, image_digest: str, model: str,
+                          source_id: Optional[str], cache: str) -> None:
+    """Adds a served analysis to the analysis store, when it is enabled."""
+    store = analytics_service.analysis_store
+    if store is None:
+        return
+    try:
+        await run_in_threadpool(store.record, analysis, image_digest, model, source_id, cache, current_request_timings())
+    except sqlite3.Error as e:
+        # Losing a record must not fail the request it describes
+        logger.warning(f"Could not record analysis of {image_digest}: {e}")
+
+async def analyze_cached(image_bytes: bytes, image_digest: str, model: str, content_type: Optional[str] = None,
+                         source_id: Optional[str] = None, prepared: bool = False) -> Tuple[ClothingAnalysis, Dict[str, Any]]:
+    """
+    Analyzes an image, answering from the result cache when possible.
+
+    Concurrent requests for the same image and model share one model call.
+    Every analysis served is added to the analysis store, when it is enabled.
+
+    Args:
+        image_bytes: Encoded image bytes as uploaded
+        image_digest: SHA-256 hex digest of the image bytes
+        model: Name of the Ollama model to use
+        content_type: MIME type of the upload
+        source_id: Camera or other source of the image, kept in the analysis store
+        prepared: The image was already preprocessed for the model, e.g. a person
+            crop; skips preprocessing, person cropping and the near-duplicate index
+
+    Returns:
+        Tuple of the ClothingAnalysis and metadata; metadata["cache"] is "HIT", "NEAR"
+        (answered from a near-duplicate image), "MISS" or "BYPASS" and
+        metadata["prompt_version"] names the prompt version used
+    """
+    analysis, metadata = await _analyze_cached(image_bytes, image_digest, model, content_type, prepared)
+    await record_analysis(analysis, image_digest, model, source_id, metadata["cache"])
+    return analysis, metadata
+
+async def _analyze_cached(image_bytes: bytes, image_digest: str, model: str, content_type: Optional[str],
+                          prepared: bool) -> Tuple[ClothingAnalysis, Dict[str, Any]]:
+    prompt_version = get_prompt(model).version
+    version = pipeline_version(model) + (":prepared" if prepared else "")
+    key = make_cache_key(image_digest, model, version, settings.model_temperature)
+
+    if not settings.cache_enabled:
+        analysis, metadata = await _run_shared(key, lambda: run_pipeline(image_bytes, model, content_type, prepared))
+        ANALYSES.inc(model, "BYPASS")
+        return analysis.model_copy(deep=True), {**metadata, "cache": "BYPASS", "prompt_version": prompt_version}
+
+    cached = await analysis_cache.get(key)
+    if cached is not None:
+        ANALYSES.inc(model, "HIT")
+        return cached, {"cache": "HIT", "prompt_version": prompt_version}
+
+    # Person crops can be near-duplicates of each other, so prepared images never share answers
+    image_hash, match = (None, None) if prepared else await find_near_duplicate(image_bytes, model)
+    if match is not None:
+        distance, analysis = match
+        await analysis_cache.set(key, analysis)
+        ANALYSES.inc(model, "NEAR")
+        return analysis, {"cache": "NEAR", "phash_distance": distance, "prompt_version": prompt_version}
+
+    async def run() -> Tuple[ClothingAnalysis, Dict[str, Any]]:
+        analysis, metadata = await run_pipeline(image_bytes, model, content_type, prepared)
+        await analysis_cache.set(key, analysis)
+        await remember_near_duplicate(image_hash, model, analysis)
+        return analysis, metadata
+
+    analysis, metadata = await _run_shared(key, run)
+    ANALYSES.inc(model, "MISS")
+    return analysis.model_copy(deep=True), {**metadata, "cache": "MISS", "prompt_version": prompt_version}
+
+async def _run_shared(key: str, run: Callable[[], Awaitable[Tuple[ClothingAnalysis, Dict[str, Any]]]]
+                      ) -> Tuple[ClothingAnalysis, Dict[str, Any]]:
+    # The shared call times its stages apart, and every caller adds them to its
+    # own timings, including callers that joined a call already in flight
+    async def timed_run() -> Tuple[Tuple[ClothingAnalysis, Dict[str, Any]], Dict[str, float]]:
+        stages = start_request_timings()
+        return await run(), stages
+
+    result, stages = await inflight_analyses.do(key, timed_run)
+    timings = current_request_timings()
+    if timings is not None:
+        for stage, seconds in stages.items():
+            timings[stage] = timings.get(stage, 0.0) + seconds
+    return result
+
+async def stream_analysis(image_bytes: bytes, image_digest: str, model: str,
+                          source_id: Optional[str] = None) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Analyzes an image, yielding partial results while the model generates.
+
+    A cached analysis, or that of a near-duplicate image, is returned at once; a
+    fresh one is cached when the stream completes. Streams are not coalesced,
+    since every caller wants its own tokens.
+
+    Args:
+        image_bytes: Encoded image bytes as uploaded
+        image_digest: SHA-256 hex digest of the image bytes
+        model: Name of the Ollama model to use
+        source_id: Camera or other source of the image, kept in the analysis store
+
+    Returns:
+        Async iterator of (event, data) pairs: ("metadata", dict) first, then the
+        events of analyze_image_stream ending with ("result", ClothingAnalysis)
+
+    Raises:
+        AdmissionError: Before the first event, if the model call is not admitted
+    """
+    prompt_version = get_prompt(model).version
+    key = make_cache_key(image_digest, model, pipeline_version(model), settings.model_temperature)
+
+    image_hash = None
+    if settings.cache_enabled:
+        cached = await analysis_cache.get(key)
+        if cached is not None:
+            ANALYSES.inc(model, "HIT")
+            yield "metadata", {"cache": "HIT", "prompt_version": prompt_version}
+            await record_analysis(cached, image_digest, model, source_id, "HIT")
+            yield "result", cached
+            return
+        image_hash, match = await find_near_duplicate(image_bytes, model)
+        if match is not None:
+            distance, analysis = match
+            await analysis_cache.set(key, analysis)
+            ANALYSES.inc(model, "NEAR")
+            yield "metadata", {"cache": "NEAR", "phash_distance": distance, "prompt_version": prompt_version}
+            await record_analysis(analysis, image_digest, model, source_id, "NEAR")
+            yield "result", analysis
+            return
+
+    cache_status = "MISS" if settings.cache_enabled else "BYPASS"
+    metadata: Dict[str, Any] = {"cache": cache_status, "prompt_version": prompt_version}
+    image_bytes, _ = await prepare_image(image_bytes, model, metadata)
+    # Admitted before the first event, so a rejection can still be answered with a status code
+    with get_admission_controller().admit(model):
+        yield "metadata", metadata
+
+        async for event, data in analyze_image_stream(image_bytes, model):
+            if event == "result":
+                ANALYSES.inc(model, cache_status)
+                if settings.cache_enabled:
+                    await analysis_cache.set(key, data)
+                    await remember_near_duplicate(image_hash, model, data)
+                    data = data.model_copy(deep=True)
+                await record_analysis(data, image_digest, model, source_id, cache_status)
+            yield event, data
@@ -0,0 +1,292 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.core.settings import settings
+from app.schemas.clothing import ClothingAnalysis
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PERCENTILES = (10, 50, 90)
+
+class AnalysisStore:
+    """
+    SQLite record of every analysis served.
+
+    Each row keeps the image digest, model, source (e.g. a camera id), cache
+    outcome, stage timings, scored CLO value and full analysis. Garments go to a
+    child table so "all analyses with a coat" is an index lookup. Queries return
+    columns, not rows, so aggregates run as NumPy array operations.
+    """
+
+    def __init__(self, db_path: str):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS analyses ("
+                "id INTEGER PRIMARY KEY, created_at REAL NOT NULL, image_digest TEXT NOT NULL, "
+                "model TEXT NOT NULL, source_id TEXT, cache TEXT, clo REAL NOT NULL, "
+                "sleeve_length TEXT, timings TEXT, analysis TEXT NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_garments ("
+                "analysis_id INTEGER NOT NULL REFERENCES analyses (id) ON DELETE CASCADE, "
+                "garment TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS analyses_time ON analyses (created_at)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS analyses_model ON analyses (model, created_at)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS analyses_source ON analyses (source_id, created_at)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS analyses_digest ON analyses (image_digest)")
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS garments_garment ON analysis_garments (garment, created_at, analysis_id)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS garments_analysis ON analysis_garments (analysis_id)")
+
+    def record(self, analysis: ClothingAnalysis, image_digest: str, model: str, source_id: Optional[str] = None,
+               cache: Optional[str] = None, timings: Optional[Dict[str, float]] = None) -> int:
+        """
+        Stores an analysis.
+
+        Args:
+            analysis: The analysis as returned to the client
+            image_digest: SHA-256 hex digest of the uploaded image
+            model: Name of the Ollama model requested
+            source_id: Camera or other source the image came from
+            cache: Cache outcome of the request ("HIT", "NEAR", "MISS" or "BYPASS")
+            timings: Stage name to seconds
+
+        Returns:
+            Id of the new record
+        """
+        created_at = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                cursor = self._db.execute(
+                    "INSERT INTO analyses (created_at, image_digest, model, source_id, cache, clo, "
+                    "sleeve_length, timings, analysis) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (created_at, image_digest, model, source_id, cache, analysis.clo_insulation,
+                     analysis.sleeve_length, json.dumps(timings) if timings else None, analysis.model_dump_json())
+                )
+                record_id = cursor.lastrowid
+                self._db.executemany(
+                    "INSERT INTO analysis_garments (analysis_id, garment, created_at) VALUES (?, ?, ?)",
+                    [(record_id, garment, created_at) for garment in set(analysis.clothing_type)]
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return record_id
+
+    @staticmethod
+    def _filters(since: Optional[float], until: Optional[float], model: Optional[str],
+                 source_id: Optional[str], garment: Optional[str]) -> Tuple[str, List[Any]]:
+        clauses, params = [], []
+        for clause, value in (("a.created_at >= ?", since), ("a.created_at < ?", until),
+                              ("a.model = ?", model), ("a.source_id = ?", source_id)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        if garment is not None:
+            clauses.append("a.id IN (SELECT analysis_id FROM analysis_garments WHERE garment = ?)")
+            params.append(garment)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def columns(self, since: Optional[float] = None, until: Optional[float] = None, model: Optional[str] = None,
+                source_id: Optional[str] = None, garment: Optional[str] = None) -> Dict[str, np.ndarray]:
+        """
+        Loads the matching records as columns.
+
+        Args:
+            since: Earliest creation time (Unix seconds), inclusive
+            until: Latest creation time (Unix seconds), exclusive
+            model: Only records of this model
+            source_id: Only records from this source
+            garment: Only records listing this clothing type
+
+        Returns:
+            Dictionary of arrays sorted by time: "id" (int64), "created_at" and "clo"
+            (float64), plus "garments" holding one entry per garment per record
+        """
+        where, params = self._filters(since, until, model, source_id, garment)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT a.id, a.created_at, a.clo FROM analyses a{where} ORDER BY a.created_at", params
+            ).fetchall()
+            garment_rows = self._db.execute(
+                f"SELECT g.garment FROM analysis_garments g "
+                f"WHERE g.analysis_id IN (SELECT a.id FROM analyses a{where})", params
+            ).fetchall()
+        table = np.array(rows, dtype=np.float64).reshape(-1, 3)
+        return {
+            "id": table[:, 0].astype(np.int64),
+            "created_at": table[:, 1],
+            "clo": table[:, 2],
+            "garments": np.array([row[0] for row in garment_rows], dtype=object),
+        }
+
+    def query(self, since: Optional[float] = None, until: Optional[float] = None, model: Optional[str] = None,
+              source_id: Optional[str] = None, garment: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Returns the newest matching records, with the same filters as columns().
+
+        Args:
+            limit: Maximum number of records
+
+        Returns:
+            List of records, newest first
+        """
+        where, params = self._filters(since, until, model, source_id, garment)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT a.id, a.created_at, a.image_digest, a.model, a.source_id, a.cache, a.timings, a.analysis "
+                f"FROM analyses a{where} ORDER BY a.created_at DESC LIMIT ?", params + [limit]
+            ).fetchall()
+        return [
+            {
+                "id": row[0],
+                "created_at": row[1],
+                "image_digest": row[2],
+                "model": row[3],
+                "source_id": row[4],
+                "cache": row[5],
+                "timings": json.loads(row[6]) if row[6] else None,
+                "analysis": json.loads(row[7]),
+            }
+            for row in rows
+        ]
+
+    def prune(self, before: float) -> int:
+        """Deletes records created before the given Unix time and returns how many were removed."""
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.execute("DELETE FROM analysis_garments WHERE created_at < ?", (before,))
+                removed = self._db.execute("DELETE FROM analyses WHERE created_at < ?", (before,)).rowcount
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return removed
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+def rolling_percentiles(times: np.ndarray, values: np.ndarray, start: float, end: float, window: float,
+                        step: float, percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> List[Dict[str, Any]]:
+    """
+    Computes percentiles of values over a window sliding across time.
+
+    Args:
+        times: Sorted sample times
+        values: Sample values, aligned with times
+        start: Time of the first window's end
+        end: Time of the last window's end
+        window: Length of each window in seconds
+        step: Seconds between window ends
+        percentiles: Percentiles to compute, 0-100
+
+    Returns:
+        One entry per window end with the sample count and each percentile
+        (None for windows without samples)
+    """
+    ends = np.arange(start, end + step / 2, step)
+    # Window boundaries for every step at once
+    lower = np.searchsorted(times, ends - window, side="left")
+    upper = np.searchsorted(times, ends, side="right")
+    points = []
+    for t, lo, hi in zip(ends, lower, upper):
+        point: Dict[str, Any] = {"t": float(t), "count": int(hi - lo)}
+        if hi > lo:
+            for p, value in zip(percentiles, np.percentile(values[lo:hi], percentiles)):
+                point[f"p{p:g}"] = round(float(value), 3)
+        else:
+            point.update({f"p{p:g}": None for p in percentiles})
+        points.append(point)
+    return points
+
+def garment_frequencies(garments: np.ndarray, records: int) -> Dict[str, Dict[str, float]]:
+    """
+    Counts how often each clothing type was seen.
+
+    Args:
+        garments: One entry per (record, garment) pair
+        records: Number of records the pairs belong to
+
+    Returns:
+        Garment to its count and its share of records, most frequent first
+    """
+    names, counts = np.unique(garments.astype(str), return_counts=True)
+    order = np.argsort(-counts, kind="stable")
+    return {
+        str(names[i]): {"count": int(counts[i]), "share": round(float(counts[i]) / records, 4)}
+        for i in order
+    }
+
+def summarize(columns: Dict[str, np.ndarray], start: float, end: float, window: float, step: float,
+              percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, Any]:
+    """
+    Aggregates stored analyses for dashboards.
+
+    Args:
+        columns: Output of AnalysisStore.columns
+        start: Start of the period in Unix seconds
+        end: End of the period in Unix seconds
+        window: Length of the rolling window in seconds
+        step: Seconds between rolling points
+        percentiles: CLO percentiles to compute, 0-100
+
+    Returns:
+        Dictionary with the record count, overall CLO statistics, rolling CLO
+        percentiles and garment frequencies
+    """
+    clo = columns["clo"]
+    overall: Dict[str, Any] = {"mean": None, **{f"p{p:g}": None for p in percentiles}}
+    if len(clo):
+        overall["mean"] = round(float(clo.mean()), 3)
+        for p, value in zip(percentiles, np.percentile(clo, percentiles)):
+            overall[f"p{p:g}"] = round(float(value), 3)
+    return {
+        "count": int(len(clo)),
+        "since": start,
+        "until": end,
+        "clo": overall,
+        "rolling": {
+            "window_seconds": window,
+            "step_seconds": step,
+            "points": rolling_percentiles(
+                columns["created_at"], clo, min(start + window, end), end, window, step, percentiles
+            ),
+        },
+        "garments": garment_frequencies(columns["garments"], len(clo)) if len(clo) else {},
+    }
+
+analysis_store: Optional[AnalysisStore] = None
+
+def open_analysis_store() -> None:
+    """Opens the analysis store if enabled, dropping expired records; called on application startup."""
+    global analysis_store
+    if settings.store_enabled and analysis_store is None:
+        analysis_store = AnalysisStore(settings.store_db_path)
+        if settings.store_retention_days > 0:
+            removed = analysis_store.prune(time.time() - settings.store_retention_days * 86400)
+            if removed:
+                logger.info(f"Removed {removed} analyses older than {settings.store_retention_days} days")
+
+def close_analysis_store() -> None:
+    """Closes the analysis store; called on application shutdown."""
+    global analysis_store
+    if analysis_store is not None:
+        analysis_store.close()
+        analysis_store = None
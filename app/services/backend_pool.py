@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+import httpx
+import ollama
+from app.core.settings import settings, OllamaBackend
+
+logger = logging.getLogger(__name__)
+
+# Errors meaning the request never reached the model, so another host may take it
+CONNECTION_ERRORS = (ConnectionError, httpx.ConnectError)
+
+def normalize_model_name(model: str) -> str:
+    """Adds the implicit ':latest' tag Ollama reports for untagged models."""
+    return model if ":" in model else f"{model}:latest"
+
+class Backend:
+    """One Ollama host with its persistent client and last known state."""
+
+    def __init__(self, config: OllamaBackend, timeout: float):
+        self.host = config.host
+        self.weight = config.weight
+        self.max_concurrency = config.max_concurrency
+        self.client = ollama.AsyncClient(host=config.host, timeout=timeout)
+        self.healthy = True
+        self.available_models: Set[str] = set()
+        self.loaded_models: Set[str] = set()
+        # Monotonic time of the last request per model
+        self.last_used: Dict[str, float] = {}
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.last_check: Optional[float] = None
+
+    @property
+    def load(self) -> float:
+        return self.in_flight / self.weight
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "host": self.host,
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "loaded_models": sorted(self.loaded_models),
+            "last_check": self.last_check,
+        }
+
+class BackendPool:
+    """
+    Routes Ollama calls across several hosts.
+
+    Each host is health-checked in the background through /api/tags (models
+    installed) and /api/ps (models loaded in memory). A request goes to the least
+    loaded healthy host that already has its model loaded, then to hosts that have
+    it installed, and moves on to the next host if the connection fails.
+    """
+
+    def __init__(self, configs: List[OllamaBackend], timeout: float):
+        self.backends = [Backend(config, timeout) for config in configs]
+        self._health_task: Optional[asyncio.Task] = None
+
+    async def check(self, backend: Backend) -> None:
+        """
+        Refreshes the health and model lists of one backend.
+
+        Args:
+            backend: Backend to check
+        """
+        try:
+            tags, ps = await asyncio.wait_for(
+                asyncio.gather(backend.client.list(), backend.client.ps()),
+                timeout=settings.backend_health_timeout
+            )
+            backend.available_models = {model.model for model in tags.models}
+            backend.loaded_models = {model.model for model in ps.models}
+            if not backend.healthy:
+                logger.info(f"Ollama backend {backend.host} is healthy again")
+            backend.healthy = True
+        except Exception as e:
+            if backend.healthy:
+                logger.warning(f"Ollama backend {backend.host} failed its health check: {e}")
+            backend.healthy = False
+        backend.last_check = time.time()
+
+    async def check_all(self) -> None:
+        await asyncio.gather(*(self.check(backend) for backend in self.backends))
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.backend_health_interval)
+            await self.check_all()
+
+    async def start(self) -> None:
+        """Runs a first health check and starts checking in the background."""
+        await self.check_all()
+        self._health_task = asyncio.create_task(self._health_loop())
+
+    async def stop(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+
+    def pick(self, model: str, exclude: Set[str] = frozenset()) -> Optional[Backend]:
+        """
+        Chooses the backend for a request.
+
+        Args:
+            model: Name of the model the request will run
+            exclude: Hosts already tried for this request
+
+        Returns:
+            The chosen backend, or None if every backend was excluded
+        """
+        candidates = [b for b in self.backends if b.host not in exclude]
+        # Health information may be stale; unhealthy hosts are still better than none
+        candidates = [b for b in candidates if b.healthy] or candidates
+        if not candidates:
+            return None
+
+        name = normalize_model_name(model)
+        resident = [b for b in candidates if name in b.loaded_models]
+        installed = [b for b in candidates if name in b.available_models or not b.available_models]
+        group = resident or installed or candidates
+        return min(group, key=lambda b: (b.in_flight >= b.max_concurrency, b.load, -b.weight))
+
+    async def chat(self, model: str, **kwargs) -> Any:
+        """
+        Sends a chat request to the best backend, failing over on connection errors.
+
+        Args:
+            model: Name of the model to run
+            **kwargs: Arguments passed on to AsyncClient.chat
+
+        Returns:
+            The chat response
+        """
+        tried: Set[str] = set()
+        last_error: Optional[BaseException] = None
+        while True:
+            backend = self.pick(model, tried)
+            if backend is None:
+                raise last_error or ConnectionError("No Ollama backend configured")
+            tried.add(backend.host)
+            backend.in_flight += 1
+            backend.requests += 1
+            backend.last_used[model] = time.monotonic()
+            try:
+                response = await backend.client.chat(model=model, **kwargs)
+            except CONNECTION_ERRORS as e:
+                logger.warning(f"Ollama backend {backend.host} unreachable, trying another host: {e}")
+                backend.healthy = False
+                backend.failures += 1
+                last_error = e
+                continue
+            finally:
+                backend.in_flight -= 1
+            backend.loaded_models.add(normalize_model_name(model))
+            return response
+
+    async def chat_stream(self, model: str, **kwargs) -> AsyncIterator[Any]:
+        """
+        Streams a chat response from the best backend.
+
+        Fails over on connection errors until the first chunk arrives; the backend
+        counts as busy until the stream is exhausted or closed.
+
+        Args:
+            model: Name of the model to run
+            **kwargs: Arguments passed on to AsyncClient.chat
+
+        Returns:
+            Async iterator of response chunks
+        """
+        tried: Set[str] = set()
+        last_error: Optional[BaseException] = None
+        while True:
+            backend = self.pick(model, tried)
+            if backend is None:
+                raise last_error or ConnectionError("No Ollama backend configured")
+            tried.add(backend.host)
+            backend.in_flight += 1
+            backend.requests += 1
+            backend.last_used[model] = time.monotonic()
+            try:
+                stream = await backend.client.chat(model=model, stream=True, **kwargs)
+                first = await stream.__anext__()
+            except CONNECTION_ERRORS as e:
+                logger.warning(f"Ollama backend {backend.host} unreachable, trying another host: {e}")
+                backend.healthy = False
+                backend.failures += 1
+                backend.in_flight -= 1
+                last_error = e
+                continue
+            except BaseException:
+                backend.in_flight -= 1
+                raise
+            try:
+                yield first
+                async for chunk in stream:
+                    yield chunk
+                backend.loaded_models.add(normalize_model_name(model))
+            finally:
+                backend.in_flight -= 1
+            return
+
+    @property
+    def capacity(self) -> int:
+        """Total number of concurrent requests the backends accept."""
+        return sum(backend.max_concurrency for backend in self.backends)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [backend.stats() for backend in self.backends]
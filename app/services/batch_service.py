@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import io
+import os
+import tarfile
+import threading
+import zipfile
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Tuple
+from fastapi.concurrency import run_in_threadpool
+from app.core.settings import settings
+from app.services.analysis_service import analyze_cached
+from app.utils.file_handler import IMAGE_SUFFIXES
+
+# (name, zero-argument function returning the image bytes)
+BatchItem = Tuple[str, Callable[[], bytes]]
+
+IMAGE_EXTENSIONS = set(IMAGE_SUFFIXES.values()) | {".jpeg"}
+
+class BatchError(Exception):
+    """Raised when a batch request cannot be processed at all."""
+
+def is_image_name(name: str) -> bool:
+    """Tells whether an archive member looks like an image file."""
+    base = os.path.basename(name)
+    if not base or base.startswith(".") or "__MACOSX" in name:
+        return False
+    return os.path.splitext(base)[1].lower() in IMAGE_EXTENSIONS
+
+def iter_archive_images(data: bytes, filename: str) -> Iterator[BatchItem]:
+    """
+    Lists the images inside a zip or tar archive.
+
+    Members are only decompressed when their loader is called, so a large archive
+    is never fully expanded in memory. Loaders may be called from several threads;
+    reads from the shared archive are serialized.
+
+    Args:
+        data: Archive bytes
+        filename: Archive file name, used in error messages
+
+    Returns:
+        Iterator of (member name, loader) pairs
+
+    Raises:
+        BatchError: If the archive format is not recognized
+    """
+    buffer = io.BytesIO(data)
+    lock = threading.Lock()
+    if zipfile.is_zipfile(buffer):
+        archive = zipfile.ZipFile(buffer)
+        for info in archive.infolist():
+            if not info.is_dir() and is_image_name(info.filename):
+                if info.file_size > settings.max_upload_bytes:
+                    yield info.filename, _too_large(info.filename)
+                else:
+                    yield info.filename, (lambda info=info: _locked(lock, archive.read, info))
+        return
+
+    buffer.seek(0)
+    try:
+        archive = tarfile.open(fileobj=buffer, mode="r:*")
+    except tarfile.TarError:
+        raise BatchError(f"{filename} is not a zip or tar archive")
+    for member in archive.getmembers():
+        if member.isfile() and is_image_name(member.name):
+            if member.size > settings.max_upload_bytes:
+                yield member.name, _too_large(member.name)
+            else:
+                yield member.name, (lambda member=member: _locked(lock, _read_member, archive, member))
+
+def _locked(lock: threading.Lock, read: Callable[..., bytes], *args: Any) -> bytes:
+    with lock:
+        return read(*args)
+
+def _read_member(archive: tarfile.TarFile, member: tarfile.TarInfo) -> bytes:
+    return archive.extractfile(member).read()
+
+def _too_large(name: str) -> Callable[[], bytes]:
+    return rejected_item(name, f"{name} exceeds the {settings.max_upload_bytes} byte limit")[1]
+
+def rejected_item(name: str, message: str) -> BatchItem:
+    """
+    Makes a batch item that reports an error instead of being analyzed.
+
+    Lets a single unusable part of a batch show up as an error line rather than
+    failing the whole request.
+
+    Args:
+        name: Name of the item
+        message: Error to report for it
+
+    Returns:
+        (name, loader) pair whose loader raises BatchError
+    """
+    def load() -> bytes:
+        raise BatchError(message)
+    return name, load
+
+async def _analyze_item(index: int, name: str, load: Callable[[], bytes], model: str) -> Dict[str, Any]:
+    try:
+        # Decompressing an archive member can take a while
+        image_bytes = await run_in_threadpool(load)
+        image_digest = hashlib.sha256(image_bytes).hexdigest()
+        analysis, metadata = await analyze_cached(image_bytes, image_digest, model)
+        return {
+            "index": index,
+            "filename": name,
+            "status": "ok",
+            "cache": metadata["cache"],
+            "prompt_version": metadata["prompt_version"],
+            "result": analysis.model_dump(),
+        }
+    except Exception as e:
+        return {
+            "index": index,
+            "filename": name,
+            "status": "error",
+            "error": str(e) or type(e).__name__,
+        }
+
+async def analyze_batch(items: List[BatchItem], model: str, concurrency: int) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Analyzes many images, yielding each result as soon as it is ready.
+
+    Results arrive in completion order; each carries the index of its item. A
+    failing item yields an error entry instead of stopping the batch.
+
+    Args:
+        items: (name, loader) pairs of the images to analyze
+        model: Name of the Ollama model to use
+        concurrency: Maximum number of items in flight at once
+
+    Returns:
+        Async iterator of per-item result dictionaries
+    """
+    pending = set()
+    queue = iter(enumerate(items))
+    try:
+        while True:
+            for index, (name, load) in queue:
+                pending.add(asyncio.ensure_future(_analyze_item(index, name, load, model)))
+                if len(pending) >= concurrency:
+                    break
+            if not pending:
+                return
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        # The client went away or the stream was closed early
+        for task in pending:
+            task.cancel()
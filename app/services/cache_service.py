@@ -0,0 +1,180 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from app.schemas.clothing import ClothingAnalysis
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+def make_cache_key(image_digest: str, model: str, pipeline_version: str, temperature: float) -> str:
+    """
+    Builds the cache key for an analysis.
+
+    Args:
+        image_digest: SHA-256 hex digest of the image bytes
+        model: Name of the Ollama model
+        pipeline_version: Identifies the prompts, JSON schema and preprocessing applied
+        temperature: Sampling temperature used for generation
+
+    Returns:
+        Hex digest identifying the analysis
+    """
+    raw = f"{image_digest}|{model}|{pipeline_version}|{temperature}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class AnalysisCache:
+    """
+    Two-tier cache of ClothingAnalysis results.
+
+    The memory tier is an LRU bounded by max_entries. The optional disk tier is a
+    SQLite table that survives restarts. Both tiers expire entries after ttl_seconds
+    (0 disables expiry).
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 0, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._memory: "OrderedDict[str, Tuple[float, ClothingAnalysis]]" = OrderedDict()
+        # Guards the memory tier and counters; the connection has its own lock so
+        # a slow disk write in the threadpool never holds up memory lookups
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if db_path:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS analyses ("
+                "key TEXT PRIMARY KEY, created_at REAL NOT NULL, analysis TEXT NOT NULL)"
+            )
+            self._db.commit()
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - created_at > self.ttl_seconds
+
+    async def get(self, key: str) -> Optional[ClothingAnalysis]:
+        """
+        Looks up an analysis, checking memory first and then disk.
+
+        The memory tier is checked inline; the disk tier runs in the threadpool so
+        its reads and expiry deletes never block the event loop.
+
+        Args:
+            key: Cache key from make_cache_key
+
+        Returns:
+            A copy of the cached ClothingAnalysis, or None on a miss
+        """
+        analysis = self._get_memory(key)
+        if analysis is None and self._db is not None:
+            analysis = await run_in_threadpool(self._get_disk, key)
+        if analysis is None:
+            with self._lock:
+                self.misses += 1
+        return analysis
+
+    async def set(self, key: str, analysis: ClothingAnalysis) -> None:
+        """
+        Stores an analysis in both tiers.
+
+        The memory tier is updated at once; the disk write and its commit run in
+        the threadpool.
+
+        Args:
+            key: Cache key from make_cache_key
+            analysis: ClothingAnalysis to store
+        """
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, created_at, analysis.model_copy(deep=True))
+        if self._db is not None:
+            await run_in_threadpool(self._write_disk, key, created_at, analysis.model_dump_json())
+
+    def _get_memory(self, key: str) -> Optional[ClothingAnalysis]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            created_at, analysis = entry
+            if self._expired(created_at):
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return analysis.model_copy(deep=True)
+
+    def _get_disk(self, key: str) -> Optional[ClothingAnalysis]:
+        with self._db_lock:
+            row = self._db.execute("SELECT created_at, analysis FROM analyses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            created_at, payload = row
+            if self._expired(created_at):
+                self._db.execute("DELETE FROM analyses WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+        analysis = ClothingAnalysis.model_validate_json(payload)
+        with self._lock:
+            self._remember(key, created_at, analysis)
+            self.hits += 1
+            self.disk_hits += 1
+        return analysis.model_copy(deep=True)
+
+    def _write_disk(self, key: str, created_at: float, payload: str) -> None:
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO analyses (key, created_at, analysis) VALUES (?, ?, ?)",
+                (key, created_at, payload)
+            )
+            self._db.commit()
+
+    def _remember(self, key: str, created_at: float, analysis: ClothingAnalysis) -> None:
+        self._memory[key] = (created_at, analysis)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self) -> None:
+        """Removes every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM analyses")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns hit/miss counters for the cache.
+
+        Returns:
+            Dictionary with hits, disk hits, misses, hit ratio and memory size
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+analysis_cache = AnalysisCache(
+    max_entries=settings.cache_max_entries,
+    ttl_seconds=settings.cache_ttl_seconds,
+    db_path=settings.cache_db_path,
+)
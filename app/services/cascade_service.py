@@ -0,0 +1,162 @@
+import asyncio
+import itertools
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Tuple, Union
+from app.core.settings import settings
+from app.schemas.clothing import ClothingAnalysis
+from app.services.backend_pool import normalize_model_name
+from app.services.metrics import Counter, METRICS
+from app.services.ollama_service import analyze_image_async
+
+logger = logging.getLogger(__name__)
+
+# Sleeved garments that contradict a sleeveless answer
+SLEEVED_OUTERWEAR = {"sweater", "hoodie", "jacket", "coat", "blazer", "suit", "cardigan"}
+
+CASCADE_TIERS = Counter("clothing_cascade_total", "Cascade analyses by the tier that answered", ("model", "tier"))
+METRICS.append(CASCADE_TIERS)
+
+cascade_totals = {"small": 0, "large": 0}
+_totals_lock = threading.Lock()
+
+def uses_cascade(model: str) -> bool:
+    """Tells whether requests for model try the small model first."""
+    return settings.cascade_enabled and normalize_model_name(model) != normalize_model_name(settings.cascade_small_model)
+
+def _jaccard(a: List[str], b: List[str]) -> float:
+    left, right = set(a) - {"none"}, set(b) - {"none"}
+    if not left and not right:
+        return 1.0
+    return len(left & right) / len(left | right)
+
+def field_agreement(a: ClothingAnalysis, b: ClothingAnalysis) -> float:
+    """
+    Scores how closely two analyses agree on the structured fields.
+
+    Args:
+        a: First analysis
+        b: Second analysis
+
+    Returns:
+        Agreement between 0 and 1, averaged over clothing type, sleeve length,
+        glasses, headwear and accessories
+    """
+    scores = [
+        _jaccard(a.clothing_type, b.clothing_type),
+        float(a.sleeve_length == b.sleeve_length),
+        float(a.glasses == b.glasses),
+        float(a.headwear == b.headwear),
+        _jaccard(a.accessories, b.accessories),
+    ]
+    return sum(scores) / len(scores)
+
+def agreement(analyses: List[ClothingAnalysis]) -> float:
+    """Returns the mean pairwise agreement of the samples, 1.0 for a single one."""
+    pairs = list(itertools.combinations(analyses, 2))
+    if not pairs:
+        return 1.0
+    return sum(field_agreement(a, b) for a, b in pairs) / len(pairs)
+
+def sanity_issues(analysis: ClothingAnalysis) -> List[str]:
+    """
+    Checks an analysis for answers that are valid per the schema but implausible.
+
+    Args:
+        analysis: Analysis to check
+
+    Returns:
+        Descriptions of the problems found, empty if none
+    """
+    issues = []
+    if not analysis.clothing_type:
+        issues.append("no clothing detected")
+    if analysis.sleeve_length == "unknown":
+        issues.append("unknown sleeve length")
+    if analysis.sleeve_length == "sleeveless" and SLEEVED_OUTERWEAR & set(analysis.clothing_type):
+        issues.append("sleeveless answer with sleeved garments")
+    if "none" in analysis.accessories and len(analysis.accessories) > 1:
+        issues.append("'none' listed with other accessories")
+    return issues
+
+def _representative(analyses: List[ClothingAnalysis]) -> ClothingAnalysis:
+    # The sample agreeing most with the others
+    return max(analyses, key=lambda a: sum(field_agreement(a, b) for b in analyses if b is not a))
+
+def _count_tier(model: str, tier: str) -> None:
+    with _totals_lock:
+        cascade_totals[tier] += 1
+    CASCADE_TIERS.inc(model, tier)
+
+async def analyze_cascade(image_for: Callable[[str], Awaitable[Union[str, bytes]]],
+                          model: str) -> Tuple[ClothingAnalysis, Dict[str, Any]]:
+    """
+    Answers with the small model when it is confident, escalating to model otherwise.
+
+    The small model is sampled settings.cascade_samples times. Its answer is kept
+    when the samples agree on the structured fields at least
+    settings.cascade_min_agreement and the chosen sample passes the sanity checks;
+    invalid output from the small model always escalates.
+
+    Each tier is sent the image prepared with its own preprocessing profile, so
+    the small model is not fed the large model's resolution; the large model's
+    image is only prepared when the cascade escalates.
+
+    Args:
+        image_for: Returns the image prepared for a model, as bytes or a file path
+        model: Name of the large model to escalate to
+
+    Returns:
+        Tuple of the ClothingAnalysis and cascade metadata: the tier that answered,
+        the agreement score and the reasons for escalating
+    """
+    small = settings.cascade_small_model
+    samples = settings.cascade_samples
+    # Identical samples say nothing about confidence, so several samples need some randomness
+    temperature = settings.cascade_temperature if samples > 1 else None
+    reasons: List[str] = []
+    score = 0.0
+    image = await image_for(small)
+    results = await asyncio.gather(
+        *(analyze_image_async(image, small, temperature=temperature) for _ in range(samples)),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, BaseException) and not isinstance(result, ValueError):
+            raise result
+    invalid = [result for result in results if isinstance(result, ValueError)]
+    if invalid:
+        # Output that is not valid JSON or breaks the schema's literals
+        reasons.append(f"invalid output from {small}: {type(invalid[0]).__name__}")
+    else:
+        analyses = list(results)
+        score = agreement(analyses)
+        chosen = _representative(analyses)
+        if score < settings.cascade_min_agreement:
+            reasons.append(f"agreement {score:.2f} below {settings.cascade_min_agreement}")
+        reasons.extend(sanity_issues(chosen))
+        if not reasons:
+            _count_tier(model, "small")
+            return chosen, {"tier": "small", "model": small, "agreement": round(score, 3), "reasons": []}
+
+    logger.info(f"Escalating from {small} to {model}: {'; '.join(reasons)}")
+    analysis = await analyze_image_async(await image_for(model), model)
+    _count_tier(model, "large")
+    return analysis, {"tier": "large", "model": model, "agreement": round(score, 3), "reasons": reasons}
+
+def cascade_stats() -> Dict[str, Any]:
+    """
+    Returns how often the cascade escalated.
+
+    Returns:
+        Dictionary with answers per tier and the escalation rate
+    """
+    with _totals_lock:
+        totals = dict(cascade_totals)
+    total = totals["small"] + totals["large"]
+    return {
+        "enabled": settings.cascade_enabled,
+        "small_model": settings.cascade_small_model,
+        **totals,
+        "escalation_rate": totals["large"] / total if total else 0.0,
+    }
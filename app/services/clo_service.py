@@ -1,9 +1,23 @@
+import logging
 import os
+import threading
+import time
 import yaml
-from typing import List, Dict, Tuple, Any, Optional
+import numpy as np
+from typing import List, Dict, Tuple, Any, Optional, Sequence
 from app.schemas.clothing import ClothingAnalysis
 
-def load_clo_values(yaml_file: str = 'clo_values.yaml') -> Dict[str, Any]:
+logger = logging.getLogger(__name__)
+
+# Resolved against the project root so scoring does not depend on the working directory
+CLO_VALUES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'clo_values.yaml')
+
+# Define lower body items for detection
+LOWER_BODY_ITEMS = ("pants", "dress pants", "jeans", "trousers", "shorts", "skirt", "leggings", "joggers")
+
+SHIRT_ITEMS = ("t-shirt", "shirt", "polo t-shirt")
+
+def load_clo_values(yaml_file: str = CLO_VALUES_PATH) -> Dict[str, Any]:
     """
     Load CLO values from a YAML file.
     
@@ -21,7 +35,7 @@ def load_clo_values(yaml_file: str = 'clo_values.yaml') -> Dict[str, Any]:
     
     return clo_data
 
-def get_clothing_clo_values(yaml_file: str = 'clo_values.yaml') -> Dict[str, float]:
+def get_clothing_clo_values(yaml_file: str = CLO_VALUES_PATH) -> Dict[str, float]:
     """
     Returns a dictionary mapping clothing items to their CLO values.
     
@@ -34,7 +48,7 @@ def get_clothing_clo_values(yaml_file: str = 'clo_values.yaml') -> Dict[str, flo
     clo_data = load_clo_values(yaml_file)
     return clo_data.get('clo_values', {})
 
-def get_base_clo_value(yaml_file: str = 'clo_values.yaml') -> float:
+def get_base_clo_value(yaml_file: str = CLO_VALUES_PATH) -> float:
     """
     Returns the base CLO value for a nude person.
     
@@ -47,7 +61,217 @@ def get_base_clo_value(yaml_file: str = 'clo_values.yaml') -> float:
     clo_data = load_clo_values(yaml_file)
     return clo_data.get('base_clo', 0.0)
 
-def calculate_clo_value(analysis: ClothingAnalysis, yaml_file: str = 'clo_values.yaml') -> float:
+def validate_clo_values(clo_data: Any, yaml_file: str) -> Tuple[float, Dict[str, float]]:
+    """
+    Checks the structure of a CLO values table.
+
+    Args:
+        clo_data: Parsed YAML content
+        yaml_file: Path of the file, used in error messages
+
+    Returns:
+        Tuple of the base CLO value and the item to CLO value mapping
+
+    Raises:
+        ValueError: If the table is malformed
+    """
+    if not isinstance(clo_data, dict):
+        raise ValueError(f"{yaml_file}: expected a mapping at the top level")
+
+    base_clo = clo_data.get('base_clo', 0.0)
+    if not isinstance(base_clo, (int, float)) or isinstance(base_clo, bool) or base_clo < 0:
+        raise ValueError(f"{yaml_file}: base_clo must be a non-negative number")
+
+    clo_values = clo_data.get('clo_values', {}) or {}
+    if not isinstance(clo_values, dict):
+        raise ValueError(f"{yaml_file}: clo_values must be a mapping")
+    for item, value in clo_values.items():
+        if not isinstance(value, (int, float)) or isinstance(value, bool) or value < 0:
+            raise ValueError(f"{yaml_file}: CLO value of '{item}' must be a non-negative number")
+
+    return float(base_clo), {str(item): float(value) for item, value in clo_values.items()}
+
+class CloTable:
+    """A CLO values table compiled into integer indices."""
+
+    def __init__(self, base_clo: float, clo_mapping: Dict[str, float], mtime: float):
+        self.base_clo = base_clo
+        self.mtime = mtime
+        self.vocabulary: Dict[str, int] = {item: i for i, item in enumerate(clo_mapping)}
+        self.values = np.array(list(clo_mapping.values()), dtype=np.float64)
+
+    def index(self, item: str) -> Optional[int]:
+        return self.vocabulary.get(item)
+
+class CloEngine:
+    """
+    Scores ClothingAnalysis objects against a CLO values table.
+
+    The YAML file is parsed and validated once and compiled into a vocabulary of
+    integer indices. The file's mtime is checked at most once per check_interval
+    seconds and the table is reloaded when it changes; a broken edit keeps the
+    previous table in use.
+    """
+
+    def __init__(self, yaml_file: str = CLO_VALUES_PATH, check_interval: float = 1.0):
+        self.yaml_file = yaml_file
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._table = self._load()
+        self._failed_mtime: Optional[float] = None
+        self._last_check = time.monotonic()
+
+    def _load(self) -> CloTable:
+        mtime = os.stat(self.yaml_file).st_mtime
+        base_clo, clo_mapping = validate_clo_values(load_clo_values(self.yaml_file), self.yaml_file)
+        return CloTable(base_clo, clo_mapping, mtime)
+
+    @property
+    def table(self) -> CloTable:
+        """The current table, reloaded first if the YAML file changed."""
+        now = time.monotonic()
+        if now - self._last_check >= self.check_interval:
+            with self._lock:
+                if now - self._last_check >= self.check_interval:
+                    self._last_check = now
+                    self._reload_if_changed()
+        return self._table
+
+    def _reload_if_changed(self) -> None:
+        try:
+            mtime = os.stat(self.yaml_file).st_mtime
+        except OSError as e:
+            logger.error(f"Keeping previous CLO values, cannot stat {self.yaml_file}: {e}")
+            return
+        # Do not retry (and log) the same broken version on every check
+        if mtime in (self._table.mtime, self._failed_mtime):
+            return
+        try:
+            self._table = self._load()
+            logger.info(f"Reloaded CLO values from {self.yaml_file}")
+        except (OSError, ValueError, yaml.YAMLError) as e:
+            self._failed_mtime = mtime
+            logger.error(f"Keeping previous CLO values, could not reload {self.yaml_file}: {e}")
+
+    def encode(self, analysis: ClothingAnalysis, table: Optional[CloTable] = None) -> List[int]:
+        """
+        Lists the table indices whose CLO values add up to the analysis' total.
+
+        Indices are in the order the values are added: clothing items, the default
+        jeans, accessories, headwear and glasses.
+
+        Args:
+            analysis: ClothingAnalysis object containing detected clothing items
+            table: Table to encode against, defaults to the current one
+
+        Returns:
+            List of indices into the table's values
+        """
+        table = table or self.table
+        indices = []
+
+        # Check if any lower body item is detected
+        has_lower_body = any(item.lower() in LOWER_BODY_ITEMS for item in analysis.clothing_type)
+
+        # Only the first t-shirt, polo t-shirt or shirt counts, to avoid double counting
+        processed_shirt = False
+
+        for item in analysis.clothing_type:
+            item_lower = item.lower()
+
+            if item_lower in ("t-shirt", "polo t-shirt") and analysis.sleeve_length == 'long' and not processed_shirt:
+                # If t-shirt or polo t-shirt with long sleeves, use shirt CLO value
+                index = table.index("shirt")
+                if index is not None:
+                    indices.append(index)
+                    processed_shirt = True
+            elif item_lower == "shirt" and analysis.sleeve_length == 'short' and not processed_shirt:
+                # If shirt with short sleeves, use t-shirt CLO value
+                index = table.index("t-shirt")
+                if index is not None:
+                    indices.append(index)
+                    processed_shirt = True
+            elif not (processed_shirt and item_lower in SHIRT_ITEMS):
+                index = table.index(item_lower)
+                if index is not None:
+                    indices.append(index)
+                    if item_lower in SHIRT_ITEMS:
+                        processed_shirt = True
+
+        # If no lower body item detected, add jeans as default
+        if not has_lower_body and table.index("jeans") is not None:
+            indices.append(table.index("jeans"))
+
+        # Add CLO values for accessories
+        for accessory in analysis.accessories:
+            index = table.index(accessory.lower())
+            if index is not None and accessory.lower() != "none":
+                indices.append(index)
+
+        if analysis.headwear and table.index("headwear") is not None:
+            indices.append(table.index("headwear"))
+
+        if analysis.glasses and table.index("glasses") is not None:
+            indices.append(table.index("glasses"))
+
+        return indices
+
+    def score(self, analysis: ClothingAnalysis) -> float:
+        """
+        Calculates the total CLO value of one analysis.
+
+        Args:
+            analysis: ClothingAnalysis object containing detected clothing items
+
+        Returns:
+            Total CLO value rounded to 2 decimal places
+        """
+        table = self.table
+        total_clo = table.base_clo
+        for index in self.encode(analysis, table):
+            total_clo += table.values[index]
+        return round(float(total_clo), 2)
+
+    def score_many(self, analyses: Sequence[ClothingAnalysis]) -> np.ndarray:
+        """
+        Calculates the total CLO values of many analyses at once.
+
+        Args:
+            analyses: ClothingAnalysis objects to score
+
+        Returns:
+            Array of total CLO values rounded to 2 decimal places
+        """
+        table = self.table
+        encoded = [self.encode(analysis, table) for analysis in analyses]
+        rows = np.repeat(np.arange(len(encoded)), [len(indices) for indices in encoded])
+        flat = np.fromiter((i for indices in encoded for i in indices), dtype=np.intp, count=len(rows))
+        totals = table.base_clo + np.bincount(rows, weights=table.values[flat], minlength=len(encoded))
+        return np.round(totals, 2)
+
+_engines: Dict[str, CloEngine] = {}
+_engines_lock = threading.Lock()
+
+def get_clo_engine(yaml_file: str = CLO_VALUES_PATH) -> CloEngine:
+    """
+    Returns the shared CloEngine for a CLO values file.
+
+    Args:
+        yaml_file: Path to the YAML file containing CLO values
+
+    Returns:
+        CloEngine for the file, created on first use
+    """
+    path = os.path.abspath(yaml_file)
+    engine = _engines.get(path)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(path)
+            if engine is None:
+                engine = _engines[path] = CloEngine(path)
+    return engine
+
+def calculate_clo_value(analysis: ClothingAnalysis, yaml_file: str = CLO_VALUES_PATH) -> float:
     """
     Calculates the total CLO value based on detected clothing items.
     
@@ -58,58 +282,4 @@ def calculate_clo_value(analysis: ClothingAnalysis, yaml_file: str = 'clo_values
     Returns:
         Total CLO value
     """
-    clo_mapping = get_clothing_clo_values(yaml_file)
-    base_clo = get_base_clo_value(yaml_file)
-    total_clo = base_clo
-    
-    # Define lower body items for detection
-    lower_body_items = ["pants", "dress pants", "jeans", "trousers", "shorts", "skirt", "leggings", "joggers"]
-    
-    # Check if any lower body item is detected
-    has_lower_body = any(item.lower() in lower_body_items for item in analysis.clothing_type)
-    
-    # Track if t-shirt or shirt has been processed to avoid double counting
-    processed_shirt = False
-    
-    # Add CLO values for each clothing type
-    for item in analysis.clothing_type:
-        item_lower = item.lower()
-        
-        # Special handling for t-shirt, polo t-shirt, and shirt based on sleeve length
-        if (item_lower == "t-shirt" or item_lower == "polo t-shirt") and analysis.sleeve_length == 'long' and not processed_shirt:
-            # If t-shirt or polo t-shirt with long sleeves, use shirt CLO value
-            if "shirt" in clo_mapping:
-                total_clo += clo_mapping["shirt"]
-                processed_shirt = True
-        elif item_lower == "shirt" and analysis.sleeve_length == 'short' and not processed_shirt:
-            # If shirt with short sleeves, use t-shirt CLO value
-            if "t-shirt" in clo_mapping:
-                total_clo += clo_mapping["t-shirt"]
-                processed_shirt = True
-        elif item_lower in clo_mapping and not (processed_shirt and (item_lower == "t-shirt" or item_lower == "shirt" or item_lower == "polo t-shirt")):
-            # Normal case for other items, or if t-shirt/shirt/polo t-shirt hasn't been processed yet
-            total_clo += clo_mapping[item_lower]
-            if item_lower == "t-shirt" or item_lower == "shirt" or item_lower == "polo t-shirt":
-                processed_shirt = True
-    
-    # If no lower body item detected, add jeans as default
-    if not has_lower_body and "jeans" in clo_mapping:
-        total_clo += clo_mapping["jeans"]
-        # Optionally, you could add jeans to the clothing_type list for reference
-        #analysis.clothing_type.append("jeans")
-    
-    # Add CLO values for accessories
-    for accessory in analysis.accessories:
-        if accessory.lower() in clo_mapping and accessory.lower() != "none":
-            total_clo += clo_mapping[accessory.lower()]
-    
-    # Add CLO value for headwear if present
-    if analysis.headwear and "headwear" in clo_mapping:
-        total_clo += clo_mapping["headwear"]
-    
-    # Add CLO value for glasses if present
-    if analysis.glasses and "glasses" in clo_mapping:
-        total_clo += clo_mapping["glasses"]
-    
-    # Round to 2 decimal places for readability
-    return round(total_clo, 2)
+    return get_clo_engine(yaml_file).score(analysis)
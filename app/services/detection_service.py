@@ -0,0 +1,144 @@
+import threading
+from typing import TYPE_CHECKING, List, Optional, Tuple
+import numpy as np
+from app.core.settings import settings
+from app.utils.lazy_import import load_opencv
+
+if TYPE_CHECKING:
+    import cv2
+
+# (x, y, width, height) in pixels
+Box = Tuple[int, int, int, int]
+
+_local = threading.local()
+
+def get_people_detector() -> "cv2.HOGDescriptor":
+    """
+    Returns the HOG people detector for the current thread.
+
+    Returns:
+        HOGDescriptor loaded with OpenCV's default people detector
+    """
+    hog = getattr(_local, "hog", None)
+    if hog is None:
+        cv2 = load_opencv()
+        hog = cv2.HOGDescriptor()
+        hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+        _local.hog = hog
+    return hog
+
+def get_face_detector() -> "cv2.CascadeClassifier":
+    """
+    Returns the Haar frontal face detector for the current thread.
+
+    Returns:
+        CascadeClassifier bundled with opencv-python
+    """
+    faces = getattr(_local, "faces", None)
+    if faces is None:
+        cv2 = load_opencv()
+        faces = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+        _local.faces = faces
+    return faces
+
+def _detection_image(rgb: np.ndarray) -> Tuple[np.ndarray, float]:
+    cv2 = load_opencv()
+    height, width = rgb.shape[:2]
+    scale = min(1.0, settings.person_detect_max_side / max(height, width))
+    small = rgb
+    if scale < 1.0:
+        small = cv2.resize(rgb, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_RGB2GRAY), scale
+
+def is_close_up(gray: np.ndarray) -> bool:
+    """
+    Tells whether an image is a close-up of one person.
+
+    The HOG detector looks for whole bodies and produces spurious small boxes on
+    portraits and selfies, so a face wider than settings.person_closeup_face_ratio
+    of the frame means the image is already framed on the person.
+
+    Args:
+        gray: Grayscale image
+
+    Returns:
+        True if a large face is visible
+    """
+    min_face = max(24, round(min(gray.shape[:2]) * settings.person_closeup_face_ratio))
+    faces = get_face_detector().detectMultiScale(gray, scaleFactor=1.2, minNeighbors=5, minSize=(min_face, min_face))
+    return len(faces) > 0
+
+def detect_people(rgb: np.ndarray) -> List[Box]:
+    """
+    Detects people in an image on the CPU.
+
+    Detection runs on a copy downscaled to settings.person_detect_max_side; the
+    returned boxes are in the coordinates of the input image.
+
+    Args:
+        rgb: Image as an RGB array of shape (height, width, 3)
+
+    Returns:
+        List of person boxes, largest first
+    """
+    gray, scale = _detection_image(rgb)
+    rects, weights = get_people_detector().detectMultiScale(gray, winStride=(8, 8), padding=(8, 8), scale=1.05)
+    if len(rects) == 0:
+        return []
+    cv2 = load_opencv()
+
+    boxes = [[int(v) for v in rect] for rect in rects]
+    scores = [float(w) for w in np.ravel(weights)]
+    keep = cv2.dnn.NMSBoxes(boxes, scores, settings.person_detect_min_score, 0.45)
+
+    people = []
+    for i in np.ravel(keep):
+        x, y, w, h = boxes[int(i)]
+        people.append((round(x / scale), round(y / scale), round(w / scale), round(h / scale)))
+    people.sort(key=lambda box: box[2] * box[3], reverse=True)
+    return people
+
+def find_crop_subject(rgb: np.ndarray) -> Optional[Box]:
+    """
+    Finds the person to crop to, if cropping would help.
+
+    Args:
+        rgb: Image as an RGB array of shape (height, width, 3)
+
+    Returns:
+        Box of the largest person, or None for close-ups and frames without people
+    """
+    gray, _ = _detection_image(rgb)
+    if is_close_up(gray):
+        return None
+    people = detect_people(rgb)
+    return people[0] if people else None
+
+def check_person_detection() -> None:
+    """
+    Fails fast on startup when person cropping is enabled without OpenCV installed.
+
+    Raises:
+        MissingDependencyError: If OpenCV is not installed
+    """
+    if settings.person_crop_enabled:
+        load_opencv()
+
+def pad_box(box: Box, padding: float, width: int, height: int) -> Box:
+    """
+    Grows a box by a fraction of its size on every side, clipped to the image.
+
+    Args:
+        box: Box to grow
+        padding: Fraction of the box width/height added on each side
+        width: Image width
+        height: Image height
+
+    Returns:
+        The padded box
+    """
+    x, y, w, h = box
+    dx, dy = round(w * padding), round(h * padding)
+    left, top = max(0, x - dx), max(0, y - dy)
+    right, bottom = min(width, x + w + dx), min(height, y + h + dy)
+    return (left, top, right - left, bottom - top)
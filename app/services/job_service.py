@@ -0,0 +1,426 @@
+import asyncio
+import hashlib
+import ipaddress
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Set
+from urllib.parse import urlsplit
+from fastapi.concurrency import run_in_threadpool
+from app.core.settings import settings
+from app.schemas.clothing import ClothingAnalysis
+from app.schemas.jobs import JobStatus
+from app.services.analysis_service import analyze_cached
+
+logger = logging.getLogger(__name__)
+
+# Set with every final state: the webhook, if any, still has to be delivered
+_PENDING_WEBHOOK = "webhook_status = CASE WHEN webhook_url IS NULL THEN NULL ELSE 'pending' END"
+
+def check_webhook_url(url: str) -> None:
+    """
+    Refuses webhook targets that could reach internal services.
+
+    The URL must be http(s). When settings.jobs_webhook_allowed_hosts is set, its
+    host must be listed there. Unless settings.jobs_webhook_allow_private is set,
+    every address the host resolves to must be public, so webhooks cannot be
+    pointed at loopback, private, link-local or other internal addresses.
+
+    Args:
+        url: Webhook URL given with a job
+
+    Raises:
+        ValueError: If the URL is not an allowed webhook target
+    """
+    parsed = urlsplit(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise ValueError("webhook_url must be an http(s) URL")
+    host = parsed.hostname.lower()
+    allowed = settings.jobs_webhook_allowed_hosts
+    if allowed and host not in allowed:
+        raise ValueError(f"Webhook host {host} is not allowed")
+    if settings.jobs_webhook_allow_private:
+        return
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)}
+    except socket.gaierror as e:
+        raise ValueError(f"Cannot resolve webhook host {host}: {e}")
+    for address in addresses:
+        # Drop the IPv6 zone index ("fe80::1%eth0")
+        if not ipaddress.ip_address(address.split("%", 1)[0]).is_global:
+            raise ValueError(f"Webhook host {host} resolves to the non-public address {address}")
+
+class JobStore:
+    """
+    SQLite-backed job queue.
+
+    Jobs keep their image bytes until they reach a final state, so queued work
+    survives restarts. Claiming a job happens in an IMMEDIATE transaction, which
+    makes the queue safe to share between several uvicorn workers. A claimed job
+    holds a lease; if its worker dies, the job becomes claimable again once the
+    lease expires, unless that was its last allowed attempt.
+
+    A job that reaches a final state with a webhook gets webhook_status
+    'pending' in the same update, so a delivery cut short by a restart is
+    resumed; webhooks are delivered at least once.
+    """
+
+    def __init__(self, db_path: str):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT NOT NULL, priority INTEGER NOT NULL, "
+                "model TEXT NOT NULL, image BLOB, image_digest TEXT NOT NULL, content_type TEXT, "
+                "webhook_url TEXT, webhook_status TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+                "next_run_at REAL NOT NULL, lease_until REAL, created_at REAL NOT NULL, "
+                "updated_at REAL NOT NULL, result TEXT, error TEXT)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, next_run_at, created_at)"
+            )
+
+    def submit(self, image: bytes, model: str, priority: int = 0, content_type: Optional[str] = None,
+               webhook_url: Optional[str] = None) -> str:
+        """
+        Adds a job to the queue.
+
+        Args:
+            image: Encoded image bytes
+            model: Name of the Ollama model to use
+            priority: Higher priorities are processed first
+            content_type: MIME type of the image
+            webhook_url: URL to POST the final job status to
+
+        Returns:
+            The new job id
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, status, priority, model, image, image_digest, content_type, "
+                "webhook_url, next_run_at, created_at, updated_at) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, priority, model, image, hashlib.sha256(image).hexdigest(), content_type,
+                 webhook_url, now, now, now)
+            )
+        return job_id
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Marks the most urgent runnable job as running and returns it.
+
+        Runnable jobs are queued jobs whose retry time has come and running jobs
+        whose lease has expired with attempts left.
+
+        Returns:
+            The claimed job row, or None if no job is ready
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT * FROM jobs WHERE (status = 'queued' AND next_run_at <= ?) "
+                    "OR (status = 'running' AND lease_until < ? AND attempts < ?) "
+                    "ORDER BY priority DESC, created_at LIMIT 1", (now, now, settings.jobs_max_attempts)
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, "
+                        "updated_at = ? WHERE id = ?",
+                        (now + settings.jobs_lease_seconds, now, row["id"])
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job = dict(row)
+        job["attempts"] += 1
+        return job
+
+    def fail_abandoned(self) -> List[Dict[str, Any]]:
+        """
+        Fails running jobs whose lease expired during their last allowed attempt.
+
+        A job that keeps killing its worker would otherwise be reclaimed forever.
+
+        Returns:
+            The failed jobs' id, attempts and webhook_url, so their webhooks can be called
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(
+                    "SELECT id, attempts, webhook_url FROM jobs "
+                    "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                    (now, settings.jobs_max_attempts)
+                ).fetchall()
+                for row in rows:
+                    self._db.execute(
+                        f"UPDATE jobs SET status = 'failed', error = ?, image = NULL, updated_at = ?, "
+                        f"{_PENDING_WEBHOOK} WHERE id = ?",
+                        (f"Worker stopped during attempt {row['attempts']}; no attempts left", now, row["id"])
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return [dict(row) for row in rows]
+
+    def complete(self, job_id: str, analysis: ClothingAnalysis) -> None:
+        with self._lock:
+            self._db.execute(
+                f"UPDATE jobs SET status = 'succeeded', result = ?, error = NULL, image = NULL, updated_at = ?, "
+                f"{_PENDING_WEBHOOK} WHERE id = ?", (analysis.model_dump_json(), time.time(), job_id)
+            )
+
+    def fail(self, job_id: str, error: str, retry_at: Optional[float]) -> None:
+        """
+        Records a failed attempt, requeueing the job if retry_at is given.
+
+        Args:
+            job_id: Id of the job
+            error: Error message of the attempt
+            retry_at: Epoch time of the next attempt, or None to fail the job for good
+        """
+        with self._lock:
+            if retry_at is None:
+                self._db.execute(
+                    f"UPDATE jobs SET status = 'failed', error = ?, image = NULL, updated_at = ?, "
+                    f"{_PENDING_WEBHOOK} WHERE id = ?",
+                    (error, time.time(), job_id)
+                )
+            else:
+                self._db.execute(
+                    "UPDATE jobs SET status = 'queued', error = ?, next_run_at = ?, updated_at = ? WHERE id = ?",
+                    (error, retry_at, time.time(), job_id)
+                )
+
+    def pending_webhooks(self) -> List[Dict[str, Any]]:
+        """
+        Lists finished jobs whose webhook has not been delivered or given up on.
+
+        Returns:
+            Rows with the id and webhook_url of each such job
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, webhook_url FROM jobs WHERE status IN ('succeeded', 'failed') "
+                "AND webhook_status = 'pending' ORDER BY updated_at"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def set_webhook_status(self, job_id: str, webhook_status: str) -> None:
+        with self._lock:
+            self._db.execute("UPDATE jobs SET webhook_status = ? WHERE id = ?", (webhook_status, job_id))
+
+    def get(self, job_id: str) -> Optional[JobStatus]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return JobStatus(
+            job_id=row["id"],
+            status=row["status"],
+            model=row["model"],
+            priority=row["priority"],
+            attempts=row["attempts"],
+            created_at=row["created_at"],
+            updated_at=row["updated_at"],
+            result=ClothingAnalysis.model_validate_json(row["result"]) if row["result"] else None,
+            error=row["error"],
+            webhook_url=row["webhook_url"],
+            webhook_status=row["webhook_status"],
+        )
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Returns the number of jobs in each status.
+
+        Returns:
+            Dictionary mapping status to job count
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+class JobWorkerPool:
+    """
+    Asyncio workers draining a JobStore through the analysis pipeline.
+
+    An error in one iteration (e.g. "database is locked") is logged and the
+    worker carries on after jobs_poll_interval; a worker that dies anyway is
+    replaced.
+    """
+
+    def __init__(self, store: JobStore, workers: int):
+        self.store = store
+        self.workers = workers
+        self._tasks: List[asyncio.Task] = []
+        self._deliveries: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+    def start(self) -> None:
+        self._stopping = False
+        self._tasks = [self._start_worker() for _ in range(self.workers)]
+        self._deliveries.add(asyncio.create_task(self._resume_deliveries()))
+
+    async def stop(self) -> None:
+        self._stopping = True
+        tasks = self._tasks + list(self._deliveries)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        # Jobs interrupted here are claimed again once their lease expires, and
+        # webhooks still pending are resumed on the next start
+
+    def _start_worker(self) -> asyncio.Task:
+        task = asyncio.create_task(self._work())
+        task.add_done_callback(self._worker_done)
+        return task
+
+    def _worker_done(self, task: asyncio.Task) -> None:
+        if self._stopping or task.cancelled():
+            return
+        logger.error("Job worker died; starting a new one", exc_info=task.exception())
+        self._tasks = [self._start_worker() if t is task else t for t in self._tasks]
+
+    def notify(self) -> None:
+        """Wakes idle workers after a job was submitted."""
+        self._wakeup.set()
+
+    async def _work(self) -> None:
+        while True:
+            try:
+                job = await self._next_job()
+                if job is not None:
+                    await self._run(job)
+                    continue
+            except Exception as e:
+                logger.error(f"Job worker error, retrying in {settings.jobs_poll_interval}s: {e}", exc_info=True)
+                await asyncio.sleep(settings.jobs_poll_interval)
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.jobs_poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _next_job(self) -> Optional[Dict[str, Any]]:
+        for abandoned in await run_in_threadpool(self.store.fail_abandoned):
+            logger.warning(f"Job {abandoned['id']} failed: worker stopped during its last attempt")
+            if abandoned["webhook_url"]:
+                self._start_delivery(abandoned["id"], abandoned["webhook_url"])
+        return await run_in_threadpool(self.store.claim)
+
+    async def _resume_deliveries(self) -> None:
+        try:
+            pending = await run_in_threadpool(self.store.pending_webhooks)
+        except Exception as e:
+            logger.error(f"Could not list pending webhooks: {e}")
+            return
+        if pending:
+            logger.info(f"Resuming {len(pending)} pending webhook deliveries")
+        for job in pending:
+            self._start_delivery(job["id"], job["webhook_url"])
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        try:
+            analysis, _ = await analyze_cached(job["image"], job["image_digest"], job["model"], job["content_type"])
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            retry_at = None
+            if job["attempts"] < settings.jobs_max_attempts:
+                retry_at = time.time() + settings.jobs_retry_backoff * 2 ** (job["attempts"] - 1)
+            logger.warning(f"Job {job['id']} attempt {job['attempts']} failed: {error}")
+            await run_in_threadpool(self.store.fail, job["id"], error, retry_at)
+            if retry_at is not None:
+                return
+        else:
+            await run_in_threadpool(self.store.complete, job["id"], analysis)
+
+        if job["webhook_url"]:
+            self._start_delivery(job["id"], job["webhook_url"])
+
+    def _start_delivery(self, job_id: str, url: str) -> None:
+        # In the background, so the worker moves on to the next job while a slow
+        # or unreachable webhook is retried
+        task = asyncio.create_task(self._deliver(job_id, url))
+        self._deliveries.add(task)
+        task.add_done_callback(self._deliveries.discard)
+
+    async def _deliver(self, job_id: str, url: str) -> None:
+        # Only webhooks need requests; keep it out of the service's startup imports
+        import requests
+        try:
+            status = await run_in_threadpool(self.store.get, job_id)
+        except Exception as e:
+            # Left pending, so the next start tries again
+            logger.error(f"Webhook for job {job_id} not sent, cannot read the job: {e}")
+            return
+        payload = status.model_dump_json()
+        webhook_status = "not delivered"
+        for attempt in range(settings.jobs_webhook_attempts):
+            try:
+                # Checked again before every call: the host may resolve elsewhere by now
+                await run_in_threadpool(check_webhook_url, url)
+            except ValueError as e:
+                webhook_status = f"refused: {e}"
+                break
+            try:
+                response = await run_in_threadpool(
+                    requests.post, url, data=payload,
+                    headers={"Content-Type": "application/json"},
+                    timeout=settings.jobs_webhook_timeout,
+                    # A redirect could lead to an address check_webhook_url refuses
+                    allow_redirects=False
+                )
+                if response.status_code < 300:
+                    webhook_status = "delivered"
+                    break
+                webhook_status = f"HTTP {response.status_code}"
+            except requests.RequestException as e:
+                webhook_status = str(e)
+            if attempt + 1 < settings.jobs_webhook_attempts:
+                await asyncio.sleep(settings.jobs_retry_backoff * 2 ** attempt)
+        if webhook_status != "delivered":
+            logger.warning(f"Webhook for job {job_id} to {url} failed: {webhook_status}")
+        try:
+            await run_in_threadpool(self.store.set_webhook_status, job_id, webhook_status)
+        except Exception as e:
+            logger.error(f"Could not record webhook status {webhook_status!r} of job {job_id}: {e}")
+
+job_store: Optional[JobStore] = None
+job_workers: Optional[JobWorkerPool] = None
+
+def start_job_workers() -> None:
+    """Opens the job store and starts the worker pool; called on application startup."""
+    global job_store, job_workers
+    if not settings.jobs_enabled:
+        return
+    job_store = JobStore(settings.jobs_db_path)
+    job_workers = JobWorkerPool(job_store, settings.jobs_workers)
+    job_workers.start()
+
+async def stop_job_workers() -> None:
+    """Stops the worker pool; called on application shutdown."""
+    if job_workers is not None:
+        await job_workers.stop()
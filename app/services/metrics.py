@@ -0,0 +1,211 @@
+import asyncio
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Upper bounds in seconds; stages range from sub-millisecond parsing to minute-long model loads
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+TOKEN_RATE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+LOOP_LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+class Counter:
+    """Prometheus counter with labels."""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str]):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        with self._lock:
+            return self._values.get(label_values, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, values)} {total}")
+        return lines
+
+class Histogram:
+    """Prometheus histogram with labels and fixed buckets."""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # Per label set: per-bucket counts (the last one is +Inf), sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for values, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    labels = _format_labels(self.labels, values, 'le="' + le + '"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, values)} {total[0]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, values)} {cumulative}")
+        return lines
+
+STAGE_SECONDS = Histogram(
+    "clothing_stage_duration_seconds", "Time spent in each stage of an analysis", ("model", "stage"), STAGE_BUCKETS
+)
+TOKENS_PER_SECOND = Histogram(
+    "clothing_tokens_per_second", "Ollama token throughput per request", ("model", "phase"), TOKEN_RATE_BUCKETS
+)
+TOKENS = Counter("clothing_tokens_total", "Tokens processed by Ollama", ("model", "phase"))
+ANALYSES = Counter("clothing_analyses_total", "Analyses served, by cache outcome", ("model", "cache"))
+
+LOOP_LAG = Histogram(
+    "clothing_event_loop_lag_seconds", "How late the event loop woke a sleeping task", (), LOOP_LAG_BUCKETS
+)
+
+METRICS = [STAGE_SECONDS, TOKENS_PER_SECOND, TOKENS, ANALYSES, LOOP_LAG]
+
+_loop_lag_task: Optional[asyncio.Task] = None
+
+# Stage durations of the request being handled, for its Server-Timing header
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+def start_request_timings() -> Dict[str, float]:
+    """
+    Starts collecting stage durations for the current request.
+
+    Tasks started afterwards share the same dictionary, so stages run by a
+    background call land in the request that started it. A task calling this
+    again collects its stages apart from the request's.
+
+    Returns:
+        Dictionary that fills with stage name to seconds
+    """
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+def current_request_timings() -> Optional[Dict[str, float]]:
+    """Returns the stage durations collected so far for the current request, if any."""
+    return _request_timings.get()
+
+def record_stage(stage: str, model: str, seconds: float) -> None:
+    """
+    Records the duration of one stage.
+
+    Args:
+        stage: Name of the stage
+        model: Name of the Ollama model the analysis runs on
+        seconds: Duration of the stage
+    """
+    STAGE_SECONDS.observe(seconds, model, stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+@contextmanager
+def timed(stage: str, model: str) -> Iterator[None]:
+    """Times the enclosed block as one stage, whether or not it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, model, time.perf_counter() - started)
+
+def record_ollama_response(model: str, response: Any) -> None:
+    """
+    Records the durations and token counts Ollama reports with each response.
+
+    Args:
+        model: Name of the Ollama model
+        response: Chat response carrying load_duration, prompt_eval_* and eval_* fields
+    """
+    for stage, field in (("load", "load_duration"), ("prompt_eval", "prompt_eval_duration"), ("eval", "eval_duration")):
+        nanoseconds = response.get(field)
+        if nanoseconds:
+            record_stage(stage, model, nanoseconds / 1e9)
+    for phase, count_field, duration_field in (
+        ("prompt", "prompt_eval_count", "prompt_eval_duration"),
+        ("eval", "eval_count", "eval_duration"),
+    ):
+        count = response.get(count_field)
+        duration = response.get(duration_field)
+        if count:
+            TOKENS.inc(model, phase, amount=count)
+            if duration:
+                TOKENS_PER_SECOND.observe(count / (duration / 1e9), model, phase)
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    """
+    Formats stage durations as a Server-Timing header value.
+
+    Args:
+        timings: Stage name to seconds
+
+    Returns:
+        Header value such as "upload_read;dur=1.2, queue;dur=0.1"
+    """
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
+
+async def _monitor_loop_lag(interval: float) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        # Anything past the requested sleep is time other callbacks held the loop
+        LOOP_LAG.observe(max(0.0, loop.time() - started - interval))
+
+def start_loop_lag_monitor(interval: float) -> None:
+    """
+    Starts sampling event loop lag every interval seconds into LOOP_LAG.
+
+    Args:
+        interval: Seconds between samples; 0 disables the monitor
+    """
+    global _loop_lag_task
+    if interval > 0 and _loop_lag_task is None:
+        _loop_lag_task = asyncio.create_task(_monitor_loop_lag(interval))
+
+async def stop_loop_lag_monitor() -> None:
+    global _loop_lag_task
+    if _loop_lag_task is not None:
+        _loop_lag_task.cancel()
+        await asyncio.gather(_loop_lag_task, return_exceptions=True)
+        _loop_lag_task = None
+
+def render_metrics() -> str:
+    """Returns every metric in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -1,86 +1,85 @@
-import ollama
+import asyncio
+import logging
 import os
-import json
+from typing import Any, AsyncIterator, Optional, Tuple, Union
 from app.schemas.clothing import ClothingAnalysis
 from app.core.settings import settings
 from app.services.clo_service import calculate_clo_value
+from app.services.admission_service import AdmissionController, queue_timeout
+from app.services.backend_pool import BackendPool
+from app.services.metrics import timed, record_stage, record_ollama_response
+from app.services.prompt_registry import get_prompt, SERVER_FIELDS
+from app.services.scheduler import ModelScheduler
+from app.utils.partial_json import PartialObjectParser
 
-def analyze_image(image_path: str, model: str = settings.model_name) -> ClothingAnalysis:
-    response = ollama.chat(
-        model=model,
-        options={'temperature': settings.model_temperature},
-        format=ClothingAnalysis.model_json_schema(),
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "You are an assistant that describes clothing in images CONCISELY yet INFORMATIVELY. "
-                    "You MUST NOT describe or speculate about the person's age. "
-                    "Focus exclusively on visible clothing, accessories, colors, materials, and thermal properties. "
-                    "Keep your descriptions focused and informative - use 3-4 short sentences. "
-                    "Be clear about whether the clothing is suited for warm or cold weather and provide brief reasoning.\n\n"
-                    "Be precise in your CLO estimation based on visible layers, fabric thickness, and coverage."
-                )
-            },
-            {
-            'role': 'user',
-            'content': (
-                "description: What is in this image? Please analyze the person in this image and provide a CONCISE yet INFORMATIVE description (4-5 short sentences) of their clothing. Include details about the type of clothing items, materials, colors, and key features. Assess whether the outfit is suited for warm or cold weather and provide brief reasoning based on the visible clothing layers and materials.\n\n"
-                "After the description, please answer the following questions:\n"
-                "1. What type of clothing is the person wearing? (e.g., t-shirt, sweater, jacket, etc.)\n"
-                "2. Is the sleeve length short, long, or sleeveless?\n"
-                "3. What is the color of the clothing?\n"
-                "4. Is the person wearing glasses? (Yes or No)\n"
-                "5. Is the person wearing any headwear? (Yes or No)\r\n"
-                "6. Is the person wearing any accessories? (e.g., scarf, gloves, belt, etc.)\r\n"
-                "7. Estimate the CLO value of the clothing based on its thermal insulation properties using this precise scale:\n"
-                    "0.0 = Nude (no clothing)\n"
-                    "0.1–0.3 = Very minimal clothing (e.g., underwear, tank top alone, very thin shorts)\n"
-                    "0.4–0.6 = Light summer clothing:\n"
-                    "   - T-shirt or polo t-shirt with shorts\n"
-                    "   - Tank top with light pants/jeans/skirt\n"
-                    "   - Light dress\n"
-                    "   - Shorts with light shirt\n"
-                    "0.7–0.9 = Light business casual or moderate clothing:\n"
-                    "   - Shirt with trousers/pants/jeans\n"
-                    "   - Dress with light cardigan\n"
-                    "   - Polo t-shirt with pants/jeans\n"
-                    "   - Light sweater with pants/leggings\n"
-                    "   - Vest over shirt with pants\n"
-                    "1.0 = Typical business suit or equivalent:\n"
-                    "   - Full suit (blazer and trousers)\n"
-                    "   - Dress with blazer\n"
-                    "   - Shirt, vest, and trousers combination\n"
-                    "1.1–1.4 = Light winter clothing or heavier business wear:\n"
-                    "   - Light jacket with shirt and pants/jeans\n"
-                    "   - Hoodie with jeans/pants/joggers\n"
-                    "   - Cardigan over shirt with pants/skirt\n"
-                    "   - Sweater with pants/jeans/leggings\n"
-                    "1.5–1.9 = Multiple layers, medium winter clothing:\n"
-                    "   - Jacket over sweater/hoodie with pants/jeans\n"
-                    "   - Light coat with multiple layers underneath\n"
-                    "   - Blazer over sweater with pants and accessories\n"
-                    "2.0–2.5 = Heavy winter clothing:\n"
-                    "   - Heavy coat with sweater/hoodie and pants/jeans\n"
-                    "   - Multiple thick layers (e.g., coat, jacket, sweater combination)\n"
-                    "   - Thick winter jacket with thermal layers\n"
-                    "2.6–3.0 = Arctic or extreme cold weather gear:\n"
-                    "   - Heavy insulated coat with multiple thermal layers\n"
-                    "   - Specialized extreme weather clothing\n\n"
-                "8. For the clo_insulation_text field, provide a single short sentence that states the exact CLO value and explains what it means for thermal comfort. Example: 'CLO value of 0.8 provides light insulation for mild conditions.' Keep it extremely brief (max 15 words)."
-
-            ),
-            'images': [image_path]
-        }]
-    )
-    # Parse the JSON response
-    content = response['message']['content']
-    
+logger = logging.getLogger(__name__)
+
+class InferenceQueueFullError(Exception):
+    """Raised when a request waited too long for a free inference slot."""
+
+
+class InferenceTimeoutError(Exception):
+    """Raised when the model did not answer within the configured timeout."""
+
+
+_backend_pool: Optional[BackendPool] = None
+_scheduler: Optional[ModelScheduler] = None
+_admission: Optional[AdmissionController] = None
+
+def get_backend_pool() -> BackendPool:
+    """
+    Returns the pool of Ollama backends, creating it on first use.
+
+    Returns:
+        The process-wide BackendPool holding one AsyncClient per host
+    """
+    global _backend_pool
+    if _backend_pool is None:
+        _backend_pool = BackendPool(settings.get_ollama_backends(), timeout=settings.inference_timeout)
+    return _backend_pool
+
+def get_scheduler() -> ModelScheduler:
+    """
+    Returns the scheduler bounding and ordering calls to Ollama.
+
+    Returns:
+        ModelScheduler sized by the total capacity of the backends
+    """
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = ModelScheduler(get_backend_pool().capacity, settings.scheduler_max_wait)
+    return _scheduler
+
+def get_admission_controller() -> AdmissionController:
+    """
+    Returns the controller admitting or shedding requests before they queue.
+
+    Returns:
+        AdmissionController sized by the total capacity of the backends
+    """
+    global _admission
+    if _admission is None:
+        _admission = AdmissionController(get_backend_pool().capacity, settings.admission_max_queue_per_model)
+    return _admission
+
+def parse_analysis(content: str, model: str = settings.model_name) -> ClothingAnalysis:
+    """
+    Validates the model output and replaces the CLO fields with the calculated ones.
+
+    Args:
+        content: JSON string returned by the model
+        model: Name of the Ollama model that produced it, which selects the prompt version
+
+    Returns:
+        ClothingAnalysis object with the calculated CLO value
+    """
     # Convert the JSON string to a ClothingAnalysis object
-    analysis = ClothingAnalysis.model_validate_json(content)
+    with timed("validation", model):
+        analysis = get_prompt(model).parse(content)
     
     # Calculate the CLO value based on the detected clothing items
-    calculated_clo = calculate_clo_value(analysis)
+    with timed("clo_scoring", model):
+        calculated_clo = calculate_clo_value(analysis)
     
     # Update the CLO value in the analysis
     analysis.clo_insulation = calculated_clo
@@ -90,6 +89,145 @@ def analyze_image(image_path: str, model: str = settings.model_name) -> Clothing
     
     return analysis
 
+async def analyze_image_async(image: Union[str, bytes], model: str = settings.model_name,
+                              temperature: Optional[float] = None) -> ClothingAnalysis:
+    """
+    Analyzes an image without blocking the event loop.
+
+    At most as many calls as the backends accept run at once; other requests wait
+    for a free slot for up to settings.inference_queue_timeout, or until the
+    request's deadline set at admission. Waiting requests are
+    grouped by model to avoid reloading weights, and each call is routed to the
+    least loaded backend that has the model resident.
+
+    Args:
+        image: Raw image bytes, or a path to the image file
+        model: Name of the Ollama model to use
+        temperature: Sampling temperature, defaults to settings.model_temperature
+
+    Returns:
+        ClothingAnalysis object with the calculated CLO value
+
+    Raises:
+        InferenceQueueFullError: If no inference slot became free in time
+        InferenceTimeoutError: If the model did not answer in time
+    """
+    prompt = get_prompt(model)
+    scheduler = get_scheduler()
+    timeout = queue_timeout()
+    try:
+        with timed("queue", model):
+            await scheduler.acquire(model, timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Inference queue timeout for model {model}")
+        raise InferenceQueueFullError(f"No inference slot available after {timeout:.1f}s")
+
+    loop = asyncio.get_running_loop()
+    try:
+        with timed("inference", model):
+            started = loop.time()
+            response = await asyncio.wait_for(
+                get_backend_pool().chat(
+                    model=model,
+                    options={'temperature': settings.model_temperature if temperature is None else temperature},
+                    keep_alive=settings.ollama_keep_alive,
+                    format=prompt.schema,
+                    messages=prompt.build_messages(image)
+                ),
+                timeout=settings.inference_timeout
+            )
+    except asyncio.TimeoutError:
+        logger.warning(f"Inference timeout for model {model}")
+        raise InferenceTimeoutError(f"Model {model} did not respond within {settings.inference_timeout}s")
+    finally:
+        scheduler.release(model)
+
+    get_admission_controller().observe(model, loop.time() - started)
+    record_ollama_response(model, response)
+    return parse_analysis(response['message']['content'], model)
+
+async def analyze_image_stream(image: Union[str, bytes], model: str = settings.model_name) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Analyzes an image, yielding the answer while the model generates it.
+
+    Scheduling, routing and timeouts work as in analyze_image_async; the
+    inference slot is held until the stream ends.
+
+    Args:
+        image: Raw image bytes, or a path to the image file
+        model: Name of the Ollama model to use
+
+    Returns:
+        Async iterator of (event, data) pairs: ("token", text) for each chunk,
+        ("field", {"name", "value"}) as each field of the answer completes, and
+        finally ("result", ClothingAnalysis) with the calculated CLO value
+
+    Raises:
+        InferenceQueueFullError: If no inference slot became free in time
+        InferenceTimeoutError: If the model did not finish in time
+    """
+    prompt = get_prompt(model)
+    scheduler = get_scheduler()
+    timeout = queue_timeout()
+    try:
+        with timed("queue", model):
+            await scheduler.acquire(model, timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Inference queue timeout for model {model}")
+        raise InferenceQueueFullError(f"No inference slot available after {timeout:.1f}s")
+
+    loop = asyncio.get_running_loop()
+    parser = PartialObjectParser()
+    final = None
+    # Time spent waiting on the model, leaving out time the consumer of this
+    # generator (e.g. a slow client) keeps it suspended
+    inference = 0.0
+    try:
+        started = loop.time()
+        deadline = started + settings.inference_timeout
+        first_chunk = True
+        stream = get_backend_pool().chat_stream(
+            model=model,
+            options={'temperature': settings.model_temperature},
+            keep_alive=settings.ollama_keep_alive,
+            format=prompt.schema,
+            messages=prompt.build_messages(image)
+        )
+        try:
+            while True:
+                waiting = loop.time()
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), timeout=max(deadline - loop.time(), 0))
+                except StopAsyncIteration:
+                    break
+                finally:
+                    inference += loop.time() - waiting
+                if first_chunk:
+                    record_stage("first_token", model, loop.time() - started)
+                    first_chunk = False
+                text = chunk['message']['content']
+                if text:
+                    yield "token", text
+                for name, value in parser.feed(text):
+                    # The server replaces the CLO fields, so the model's guesses are not forwarded
+                    if name not in SERVER_FIELDS:
+                        yield "field", {"name": name, "value": value}
+                if chunk.get('done'):
+                    final = chunk
+        finally:
+            await stream.aclose()
+            record_stage("inference", model, inference)
+    except asyncio.TimeoutError:
+        logger.warning(f"Inference timeout for model {model}")
+        raise InferenceTimeoutError(f"Model {model} did not respond within {settings.inference_timeout}s")
+    finally:
+        scheduler.release(model)
+
+    if final is not None:
+        get_admission_controller().observe(model, inference)
+        record_ollama_response(model, final)
+    yield "result", parse_analysis(parser.buffer, model)
+
 def get_thermal_comfort(clo_value: float) -> str:
     """
     Returns a very brief description of the thermal comfort for a given CLO value.
@@ -114,5 +252,3 @@ def get_thermal_comfort(clo_value: float) -> str:
         return "heavy insulation for very cold conditions"
     else:
         return "maximum insulation for extreme cold"
-
-# Function removed as we're now using the VLM-generated text directly
\ No newline at end of file
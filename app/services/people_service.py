@@ -0,0 +1,106 @@
+import asyncio
+import hashlib
+import logging
+from typing import List, Optional, Tuple
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from app.core.settings import settings
+from app.schemas.people import MultiPersonAnalysis, PersonAnalysis
+from app.services.analysis_service import analyze_cached
+from app.services.detection_service import Box, detect_people, pad_box
+from app.services.metrics import timed
+from app.services.preprocess_service import decode_image, encode_for_model, get_preprocess_profile
+
+logger = logging.getLogger(__name__)
+
+class ImageDecodeError(Exception):
+    """Raised when an uploaded image cannot be decoded."""
+
+def crop_people(data: bytes, model: str) -> Tuple[Tuple[int, int], List[Tuple[Optional[Box], bytes]]]:
+    """
+    Cuts an image into one JPEG per detected person.
+
+    The image is decoded once; detection runs on a downscaled copy and every
+    crop is cut from the same decoded image and sized for the model's profile.
+
+    Args:
+        data: Encoded image bytes
+        model: Name of the Ollama model the crops are for
+
+    Returns:
+        Tuple of the upright image size and (padded box, JPEG bytes) per person,
+        largest first and at most settings.people_max_per_frame. Without any
+        detection, the whole frame is returned with a box of None.
+
+    Raises:
+        ImageDecodeError: If the image cannot be decoded
+    """
+    profile = get_preprocess_profile(model)
+    try:
+        image, _, _ = decode_image(data)
+    except OSError as e:
+        raise ImageDecodeError(f"Could not decode image: {e}") from e
+    people = detect_people(np.asarray(image))[:settings.people_max_per_frame]
+    if not people:
+        return image.size, [(None, encode_for_model(image, profile))]
+    crops = []
+    for person in people:
+        box = pad_box(person, settings.person_crop_padding, image.width, image.height)
+        x, y, w, h = box
+        crops.append((box, encode_for_model(image.crop((x, y, x + w, y + h)), profile)))
+    return image.size, crops
+
+async def analyze_people(image_bytes: bytes, model: str, source_id: Optional[str] = None) -> MultiPersonAnalysis:
+    """
+    Analyzes every person in an image separately.
+
+    Crops of one image are analyzed concurrently, at most
+    settings.people_max_concurrency at a time, each through the cached pipeline
+    as an already prepared image. Every crop that needs the model is admitted
+    on its own.
+
+    Args:
+        image_bytes: Encoded image bytes as uploaded
+        model: Name of the Ollama model to use
+        source_id: Camera or other source of the image, kept in the analysis store
+
+    Returns:
+        MultiPersonAnalysis with one entry per person and their mean CLO value
+
+    Raises:
+        ImageDecodeError: If the image cannot be decoded
+        Exception: The first person's error, when no person could be analyzed
+    """
+    with timed("detect_people", model):
+        size, crops = await run_in_threadpool(crop_people, image_bytes, model)
+    limit = asyncio.Semaphore(settings.people_max_concurrency)
+
+    async def analyze_crop(crop: bytes):
+        async with limit:
+            return await analyze_cached(crop, hashlib.sha256(crop).hexdigest(), model, "image/jpeg", source_id,
+                                        prepared=True)
+
+    results = await asyncio.gather(*(analyze_crop(crop) for _, crop in crops), return_exceptions=True)
+    errors = [result for result in results if isinstance(result, BaseException)]
+    for error in errors:
+        if not isinstance(error, Exception):
+            raise error
+    if len(errors) == len(results):
+        # Nothing to report per person; surface the failure (queue full, timeout...) as a whole
+        raise errors[0]
+
+    people = []
+    for (box, _), result in zip(crops, results):
+        if isinstance(result, Exception):
+            logger.warning(f"Analysis of person at {box} failed: {result}")
+            people.append(PersonAnalysis(box=list(box) if box else None, error=str(result) or type(result).__name__))
+        else:
+            analysis, metadata = result
+            people.append(PersonAnalysis(box=list(box) if box else None, analysis=analysis, cache=metadata["cache"]))
+    clo_values = [person.analysis.clo_insulation for person in people if person.analysis is not None]
+    return MultiPersonAnalysis(
+        people=people,
+        person_count=0 if crops[0][0] is None else len(crops),
+        mean_clo=round(float(np.mean(clo_values)), 2),
+        image_size=list(size),
+    )
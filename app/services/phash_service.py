@@ -0,0 +1,223 @@
+import io
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from app.core.settings import settings
+from app.schemas.clothing import ClothingAnalysis
+
+logger = logging.getLogger(__name__)
+
+HASH_SIDE = 32
+LOW_FREQUENCIES = 8
+QUERY_BLOCK_CELLS = 4_000_000
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    matrix = np.sqrt(2 / n) * np.cos(np.pi * (2 * x + 1) * k / (2 * n))
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+_DCT = _dct_matrix(HASH_SIDE)
+_BIT_WEIGHTS = (1 << np.arange(LOW_FREQUENCIES * LOW_FREQUENCIES, dtype=np.uint64)[::-1]).astype(np.uint64)
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def perceptual_hash(data: bytes) -> int:
+    """
+    Computes the 64-bit pHash of an encoded image.
+
+    The image is reduced to 32x32 grayscale; the hash records which of the 8x8
+    lowest DCT frequencies lie above their median. Re-encoding, resizing and mild
+    color changes leave it (nearly) unchanged.
+
+    Args:
+        data: Encoded image bytes
+
+    Returns:
+        The hash as an unsigned 64-bit integer
+
+    Raises:
+        OSError: If the image cannot be decoded
+    """
+    from PIL import Image
+    image = Image.open(io.BytesIO(data))
+    # JPEG decoding at a fraction of the size
+    image.draft("L", (HASH_SIDE * 4, HASH_SIDE * 4))
+    pixels = np.asarray(image.convert("L").resize((HASH_SIDE, HASH_SIDE), Image.LANCZOS), dtype=np.float64)
+    low = (_DCT @ pixels @ _DCT.T)[:LOW_FREQUENCIES, :LOW_FREQUENCIES].ravel()
+    bits = low > np.median(low[1:])
+    return int((bits.astype(np.uint64) * _BIT_WEIGHTS).sum())
+
+def hamming_distances(hashes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    """
+    Counts differing bits between every query and every hash.
+
+    Args:
+        hashes: uint64 array of N hashes
+        queries: uint64 array of Q hashes to compare against
+
+    Returns:
+        Q x N uint8 array of Hamming distances
+    """
+    xor = np.bitwise_xor(queries[:, None], hashes[None, :])
+    return _POPCOUNT[xor.view(np.uint8)].reshape(len(queries), len(hashes), 8).sum(axis=2, dtype=np.uint8)
+
+class PerceptualHashIndex:
+    """
+    Near-duplicate index of analyzed images.
+
+    Hashes live in one NumPy array, so a lookup is a vectorized XOR and popcount
+    over every entry. Entries are scoped by model and pipeline version, like the
+    exact cache, so a prompt or preprocessing change never reuses old answers.
+    When full, the oldest entries are dropped.
+
+    The arrays are preallocated and grow by doubling, so adding an entry does not
+    copy the index. Entries below the current size are never written in place;
+    trimming builds new arrays, so a lookup can scan a snapshot without the lock.
+    """
+
+    def __init__(self, max_entries: int, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.path = path
+        # Entries are the first _size items; the rest is spare capacity
+        self._size = 0
+        self._hashes = np.empty(0, dtype=np.uint64)
+        # Scope of each entry, as an index into _scope_names
+        self._scope_ids = np.empty(0, dtype=np.int32)
+        self._scope_names: Dict[str, int] = {}
+        self._analyses: List[str] = []
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._unsaved = 0
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.exists(path):
+            self.load()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _resize(self, capacity: int, drop: int = 0) -> None:
+        # Copies the entries after the first `drop` into new arrays of the given capacity
+        keep = self._size - drop
+        hashes = np.empty(capacity, dtype=np.uint64)
+        scope_ids = np.empty(capacity, dtype=np.int32)
+        hashes[:keep] = self._hashes[drop:self._size]
+        scope_ids[:keep] = self._scope_ids[drop:self._size]
+        self._hashes, self._scope_ids, self._size = hashes, scope_ids, keep
+
+    def add(self, image_hash: int, scope: str, analysis: ClothingAnalysis) -> None:
+        """
+        Stores the analysis of an image.
+
+        Args:
+            image_hash: pHash of the image
+            scope: Model and pipeline version the analysis was made with
+            analysis: Analysis to reuse for near-duplicates
+        """
+        with self._lock:
+            scope_id = self._scope_names.setdefault(scope, len(self._scope_names))
+            if self._size == len(self._hashes):
+                self._resize(max(self._size + 1, min(max(64, 2 * self._size), self.max_entries + 1)))
+            self._hashes[self._size] = image_hash
+            self._scope_ids[self._size] = scope_id
+            self._size += 1
+            self._analyses.append(analysis.model_dump_json())
+            overflow = self._size - self.max_entries
+            if overflow > 0:
+                # Trim a tenth at once rather than one entry per add
+                overflow = max(overflow, self.max_entries // 10)
+                self._resize(len(self._hashes), drop=overflow)
+                # A new list, not del: lookups may still hold the old one
+                self._analyses = self._analyses[overflow:]
+            self._unsaved += 1
+        if self.path and self._unsaved >= settings.phash_save_every:
+            self.save()
+
+    def query_many(self, image_hashes: List[int], scope: str, max_distance: int) -> List[Optional[Tuple[int, ClothingAnalysis]]]:
+        """
+        Finds the closest stored analysis for each hash.
+
+        Args:
+            image_hashes: pHashes to look up
+            scope: Model and pipeline version to match
+            max_distance: Largest Hamming distance that counts as a duplicate
+
+        Returns:
+            Per hash, (distance, analysis) of the nearest entry within max_distance, or None
+        """
+        with self._lock:
+            hashes = self._hashes[:self._size]
+            scope_ids = self._scope_ids[:self._size]
+            scope_id = self._scope_names.get(scope, -1)
+            analyses = self._analyses
+        candidates = scope_ids == scope_id
+        results: List[Optional[Tuple[int, ClothingAnalysis]]] = [None] * len(image_hashes)
+        if candidates.any():
+            hashes = hashes[candidates]
+            positions = np.flatnonzero(candidates)
+            queries = np.array(image_hashes, dtype=np.uint64)
+            # Bounds the Q x N distance matrix to a few tens of megabytes
+            step = max(1, QUERY_BLOCK_CELLS // len(hashes))
+            for start in range(0, len(queries), step):
+                distances = hamming_distances(hashes, queries[start:start + step])
+                nearest = distances.argmin(axis=1)
+                for offset, index in enumerate(nearest):
+                    distance = int(distances[offset, index])
+                    if distance <= max_distance:
+                        analysis = ClothingAnalysis.model_validate_json(analyses[positions[index]])
+                        results[start + offset] = (distance, analysis)
+        found = sum(result is not None for result in results)
+        with self._lock:
+            self.hits += found
+            self.misses += len(results) - found
+        return results
+
+    def query(self, image_hash: int, scope: str, max_distance: int) -> Optional[Tuple[int, ClothingAnalysis]]:
+        return self.query_many([image_hash], scope, max_distance)[0]
+
+    def save(self) -> None:
+        """Writes the index to self.path, replacing the previous file atomically."""
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                hashes = self._hashes[:self._size]
+                scope_ids = self._scope_ids[:self._size]
+                scope_names = np.array(sorted(self._scope_names, key=self._scope_names.get), dtype=str)
+                analyses = np.array(self._analyses, dtype=str)
+                self._unsaved = 0
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "wb") as f:
+                np.savez(f, hashes=hashes, scope_ids=scope_ids, scope_names=scope_names, analyses=analyses)
+            os.replace(temp_path, self.path)
+
+    def load(self) -> None:
+        """Reads the index from self.path."""
+        try:
+            with np.load(self.path) as data:
+                hashes = data["hashes"].astype(np.uint64)
+                scope_ids = data["scope_ids"].astype(np.int32)
+                scope_names = {name: i for i, name in enumerate(data["scope_names"].tolist())}
+                analyses = data["analyses"].tolist()
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable perceptual hash index {self.path}: {e}")
+            return
+        with self._lock:
+            self._hashes, self._scope_ids, self._scope_names, self._analyses = hashes, scope_ids, scope_names, analyses
+            self._size = len(hashes)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "max_distance": settings.phash_max_distance,
+        }
+
+phash_index = PerceptualHashIndex(settings.phash_max_entries, settings.phash_index_path)
@@ -0,0 +1,182 @@
+import io
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+import numpy as np
+from app.core.settings import settings, PreprocessProfile
+from app.services.detection_service import Box, find_crop_subject, pad_box
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+EXIF_ORIENTATION = 0x0112
+
+# Running totals reported by /analyze-clothing/stats
+preprocess_totals: Dict[str, float] = {
+    "images": 0,
+    "bytes_in": 0,
+    "bytes_out": 0,
+    "crops": 0,
+    "elapsed_ms": 0.0,
+}
+# Preprocessing runs in threadpool workers
+_totals_lock = threading.Lock()
+
+def get_preprocess_profile(model: str) -> PreprocessProfile:
+    """
+    Returns the preprocessing profile for a model.
+
+    Profiles are looked up by the full model name ("gemma3:4b"), then by the model
+    family ("gemma3"), falling back to the default profile.
+
+    Args:
+        model: Name of the Ollama model
+
+    Returns:
+        PreprocessProfile for the model
+    """
+    profiles = settings.preprocess_profiles
+    if model in profiles:
+        return profiles[model]
+    family = model.split(":", 1)[0]
+    if family in profiles:
+        return profiles[family]
+    return settings.preprocess_default_profile
+
+def decode_image(data: bytes, draft_side: Optional[int] = None) -> Tuple["Image.Image", Tuple[int, int], bool]:
+    """
+    Decodes image bytes once and applies the EXIF orientation.
+
+    Args:
+        data: Encoded image bytes
+        draft_side: If set, lets the JPEG decoder skip detail beyond this size
+
+    Returns:
+        Tuple of the oriented RGB image, the stored size and whether it was rotated
+    """
+    # Pillow is imported on first use so the service starts without it when preprocessing is off
+    from PIL import Image, ImageOps
+    image = Image.open(io.BytesIO(data))
+    stored_size = image.size
+    rotated = image.getexif().get(EXIF_ORIENTATION, 1) != 1
+    if draft_side:
+        image.draft("RGB", (draft_side, draft_side))
+    image = ImageOps.exif_transpose(image)
+
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+    return image, stored_size, rotated
+
+def encode_for_model(image: "Image.Image", profile: PreprocessProfile) -> bytes:
+    """
+    Downscales an image to fit the profile and encodes it as JPEG.
+
+    Args:
+        image: Decoded RGB image
+        profile: Preprocessing profile of the target model
+
+    Returns:
+        JPEG bytes
+    """
+    from PIL import Image
+    if max(image.size) > profile.max_side:
+        image = image.copy()
+        image.thumbnail((profile.max_side, profile.max_side), Image.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=profile.jpeg_quality)
+    return buffer.getvalue()
+
+def crop_to_person(image: "Image.Image") -> Tuple["Image.Image", Optional[Box]]:
+    """
+    Crops an image to the largest detected person plus padding.
+
+    Args:
+        image: Decoded RGB image
+
+    Returns:
+        Tuple of the cropped image and the crop box, or the unchanged image and None
+        when nobody was found or the image is already a close-up
+    """
+    person = find_crop_subject(np.asarray(image))
+    if person is None:
+        return image, None
+    box = pad_box(person, settings.person_crop_padding, image.width, image.height)
+    x, y, w, h = box
+    return image.crop((x, y, x + w, y + h)), box
+
+def preprocess_image(data: bytes, model: str) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    Prepares an uploaded image for the vision model.
+
+    Applies the EXIF orientation, optionally crops to the largest person, downscales
+    so the longest side fits the model's profile and re-encodes as JPEG. The original
+    bytes are kept when re-encoding would not make them smaller and no rotation,
+    crop or resize was needed.
+
+    Args:
+        data: Encoded image bytes as uploaded
+        model: Name of the Ollama model the image is for
+
+    Returns:
+        Tuple of the bytes to send and a report of the work done
+    """
+    start = time.perf_counter()
+    profile = get_preprocess_profile(model)
+    crop_enabled = settings.person_crop_enabled
+
+    # Cropping needs full detail; otherwise decode straight to the target size
+    image, stored_size, rotated = decode_image(data, None if crop_enabled else profile.max_side)
+    resized = max(stored_size) > profile.max_side
+
+    report: Dict[str, Any] = {}
+    if crop_enabled:
+        image, box = crop_to_person(image)
+        report["crop_box"] = list(box) if box else None
+
+    output = encode_for_model(image, profile)
+    if not resized and not rotated and not report.get("crop_box") and len(output) >= len(data):
+        output = data
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    report.update({
+        "bytes_in": len(data),
+        "bytes_out": len(output),
+        "bytes_saved": len(data) - len(output),
+        "size_in": list(stored_size),
+        "elapsed_ms": round(elapsed_ms, 2),
+    })
+
+    with _totals_lock:
+        preprocess_totals["images"] += 1
+        preprocess_totals["bytes_in"] += len(data)
+        preprocess_totals["bytes_out"] += len(output)
+        preprocess_totals["elapsed_ms"] += elapsed_ms
+        if crop_enabled:
+            preprocess_totals["crops"] += 1 if report["crop_box"] else 0
+    return output, report
+
+def preprocess_stats() -> Dict[str, float]:
+    """
+    Returns totals for the preprocessing stage.
+
+    Returns:
+        Dictionary with image count, bytes in/out/saved, person crops and time spent
+    """
+    with _totals_lock:
+        totals = dict(preprocess_totals)
+    return {
+        "images": totals["images"],
+        "bytes_in": totals["bytes_in"],
+        "bytes_out": totals["bytes_out"],
+        "bytes_saved": totals["bytes_in"] - totals["bytes_out"],
+        "person_crops": totals["crops"],
+        "elapsed_ms": round(totals["elapsed_ms"], 2),
+    }
@@ -0,0 +1,190 @@
+import copy
+import hashlib
+import json
+from typing import Any, Dict, List, Tuple, Union
+from app.core.settings import settings
+from app.schemas.clothing import ClothingAnalysis, CLO_SCALE
+
+SYSTEM_PROMPT_BASE = (
+    "You are an assistant that describes clothing in images CONCISELY yet INFORMATIVELY. "
+    "You MUST NOT describe or speculate about the person's age. "
+    "Focus exclusively on visible clothing, accessories, colors, materials, and thermal properties. "
+    "Keep your descriptions focused and informative - use 3-4 short sentences. "
+    "Be clear about whether the clothing is suited for warm or cold weather and provide brief reasoning."
+)
+
+SYSTEM_PROMPT_CLO = "Be precise in your CLO estimation based on visible layers, fabric thickness, and coverage."
+
+USER_PROMPT_QUESTIONS = (
+    "description: What is in this image? Please analyze the person in this image and provide a CONCISE yet INFORMATIVE description (4-5 short sentences) of their clothing. Include details about the type of clothing items, materials, colors, and key features. Assess whether the outfit is suited for warm or cold weather and provide brief reasoning based on the visible clothing layers and materials.\n\n"
+    "After the description, please answer the following questions:\n"
+    "1. What type of clothing is the person wearing? (e.g., t-shirt, sweater, jacket, etc.)\n"
+    "2. Is the sleeve length short, long, or sleeveless?\n"
+    "3. What is the color of the clothing?\n"
+    "4. Is the person wearing glasses? (Yes or No)\n"
+    "5. Is the person wearing any headwear? (Yes or No)\r\n"
+    "6. Is the person wearing any accessories? (e.g., scarf, gloves, belt, etc.)\r\n"
+)
+
+USER_PROMPT_CLO = (
+    "7. Estimate the CLO value of the clothing based on its thermal insulation properties using this precise scale:\n"
+    + CLO_SCALE +
+    "8. For the clo_insulation_text field, provide a single short sentence that states the exact CLO value and explains what it means for thermal comfort. Example: 'CLO value of 0.8 provides light insulation for mild conditions.' Keep it extremely brief (max 15 words)."
+)
+
+SYSTEM_PROMPT = SYSTEM_PROMPT_BASE + "\n\n" + SYSTEM_PROMPT_CLO
+USER_PROMPT = USER_PROMPT_QUESTIONS + USER_PROMPT_CLO
+
+# Fields the server computes from the detected clothing after the model answers
+SERVER_FIELDS = {"clo_insulation": 0.0, "clo_insulation_text": ""}
+
+def trim_schema(schema: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    """
+    Removes fields from a JSON schema so the model is not asked to produce them.
+
+    Args:
+        schema: JSON schema of the response model
+        fields: Names of the top-level properties to remove
+
+    Returns:
+        A trimmed copy of the schema
+    """
+    trimmed = copy.deepcopy(schema)
+    for field in fields:
+        trimmed["properties"].pop(field, None)
+    trimmed["required"] = [name for name in trimmed.get("required", []) if name not in fields]
+    return trimmed
+
+class PromptTemplate:
+    """Prompts and output schema sent to the model, built once and reused for every request."""
+
+    def __init__(self, version: str, system_prompt: str, user_prompt: str, schema: Dict[str, Any],
+                 server_fields: Dict[str, Any]):
+        self.version = version
+        self.system_prompt = system_prompt
+        self.user_prompt = user_prompt
+        self.schema = schema
+        # Defaults for fields left out of the schema, filled in before validation
+        self.server_fields = server_fields
+        self._system_message = {"role": "system", "content": system_prompt}
+        # Identifies the prompts and schema, so cached results are invalidated
+        # whenever either changes
+        self.hash = hashlib.sha256(
+            "\n".join([version, system_prompt, user_prompt, json.dumps(schema, sort_keys=True)]).encode("utf-8")
+        ).hexdigest()[:16]
+
+    def build_messages(self, image: Union[str, bytes]) -> list:
+        """
+        Builds the chat messages sent to the vision model.
+
+        Args:
+            image: Path to the image file or its raw bytes
+
+        Returns:
+            List of chat messages containing the system and user prompts
+        """
+        return [
+            self._system_message,
+            {
+                'role': 'user',
+                'content': self.user_prompt,
+                'images': [image]
+            }
+        ]
+
+    def parse(self, content: str) -> ClothingAnalysis:
+        """
+        Validates the model output against the full ClothingAnalysis schema.
+
+        Args:
+            content: JSON string returned by the model
+
+        Returns:
+            ClothingAnalysis object; server-computed fields hold placeholders
+        """
+        if not self.server_fields:
+            return ClothingAnalysis.model_validate_json(content)
+        data = json.loads(content)
+        for field, default in self.server_fields.items():
+            data.setdefault(field, default)
+        return ClothingAnalysis.model_validate(data)
+
+def _build_templates() -> Dict[str, PromptTemplate]:
+    schema = ClothingAnalysis.model_json_schema()
+    return {
+        "v1": PromptTemplate("v1", SYSTEM_PROMPT, USER_PROMPT, schema, {}),
+        # Leaves out the CLO fields the server overwrites anyway, saving output tokens
+        "v1-trimmed": PromptTemplate(
+            "v1-trimmed",
+            SYSTEM_PROMPT_BASE,
+            USER_PROMPT_QUESTIONS.rstrip(),
+            trim_schema(schema, list(SERVER_FIELDS)),
+            dict(SERVER_FIELDS)
+        ),
+    }
+
+PROMPT_TEMPLATES = _build_templates()
+
+_registry: Dict[Tuple[str, str], PromptTemplate] = {}
+
+def prompt_version_for(model: str) -> str:
+    """
+    Returns the prompt version configured for a model.
+
+    Versions are looked up by the full model name, then by the model family,
+    falling back to settings.prompt_version.
+
+    Args:
+        model: Name of the Ollama model
+
+    Returns:
+        Name of the prompt version
+    """
+    versions = settings.model_prompt_versions
+    if model in versions:
+        return versions[model]
+    return versions.get(model.split(":", 1)[0], settings.prompt_version)
+
+def get_prompt(model: str) -> PromptTemplate:
+    """
+    Returns the prompt template used for model.
+
+    Args:
+        model: Name of the Ollama model to use
+
+    Returns:
+        The PromptTemplate of the version configured for the model
+
+    Raises:
+        ValueError: If the configured prompt version does not exist
+    """
+    version = prompt_version_for(model)
+    template = _registry.get((model, version))
+    if template is None:
+        if version not in PROMPT_TEMPLATES:
+            raise ValueError(f"Unknown prompt version '{version}' for model {model}")
+        template = _registry[(model, version)] = PROMPT_TEMPLATES[version]
+    return template
+
+def build_prompt_registry() -> None:
+    """
+    Resolves the templates of the default model and every configured model;
+    called on application startup so a misconfigured version fails fast.
+    """
+    for model in [settings.model_name, *settings.model_prompt_versions]:
+        get_prompt(model)
+
+def prompt_stats() -> Dict[str, Any]:
+    """
+    Returns the registered prompt templates.
+
+    Returns:
+        Dictionary with the available versions and the version and hash used per model
+    """
+    return {
+        "versions": sorted(PROMPT_TEMPLATES),
+        "models": {
+            model: {"version": version, "hash": template.hash}
+            for (model, version), template in _registry.items()
+        },
+    }
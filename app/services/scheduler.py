@@ -0,0 +1,149 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+class _Waiter:
+    def __init__(self, model: str, future: "asyncio.Future"):
+        self.model = model
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+class ModelScheduler:
+    """
+    Hands out inference slots, grouping requests by model.
+
+    Switching Ollama to another model means unloading and loading gigabytes of
+    weights, so when a slot frees up the scheduler keeps serving the model that ran
+    last while it has requests queued. A request for another model queues, even
+    with slots free, while a different model holds slots. The scheduler switches
+    once the running model's queue and slots have drained, or earlier if another
+    model's oldest request has waited max_wait.
+    """
+
+    def __init__(self, slots: int, max_wait: float):
+        self.slots = slots
+        self.max_wait = max_wait
+        self.active_model: Optional[str] = None
+        self.swaps = 0
+        self.forced_swaps = 0
+        self.dispatched: Dict[str, int] = {}
+        self._free = slots
+        self._running: Dict[str, int] = {}
+        self._queues: Dict[str, Deque[_Waiter]] = {}
+
+    async def acquire(self, model: str, timeout: float) -> None:
+        """
+        Waits for an inference slot for model.
+
+        Args:
+            model: Name of the model the request will run
+            timeout: Seconds to wait before giving up
+
+        Raises:
+            asyncio.TimeoutError: If no slot was granted in time
+        """
+        if self._free > 0 and not self._has_waiters() and all(running == model for running in self._running):
+            self._grant(model)
+            return
+
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(model, loop.create_future())
+        self._queues.setdefault(model, deque()).append(waiter)
+        # A free slot may still go to this request if its model is the one running
+        self._dispatch()
+        if waiter.future.done():
+            return
+        if self._free > 0:
+            # Held back only because another model holds slots; no release may
+            # come before max_wait, so look again then
+            loop.call_later(self.max_wait, self._dispatch)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except BaseException:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # The slot was granted just as we gave up; pass it on
+                self.release(model)
+            else:
+                waiter.future.cancel()
+                self._prune(model)
+            raise
+
+    def release(self, model: str) -> None:
+        """
+        Returns a slot and hands it to the next request.
+
+        Args:
+            model: Name of the model the slot was acquired for
+        """
+        self._free += 1
+        self._running[model] -= 1
+        if not self._running[model]:
+            del self._running[model]
+        self._dispatch()
+
+    def _grant(self, model: str) -> None:
+        self._free -= 1
+        self._running[model] = self._running.get(model, 0) + 1
+        if self.active_model is not None and model != self.active_model:
+            self.swaps += 1
+        self.active_model = model
+        self.dispatched[model] = self.dispatched.get(model, 0) + 1
+
+    def _prune(self, model: str) -> None:
+        queue = self._queues.get(model)
+        while queue and queue[0].future.done():
+            queue.popleft()
+        if queue is not None and not queue:
+            del self._queues[model]
+
+    def _has_waiters(self) -> bool:
+        for model in list(self._queues):
+            self._prune(model)
+        return bool(self._queues)
+
+    def _pick_model(self) -> Optional[str]:
+        now = time.monotonic()
+        oldest = min(self._queues.values(), key=lambda queue: queue[0].enqueued_at)[0]
+        if oldest.model != self.active_model and now - oldest.enqueued_at >= self.max_wait:
+            self.forced_swaps += 1
+            return oldest.model
+        if self.active_model in self._queues:
+            return self.active_model
+        if self._running:
+            # Let the running model drain before switching
+            return None
+        # Amortize the swap over as many requests as possible
+        return max(self._queues, key=lambda model: len(self._queues[model]))
+
+    def _dispatch(self) -> None:
+        while self._free > 0 and self._has_waiters():
+            model = self._pick_model()
+            if model is None:
+                return
+            waiter = self._queues[model].popleft()
+            self._prune(model)
+            self._grant(model)
+            waiter.future.set_result(None)
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Returns scheduler counters.
+
+        Returns:
+            Dictionary with the active model, free slots, slots held per model,
+            queue depth per model, model swaps and requests dispatched per model
+        """
+        self._has_waiters()
+        return {
+            "active_model": self.active_model,
+            "free_slots": self._free,
+            "running": dict(self._running),
+            "queue_depth": {
+                model: sum(1 for waiter in queue if not waiter.future.done())
+                for model, queue in self._queues.items()
+            },
+            "swaps": self.swaps,
+            "forced_swaps": self.forced_swaps,
+            "dispatched": dict(self.dispatched),
+        }
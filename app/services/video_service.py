@@ -0,0 +1,194 @@
+import asyncio
+import hashlib
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from app.services.analysis_service import analyze_cached
+from app.utils.lazy_import import load_opencv
+
+if TYPE_CHECKING:
+    import cv2
+
+logger = logging.getLogger(__name__)
+
+# Side of the grayscale thumbnail frames are compared on
+SIGNATURE_SIDE = 32
+
+STREAM_PREFIXES = ("rtsp://", "rtsps://", "http://", "https://")
+
+class VideoError(Exception):
+    """Raised when a video source cannot be opened."""
+
+def is_stream_url(source: str) -> bool:
+    """Tells whether source is a network stream rather than a file path."""
+    return source.lower().startswith(STREAM_PREFIXES)
+
+def open_video(source: str) -> "cv2.VideoCapture":
+    """
+    Opens a video file or stream.
+
+    Args:
+        source: Video file path, or an RTSP/HTTP (MJPEG) stream URL
+
+    Returns:
+        The opened capture
+
+    Raises:
+        VideoError: If the source cannot be opened
+        MissingDependencyError: If OpenCV is not installed
+    """
+    capture = load_opencv().VideoCapture(source)
+    if not capture.isOpened():
+        capture.release()
+        raise VideoError(f"Cannot open video source {source}")
+    return capture
+
+def iter_sampled_frames(capture: "cv2.VideoCapture", live: bool, interval: float,
+                        max_frames: int) -> Iterator[Tuple[float, np.ndarray]]:
+    """
+    Reads one frame every interval seconds from an opened capture.
+
+    Files are sampled on their own timeline; skipped frames are only grabbed, not
+    decoded. Live streams are sampled on the wall clock and read continuously so
+    the capture buffer does not fall behind.
+
+    Args:
+        capture: Opened video capture, released when the iterator finishes
+        live: Whether the capture is a live stream
+        interval: Seconds between sampled frames
+        max_frames: Maximum number of frames to sample
+
+    Returns:
+        Iterator of (timestamp in seconds, BGR frame) pairs
+    """
+    position = load_opencv().CAP_PROP_POS_MSEC
+    started = time.monotonic()
+    next_at = 0.0
+    sampled = 0
+    try:
+        while sampled < max_frames:
+            if not capture.grab():
+                return
+            timestamp = time.monotonic() - started if live else capture.get(position) / 1000
+            if timestamp < next_at:
+                continue
+            ok, frame = capture.retrieve()
+            if not ok:
+                return
+            yield timestamp, frame
+            sampled += 1
+            next_at = timestamp + interval
+    finally:
+        capture.release()
+
+def frame_signature(frame: np.ndarray) -> np.ndarray:
+    """
+    Reduces a frame to a small grayscale thumbnail for change detection.
+
+    Args:
+        frame: BGR frame
+
+    Returns:
+        SIGNATURE_SIDE x SIGNATURE_SIDE float32 array with values in [0, 1]
+    """
+    cv2 = load_opencv()
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (SIGNATURE_SIDE, SIGNATURE_SIDE), interpolation=cv2.INTER_AREA)
+    return small.astype(np.float32) / 255
+
+def frame_difference(a: np.ndarray, b: np.ndarray) -> float:
+    """Mean absolute difference of two signatures, from 0 (identical) to 1."""
+    return float(np.abs(a - b).mean())
+
+def encode_frame(frame: np.ndarray) -> bytes:
+    """Encodes a BGR frame as JPEG for the analysis pipeline."""
+    cv2 = load_opencv()
+    ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    if not ok:
+        raise VideoError("Cannot encode frame")
+    return encoded.tobytes()
+
+def _close_capture(frames: Iterator[Tuple[float, np.ndarray]], capture: "cv2.VideoCapture") -> None:
+    frames.close()
+    # Covers iterators closed before their first frame
+    capture.release()
+
+async def analyze_video(capture: "cv2.VideoCapture", live: bool, model: str, interval: float,
+                        change_threshold: float, smoothing: float, max_frames: int,
+                        source_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Turns a video into a time series of CLO values.
+
+    Frames are sampled every interval seconds. A sampled frame is only analyzed
+    when it differs from the last analyzed frame by at least change_threshold;
+    otherwise the previous analysis carries over. CLO values are smoothed with an
+    exponential moving average so a single odd answer does not swing the series.
+
+    Args:
+        capture: Opened video capture, from open_video
+        live: Whether the capture is a live stream
+        model: Name of the Ollama model to use
+        interval: Seconds between sampled frames
+        change_threshold: Mean absolute thumbnail difference (0-1) that counts as a change
+        smoothing: Weight of the newest CLO value in the moving average (1 disables smoothing)
+        max_frames: Maximum number of frames to sample
+        source_id: Camera or other source name analyzed frames are recorded under
+
+    Returns:
+        Async iterator of one point per sampled frame, followed by a summary
+    """
+    frames = iter_sampled_frames(capture, live, interval, max_frames)
+    # Reads, and closing once done, run in order on one thread: closing must
+    # not race a read still in progress when the client disconnects
+    reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="video-reader")
+    loop = asyncio.get_running_loop()
+    last_signature: Optional[np.ndarray] = None
+    last_point: Dict[str, Any] = {}
+    smoothed: Optional[float] = None
+    sampled = analyzed = 0
+    try:
+        while True:
+            item = await loop.run_in_executor(reader, next, frames, None)
+            if item is None:
+                break
+            timestamp, frame = item
+            sampled += 1
+            signature = frame_signature(frame)
+            difference = None if last_signature is None else frame_difference(signature, last_signature)
+            point: Dict[str, Any] = {"type": "point", "timestamp": round(timestamp, 3)}
+
+            if difference is not None and difference < change_threshold:
+                point.update(last_point, analyzed=False, difference=round(difference, 4))
+            else:
+                image_bytes = await run_in_threadpool(encode_frame, frame)
+                try:
+                    analysis, metadata = await analyze_cached(
+                        image_bytes, hashlib.sha256(image_bytes).hexdigest(), model, "image/jpeg", source_id
+                    )
+                except Exception as e:
+                    point.update(analyzed=False, error=str(e) or type(e).__name__)
+                    yield point
+                    continue
+                analyzed += 1
+                last_signature = signature
+                last_point = {"clo": analysis.clo_insulation, "clothing_type": analysis.clothing_type}
+                point.update(last_point, analyzed=True, cache=metadata["cache"],
+                             difference=None if difference is None else round(difference, 4))
+
+            if "clo" in point:
+                smoothed = point["clo"] if smoothed is None else smoothing * point["clo"] + (1 - smoothing) * smoothed
+                point["clo_smoothed"] = round(smoothed, 3)
+            yield point
+    finally:
+        reader.submit(_close_capture, frames, capture)
+        reader.shutdown(wait=False)
+
+    yield {
+        "type": "summary",
+        "frames_sampled": sampled,
+        "frames_analyzed": analyzed,
+        "clo_smoothed": None if smoothed is None else round(smoothed, 3),
+    }
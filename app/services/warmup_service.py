@@ -0,0 +1,199 @@
+import asyncio
+import io
+import logging
+import time
+from typing import Any, Dict, List, Optional, Set
+from fastapi.concurrency import run_in_threadpool
+from app.core.settings import settings
+from app.services.backend_pool import Backend, BackendPool, normalize_model_name
+from app.services.ollama_service import get_backend_pool
+
+logger = logging.getLogger(__name__)
+
+def make_warmup_image() -> bytes:
+    """Returns a tiny JPEG, enough to run the vision encoder once."""
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (128, 128, 128)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+class WarmupManager:
+    """
+    Preloads models on every backend and keeps recently used ones loaded.
+
+    Warm-up sends each model a one-token chat with a tiny image, which loads the
+    weights and primes the vision encoder. It is retried until every model is
+    loaded on at least one backend; until then the service reports not ready.
+    A model that no backend has installed after settings.warmup_max_attempts
+    rounds is reported as missing and no longer retried or counted for readiness.
+    Afterwards, models used within keep_alive_idle_timeout are refreshed every
+    keep_alive_interval so a lull in traffic does not unload them.
+    """
+
+    def __init__(self, pool: BackendPool, models: List[str]):
+        self.pool = pool
+        self.models = models
+        self.warmed = False
+        # Per model, per host: "pending", "warm", "not installed" or the last error
+        self.status: Dict[str, Dict[str, str]] = {
+            model: {backend.host: "pending" for backend in pool.backends} for model in models
+        }
+        # Models no backend has installed, given up on
+        self.missing: Set[str] = set()
+        self.refreshes = 0
+        # Built on the first warm-up, so Pillow is not imported when warm-up is off
+        self._image: Optional[bytes] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        """Tells whether warm-up finished and at least one backend is healthy."""
+        return self.warmed and any(backend.healthy for backend in self.pool.backends)
+
+    async def start(self) -> None:
+        """Starts warming up in the background; startup does not wait for it."""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def warm(self, backend: Backend, model: str) -> bool:
+        """
+        Loads a model on one backend.
+
+        Args:
+            backend: Backend to load the model on
+            model: Name of the model
+
+        Returns:
+            True if the model is loaded
+        """
+        name = normalize_model_name(model)
+        if backend.available_models and name not in backend.available_models:
+            self.status[model][backend.host] = "not installed"
+            return False
+        if self._image is None:
+            self._image = await run_in_threadpool(make_warmup_image)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(
+                backend.client.chat(
+                    model=model,
+                    messages=[{"role": "user", "content": "Describe the image in one word.", "images": [self._image]}],
+                    options={"num_predict": 1},
+                    keep_alive=settings.ollama_keep_alive
+                ),
+                timeout=settings.inference_timeout
+            )
+        except Exception as e:
+            if getattr(e, "status_code", None) == 404:
+                # The backend's model list was not known yet
+                self.status[model][backend.host] = "not installed"
+                return False
+            self.status[model][backend.host] = str(e) or type(e).__name__
+            logger.warning(f"Warm-up of {model} on {backend.host} failed: {self.status[model][backend.host]}")
+            return False
+        backend.loaded_models.add(name)
+        backend.last_used[model] = time.monotonic()
+        self.status[model][backend.host] = "warm"
+        logger.info(f"Warmed up {model} on {backend.host} in {time.perf_counter() - started:.1f}s")
+        return True
+
+    async def warm_all(self) -> bool:
+        """
+        Loads every pending model on every backend.
+
+        Returns:
+            True if each model not reported missing is loaded on at least one backend
+        """
+        models = [model for model in self.models if model not in self.missing]
+        pending = [
+            (backend, model) for model in models for backend in self.pool.backends
+            if self.status[model][backend.host] != "warm"
+        ]
+        # Models on the same host load one after another to avoid evicting each other
+        by_host: Dict[str, List[str]] = {}
+        for backend, model in pending:
+            by_host.setdefault(backend.host, []).append(model)
+
+        async def warm_host(backend: Backend) -> None:
+            for model in by_host.get(backend.host, []):
+                await self.warm(backend, model)
+
+        await asyncio.gather(*(warm_host(backend) for backend in self.pool.backends))
+        return all("warm" in self.status[model].values() for model in models)
+
+    def give_up_missing(self) -> None:
+        """Stops waiting for models that every backend reports as not installed."""
+        for model in self.models:
+            hosts = self.status[model]
+            if model not in self.missing and hosts and all(state == "not installed" for state in hosts.values()):
+                self.missing.add(model)
+                logger.error(f"Model {model} is not installed on any backend; /ready no longer waits for it")
+
+    async def refresh(self) -> None:
+        """Resets the keep-alive timer of models used recently on each backend."""
+        now = time.monotonic()
+        for backend in self.pool.backends:
+            if not backend.healthy:
+                continue
+            for model, last_used in list(backend.last_used.items()):
+                if now - last_used > settings.keep_alive_idle_timeout:
+                    continue
+                try:
+                    # A generate call without a prompt only loads the model
+                    await asyncio.wait_for(
+                        backend.client.generate(model=model, keep_alive=settings.ollama_keep_alive),
+                        timeout=settings.inference_timeout
+                    )
+                    self.refreshes += 1
+                except Exception as e:
+                    logger.warning(f"Keep-alive of {model} on {backend.host} failed: {e}")
+
+    async def _run(self) -> None:
+        attempts = 1
+        while not await self.warm_all():
+            if attempts >= settings.warmup_max_attempts:
+                self.give_up_missing()
+                if self.pending_models() <= self.missing:
+                    # Only missing models are left
+                    break
+            attempts += 1
+            await asyncio.sleep(settings.warmup_retry_interval)
+        self.warmed = True
+        loaded = [model for model in self.models if model not in self.missing]
+        logger.info(f"Warm-up finished for {', '.join(loaded) or 'no models'}")
+        while True:
+            await asyncio.sleep(settings.keep_alive_interval)
+            await self.refresh()
+
+    def pending_models(self) -> Set[str]:
+        """Returns the models not yet loaded on any backend."""
+        return {model for model, hosts in self.status.items() if "warm" not in hosts.values()}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "warmed": self.warmed,
+            "models": self.status,
+            "missing_models": sorted(self.missing),
+            "keep_alive_refreshes": self.refreshes,
+        }
+
+_warmup_manager: Optional[WarmupManager] = None
+
+def get_warmup_manager() -> WarmupManager:
+    """
+    Returns the warm-up manager, creating it on first use.
+
+    Returns:
+        WarmupManager for settings.warmup_models, or for no models if warm-up is disabled
+    """
+    global _warmup_manager
+    if _warmup_manager is None:
+        models = (settings.warmup_models or [settings.model_name]) if settings.warmup_enabled else []
+        _warmup_manager = WarmupManager(get_backend_pool(), models)
+    return _warmup_manager
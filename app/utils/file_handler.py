@@ -1,17 +1,64 @@
+import hashlib
 import tempfile
 import os
+from typing import Optional
 from fastapi import UploadFile
 
-def save_spooled_temp_image(upload: UploadFile) -> str:
-    """Save image to a spooled temp file, then write it to disk and return path."""
-    with tempfile.SpooledTemporaryFile(max_size=5_000_000, suffix=".jpg") as spooled_file:
-        spooled_file.write(upload.file.read())
-        spooled_file.seek(0)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
-        # Create a real temp file Ollama can read from
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as disk_file:
-            disk_file.write(spooled_file.read())
-            return disk_file.name  # Return actual file path
+IMAGE_SUFFIXES = {
+    "image/jpeg": ".jpg",
+    "image/jpg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/gif": ".gif",
+    "image/bmp": ".bmp",
+}
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds the configured size limit."""
+
+async def read_upload_bytes(upload: UploadFile, max_bytes: int) -> bytes:
+    """Read an upload into a single in-memory buffer, enforcing max_bytes."""
+    if upload.size is not None and upload.size > max_bytes:
+        raise UploadTooLargeError(f"Upload exceeds the {max_bytes} byte limit")
+
+    chunks = []
+    total = 0
+    while True:
+        chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise UploadTooLargeError(f"Upload exceeds the {max_bytes} byte limit")
+        chunks.append(chunk)
+    # A single chunk is returned as-is to avoid copying it again
+    return chunks[0] if len(chunks) == 1 else b"".join(chunks)
+
+def image_suffix(content_type: Optional[str], filename: Optional[str] = None) -> str:
+    """Pick a file suffix matching the image type."""
+    if content_type in IMAGE_SUFFIXES:
+        return IMAGE_SUFFIXES[content_type]
+    if filename:
+        ext = os.path.splitext(filename)[1].lower()
+        if ext:
+            return ext
+    return ".jpg"
+
+def save_temp_image(data: bytes, suffix: str = ".jpg") -> str:
+    """Write image bytes to a temp file on disk and return its path."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as disk_file:
+        disk_file.write(data)
+        return disk_file.name
+
+def file_sha256(path: str) -> str:
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
 
 def remove_temp_image(path: str):
     try:
@@ -0,0 +1,28 @@
+import importlib
+from types import ModuleType
+
+class MissingDependencyError(ImportError):
+    """Raised when a feature needs a package this runtime profile does not install."""
+
+def import_optional(name: str, requirements: str) -> ModuleType:
+    """
+    Imports a module the first time a feature needs it.
+
+    Args:
+        name: Module to import, e.g. "cv2"
+        requirements: Requirements file that installs it
+
+    Returns:
+        The imported module
+
+    Raises:
+        MissingDependencyError: If the module is not installed
+    """
+    try:
+        return importlib.import_module(name)
+    except ImportError as e:
+        raise MissingDependencyError(f"{name} is not installed; install {requirements}") from e
+
+def load_opencv() -> ModuleType:
+    """Returns OpenCV, used by person detection and video analysis only."""
+    return import_optional("cv2", "requirements/vision.txt")
@@ -0,0 +1,94 @@
+import json
+from typing import Any, List, Optional, Tuple
+
+_WHITESPACE = " \t\r\n"
+
+class PartialObjectParser:
+    """
+    Incrementally parses a JSON object arriving in chunks.
+
+    feed() returns the top-level fields whose values became complete, so a
+    consumer can act on "clothing_type" while "description" is still streaming.
+    Only the outer object is tracked; nested values are decoded once they close.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key: Optional[str] = None
+        self._key_start: Optional[int] = None
+        self._after_colon = False
+        self._value_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Adds a chunk of the JSON text.
+
+        Args:
+            chunk: Next piece of the JSON text
+
+        Returns:
+            List of (field name, decoded value) pairs completed by this chunk
+        """
+        self.buffer += chunk
+        completed: List[Tuple[str, Any]] = []
+        buffer = self.buffer
+        for i in range(self._pos, len(buffer)):
+            c = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        if self._key_start is not None:
+                            self._key = json.loads(buffer[self._key_start:i + 1])
+                            self._key_start = None
+                        elif self._value_start is not None:
+                            self._complete(i + 1, completed)
+                continue
+
+            if c == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    if self._after_colon:
+                        self._value_start = i
+                    else:
+                        self._key_start = i
+            elif c in "{[":
+                if self._depth == 1 and self._after_colon:
+                    self._value_start = i
+                self._depth += 1
+            elif c in "}]":
+                if self._depth == 1 and self._value_start is not None:
+                    # A number, boolean or null ends at the closing brace
+                    self._complete(i, completed)
+                self._depth -= 1
+                if self._depth == 1 and self._value_start is not None:
+                    self._complete(i + 1, completed)
+            elif self._depth == 1:
+                if c == ":":
+                    self._after_colon = True
+                elif c == ",":
+                    if self._value_start is not None:
+                        self._complete(i, completed)
+                    self._after_colon = False
+                elif c not in _WHITESPACE and self._after_colon and self._value_start is None:
+                    self._value_start = i
+        self._pos = len(buffer)
+        return completed
+
+    def _complete(self, end: int, completed: List[Tuple[str, Any]]) -> None:
+        text = self.buffer[self._value_start:end].strip()
+        self._value_start = None
+        self._after_colon = False
+        try:
+            completed.append((self._key, json.loads(text)))
+        except ValueError:
+            pass
+        self._key = None
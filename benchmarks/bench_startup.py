@@ -0,0 +1,219 @@
+"""
+Measure import time, startup time and memory of the API service.
+
+Each run uses a fresh interpreter. The import runs under `python -X importtime`,
+so the time can be attributed to the packages pulled in. A startup run starts
+uvicorn with warm-up disabled and times it until /health answers. The script
+fails when a module that should only load on demand (OpenCV, Pillow, requests) is
+imported by the import or by the application's startup hooks, when a --max-* budget is exceeded, or with
+--fail-on-regression when the median import or startup time grew more than
+--tolerance since the last run with the same configuration. Results are
+appended to a JSON Lines file. Run from the repository root:
+
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --max-import-ms 1500 --fail-on-regression
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+# Importable however the script is started, not only from inside benchmarks/
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from load_test import REPO_ROOT, git_commit, previous_run, read_rss_mb, wait_until_ready
+
+# Modules the API imports only when a request needs them: OpenCV for person
+# detection and video, Pillow for preprocessing and hashing, requests for webhooks
+LAZY_MODULES = ("cv2", "PIL", "requests")
+
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+with open("/proc/self/status") as f:
+    rss = next((int(line.split()[1]) / 1024 for line in f if line.startswith("VmRSS:")), None)
+print(json.dumps({{"seconds": elapsed, "rss_mb": rss, "modules": sorted(sys.modules)}}))
+"""
+
+# Runs the startup hooks too: importing the app alone misses what they load
+LIFESPAN_PROBE = """
+import asyncio, json, sys
+from app.main import app
+
+async def main():
+    async with app.router.lifespan_context(app):
+        # Give background tasks started on startup their first turn
+        await asyncio.sleep(0.5)
+        modules = sorted(sys.modules)
+    print(json.dumps({"modules": modules}))
+
+asyncio.run(main())
+"""
+
+def parse_importtime(stderr: str) -> Dict[str, float]:
+    """Sums the self time of -X importtime lines per top-level package, in ms."""
+    totals: Dict[str, float] = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        totals[name.strip().split(".")[0]] += int(self_us) / 1000
+    return totals
+
+def measure_import(module: str, env: Dict[str, str]) -> Dict[str, Any]:
+    """Imports module in a fresh interpreter and reports time, RSS, per-package cost and loaded modules."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", IMPORT_PROBE.format(module=module)],
+                            cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+    return {
+        "seconds": probe["seconds"],
+        "rss_mb": probe["rss_mb"],
+        "packages_ms": parse_importtime(result.stderr),
+        "modules": probe["modules"],
+    }
+
+def modules_after_startup(env: Dict[str, str]) -> List[str]:
+    """Runs the application's startup hooks in a fresh interpreter and lists the modules loaded by then."""
+    result = subprocess.run([sys.executable, "-c", LIFESPAN_PROBE], cwd=REPO_ROOT, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(f"Starting the application failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])["modules"]
+
+def measure_startup(port: int, env: Dict[str, str]) -> Dict[str, Any]:
+    """Starts uvicorn and reports the seconds until /health answers and the RSS at that point."""
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env
+    )
+    try:
+        wait_until_ready(f"http://127.0.0.1:{port}/health", server, 120)
+        return {"seconds": time.perf_counter() - started, "rss_mb": read_rss_mb(server.pid)}
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+def median(values: List[float], digits: int = 1, scale: float = 1.0) -> float:
+    return round(statistics.median(values) * scale, digits)
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--module", default="app.main", help="Module whose import is timed")
+    parser.add_argument("--top", type=int, default=10, help="Slowest packages to list")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra app setting, e.g. PREPROCESS_ENABLED=false (repeatable)")
+    parser.add_argument("--allow", action="append", default=[], metavar="MODULE",
+                        help="Lazily loaded module that may be imported in this configuration (repeatable)")
+    parser.add_argument("--max-import-ms", type=float, help="Fail when the median import time exceeds this")
+    parser.add_argument("--max-startup-ms", type=float, help="Fail when the median time to /health exceeds this")
+    parser.add_argument("--max-rss-mb", type=float, help="Fail when the median RSS after startup exceeds this")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="Fail when the import or startup time grew beyond --tolerance since the last run")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed growth as a fraction, e.g. 0.15")
+    parser.add_argument("--port", type=int, default=8101)
+    parser.add_argument("--output", default=os.path.join(REPO_ROOT, "benchmarks", "startup_results.jsonl"),
+                        help="JSON Lines file the results are appended to")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    extra_env = dict(item.split("=", 1) for item in args.env)
+    workdir = tempfile.mkdtemp(prefix="bench-startup-")
+    env = {
+        **os.environ,
+        # Nothing answers here; startup must not depend on Ollama
+        "OLLAMA_HOST": "http://127.0.0.1:9",
+        "WARMUP_ENABLED": "false",
+        "JOBS_DB_PATH": os.path.join(workdir, "jobs.db"),
+        "PYTHONDONTWRITEBYTECODE": "1",
+        **extra_env,
+    }
+
+    # The first import compiles bytecode and warms the page cache; do not count it
+    measure_import(args.module, env)
+    imports = [measure_import(args.module, env) for _ in range(args.runs)]
+    startups = [measure_startup(args.port, env) for _ in range(args.runs)]
+    started_modules = modules_after_startup(env)
+
+    packages: Dict[str, List[float]] = defaultdict(list)
+    for run in imports:
+        for package, ms in run["packages_ms"].items():
+            packages[package].append(ms)
+    slowest = sorted(((statistics.median(ms), package) for package, ms in packages.items()), reverse=True)[:args.top]
+    loaded = sorted({
+        name for name in LAZY_MODULES if name not in args.allow
+        for modules in [run["modules"] for run in imports] + [started_modules] if name in modules
+    })
+    rss_values = [run["rss_mb"] for run in startups if run["rss_mb"] is not None]
+    result = {
+        "import_ms": median([run["seconds"] for run in imports], scale=1000),
+        "import_rss_mb": median([run["rss_mb"] for run in imports if run["rss_mb"] is not None] or [0.0]),
+        "startup_ms": median([run["seconds"] for run in startups], scale=1000),
+        "startup_rss_mb": median(rss_values) if rss_values else None,
+        "modules": len(imports[-1]["modules"]),
+        "slowest_packages_ms": {package: round(ms, 1) for ms, package in slowest},
+        "lazy_modules_loaded": loaded,
+    }
+
+    print(f"import {args.module}: {result['import_ms']} ms, {result['import_rss_mb']} MB RSS, "
+          f"{result['modules']} modules (median of {args.runs})")
+    print(f"startup to /health: {result['startup_ms']} ms, {result['startup_rss_mb']} MB RSS")
+    print("slowest packages (self time, ms):")
+    for package, ms in result["slowest_packages_ms"].items():
+        print(f"  {package:<24} {ms:>8.1f}")
+
+    failures = []
+    if loaded:
+        failures.append(f"modules meant to load on demand were imported at startup: {', '.join(loaded)}")
+    for name, limit, value in (("import time", args.max_import_ms, result["import_ms"]),
+                               ("startup time", args.max_startup_ms, result["startup_ms"]),
+                               ("startup RSS", args.max_rss_mb, result["startup_rss_mb"])):
+        if limit is not None and value is not None and value > limit:
+            failures.append(f"{name} {value} exceeds {limit}")
+
+    commit, dirty = git_commit()
+    config = {"benchmark": "startup", "module": args.module, "runs": args.runs, "env": extra_env, "allow": args.allow}
+    record = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "dirty": dirty,
+        "python": sys.version.split()[0],
+        "config": config,
+        "result": result,
+    }
+    previous = previous_run(args.output, config)
+    if previous is not None:
+        print(f"\nCompared with {(previous.get('commit') or 'unknown')[:10]} ({previous['timestamp']}):")
+        for key in ("import_ms", "startup_ms", "startup_rss_mb"):
+            old, new = previous["result"].get(key), result[key]
+            if not old or new is None:
+                continue
+            change = new / old - 1
+            print(f"  {key:<16} {old:>8} -> {new:<8} {change * 100:+.1f}%")
+            if args.fail_on_regression and key != "startup_rss_mb" and change > args.tolerance:
+                failures.append(f"{key} grew {change * 100:.1f}% (tolerance {args.tolerance * 100:.0f}%)")
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "a") as f:
+        f.write(json.dumps(record) + "\n")
+    print(f"\nResults appended to {args.output}")
+
+    if failures:
+        sys.exit("FAILED: " + "; ".join(failures))
+
+if __name__ == "__main__":
+    main()
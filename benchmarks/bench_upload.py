@@ -0,0 +1,114 @@
+"""
+Compare the legacy temp-file upload path with the in-memory path.
+
+Both paths start from an UploadFile and end with the base64 payload the Ollama
+client puts in the request body. Run from the repository root:
+
+    python benchmarks/bench_upload.py --repeat 50
+"""
+import argparse
+import asyncio
+import glob
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import UploadFile
+from ollama import Image
+from app.utils.file_handler import read_upload_bytes, save_temp_image, remove_temp_image, image_suffix
+
+def payload(image) -> dict:
+    """The images field of a chat message, base64-encoded as the Ollama client sends it."""
+    return {"images": [Image(value=image).model_dump()]}
+
+async def legacy_path(upload: UploadFile) -> dict:
+    """The original pipeline: spooled temp file, disk temp file, then Ollama re-reads it."""
+    with tempfile.SpooledTemporaryFile(max_size=5_000_000, suffix=".jpg") as spooled_file:
+        spooled_file.write(upload.file.read())
+        spooled_file.seek(0)
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as disk_file:
+            disk_file.write(spooled_file.read())
+            path = disk_file.name
+    try:
+        return payload(path)
+    finally:
+        remove_temp_image(path)
+
+async def memory_path(upload: UploadFile) -> dict:
+    data = await read_upload_bytes(upload, max_bytes=100_000_000)
+    return payload(data)
+
+async def fallback_path(upload: UploadFile) -> dict:
+    data = await read_upload_bytes(upload, max_bytes=100_000_000)
+    path = save_temp_image(data, image_suffix(upload.content_type, upload.filename))
+    try:
+        return payload(path)
+    finally:
+        remove_temp_image(path)
+
+PATHS = {
+    "legacy temp files": legacy_path,
+    "in-memory": memory_path,
+    "temp-file fallback": fallback_path,
+}
+
+def make_upload(data: bytes, filename: str) -> UploadFile:
+    # Starlette spools multipart files in memory up to 1 MB before rolling to disk
+    spooled = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    spooled.write(data)
+    spooled.seek(0)
+    return UploadFile(file=spooled, filename=filename, size=len(data))
+
+async def measure(run, data: bytes, filename: str, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        upload = make_upload(data, filename)
+        start = time.perf_counter()
+        await run(upload)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    upload = make_upload(data, filename)
+    tracemalloc.start()
+    await run(upload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        "median_ms": statistics.median(timings),
+        "p95_ms": timings[max(0, int(len(timings) * 0.95) - 1)],
+        "peak_mb": peak / 1_000_000,
+    }
+
+async def run_all(pattern: str, repeat: int):
+    totals = {name: {"median_ms": 0.0, "peak_mb": 0.0} for name in PATHS}
+    print(f"{'image':<14} {'size MB':>8} {'path':<20} {'median ms':>10} {'p95 ms':>8} {'peak MB':>8}")
+    for image_path in sorted(glob.glob(pattern)):
+        with open(image_path, "rb") as f:
+            data = f.read()
+        for name, run in PATHS.items():
+            result = await measure(run, data, os.path.basename(image_path), repeat)
+            totals[name]["median_ms"] += result["median_ms"]
+            totals[name]["peak_mb"] += result["peak_mb"]
+            print(
+                f"{os.path.basename(image_path):<14} {len(data) / 1_000_000:>8.2f} {name:<20} "
+                f"{result['median_ms']:>10.2f} {result['p95_ms']:>8.2f} {result['peak_mb']:>8.2f}"
+            )
+    print()
+    for name, total in totals.items():
+        print(f"{name:<20} sum of medians {total['median_ms']:>8.2f} ms, sum of peaks {total['peak_mb']:>6.2f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default="samples/*", help="Glob of images to upload")
+    parser.add_argument("--repeat", type=int, default=20, help="Iterations per image and path")
+    args = parser.parse_args()
+    asyncio.run(run_all(args.images, args.repeat))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Stand-in Ollama server for load tests without a GPU.
+
+Implements the parts of the Ollama HTTP API the app uses (/api/chat, streaming
+or not, /api/generate, /api/tags, /api/ps and /api/version) and answers chats
+with a random but valid ClothingAnalysis after a configurable delay. Like
+Ollama, it works on at most --parallel requests at once and queues the rest.
+
+    python benchmarks/fake_ollama.py --port 11435 --delay 2 --jitter 0.25
+    OLLAMA_HOST=http://127.0.0.1:11435 uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple, get_args, get_origin
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.schemas.clothing import ClothingAnalysis
+
+def literal_choices(field: str) -> Tuple[str, ...]:
+    """Returns the allowed values of a Literal (or list of Literal) field of ClothingAnalysis."""
+    annotation = ClothingAnalysis.model_fields[field].annotation
+    if get_origin(annotation) is list:
+        annotation = get_args(annotation)[0]
+    return get_args(annotation)
+
+# Taken from the schema, so answers stay valid when it changes
+FIELD_CHOICES = {field: literal_choices(field) for field in ("clothing_type", "accessories", "sleeve_length")}
+COLORS = ["black", "white", "navy", "grey", "red", "green", "beige", "blue"]
+
+def fake_analysis(rng: random.Random) -> Dict[str, Any]:
+    """Returns a random answer that validates against ClothingAnalysis."""
+    clothing = rng.sample(FIELD_CHOICES["clothing_type"], rng.randint(1, 3))
+    accessories = rng.sample([a for a in FIELD_CHOICES["accessories"] if a != "none"], rng.randint(0, 2)) or ["none"]
+    clo = round(rng.uniform(0.3, 1.8), 1)
+    answer = {
+        "description": f"A person wearing {', '.join(clothing)}. " * 3,
+        "clothing_type": clothing,
+        "sleeve_length": rng.choice(FIELD_CHOICES["sleeve_length"]),
+        "color": rng.choice(COLORS),
+        "glasses": rng.random() < 0.3,
+        "headwear": rng.random() < 0.2,
+        "accessories": accessories,
+        "clo_insulation": clo,
+        "clo_insulation_text": f"CLO value of {clo} provides moderate insulation.",
+    }
+    return ClothingAnalysis(**answer).model_dump()
+
+def now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def create_app(args: argparse.Namespace) -> FastAPI:
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Created on uvicorn's loop: on Python 3.9 a semaphore binds to the loop
+        # that is current when it is made
+        app.state.slots = asyncio.Semaphore(args.parallel)
+        yield
+
+    app = FastAPI(title="Fake Ollama", lifespan=lifespan)
+    rng = random.Random(args.seed)
+    loaded: Dict[str, float] = {}
+
+    def model_entry(model: str) -> Dict[str, Any]:
+        return {"name": model, "model": model, "modified_at": now(), "size": 7_000_000_000,
+                "digest": "0" * 64, "details": {"format": "gguf", "family": model.split(":")[0]}}
+
+    async def think(model: str) -> Dict[str, float]:
+        """Loads model if needed and draws how long the answer takes."""
+        load = 0.0
+        if model not in loaded:
+            load = args.load_delay
+            await asyncio.sleep(load)
+        loaded[model] = time.time()
+        seconds = max(0.0, rng.gauss(args.delay, args.delay * args.jitter))
+        return {"load": load, "seconds": seconds}
+
+    def timings(load: float, seconds: float, tokens: int) -> Dict[str, int]:
+        prompt_seconds = seconds * 0.3
+        return {
+            "total_duration": int((load + seconds) * 1e9),
+            "load_duration": int(load * 1e9),
+            "prompt_eval_count": 1600,
+            "prompt_eval_duration": int(prompt_seconds * 1e9),
+            "eval_count": tokens,
+            "eval_duration": int((seconds - prompt_seconds) * 1e9),
+        }
+
+    @app.get("/api/version")
+    async def version():
+        return {"version": "0.0.0-fake"}
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [model_entry(model) for model in args.models]}
+
+    @app.get("/api/ps")
+    async def ps():
+        return {"models": [model_entry(model) for model in loaded]}
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        async with request.app.state.slots:
+            plan = await think(body["model"])
+        # Warm-up and keep-alive calls send no prompt and return at once
+        return {"model": body["model"], "created_at": now(), "response": "", "done": True,
+                "done_reason": "load", "load_duration": int(plan["load"] * 1e9)}
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        model = body["model"]
+        content = json.dumps(fake_analysis(rng))
+        tokens = max(1, len(content) // 4)
+
+        if not body.get("stream", True):
+            async with request.app.state.slots:
+                plan = await think(model)
+                await asyncio.sleep(plan["seconds"])
+            return JSONResponse({
+                "model": model, "created_at": now(),
+                "message": {"role": "assistant", "content": content},
+                "done": True, "done_reason": "stop",
+                **timings(plan["load"], plan["seconds"], tokens),
+            })
+
+        async def chunks():
+            async with request.app.state.slots:
+                plan = await think(model)
+                # Prompt evaluation, then tokens at an even pace
+                await asyncio.sleep(plan["seconds"] * 0.3)
+                pieces = [content[i:i + 4] for i in range(0, len(content), 4)]
+                pause = plan["seconds"] * 0.7 / len(pieces)
+                for piece in pieces:
+                    await asyncio.sleep(pause)
+                    message = {"role": "assistant", "content": piece}
+                    yield json.dumps({"model": model, "created_at": now(), "message": message, "done": False}) + "\n"
+            final = {"model": model, "created_at": now(), "message": {"role": "assistant", "content": ""},
+                     "done": True, "done_reason": "stop", **timings(plan["load"], plan["seconds"], tokens)}
+            yield json.dumps(final) + "\n"
+
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+    return app
+
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Fake Ollama server for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--delay", type=float, default=2.0, help="Mean seconds per chat answer")
+    parser.add_argument("--jitter", type=float, default=0.25, help="Standard deviation of the delay, as a fraction of it")
+    parser.add_argument("--load-delay", type=float, default=0.0, help="Extra seconds for the first request per model")
+    parser.add_argument("--parallel", type=int, default=2, help="Requests answered at once, like OLLAMA_NUM_PARALLEL")
+    parser.add_argument("--models", nargs="+", default=["llama3.2-vision:11b", "gemma3:4b"],
+                        help="Models listed as installed")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random answers")
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
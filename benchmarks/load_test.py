@@ -0,0 +1,321 @@
+"""
+Load-test the API against a fake Ollama server, without a GPU.
+
+Starts benchmarks/fake_ollama.py and the app under uvicorn, then drives
+POST /analyze-clothing/ with the images in samples/ at each concurrency level.
+Reports latency percentiles, throughput, server RSS and event loop lag, and
+appends the results to a JSON Lines file so runs on different commits can be
+compared. Run from the repository root:
+
+    python benchmarks/load_test.py --concurrency 1,4,16 --requests 200 --delay 0.5
+    python benchmarks/load_test.py --env ADMISSION_MAX_QUEUE_PER_MODEL=8 --output /tmp/results.jsonl
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAG_BUCKET = re.compile(r'^clothing_event_loop_lag_seconds_bucket\{le="([^"]+)"\} (\S+)$')
+CONTENT_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png", ".webp": "image/webp"}
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    index = max(0, min(len(values) - 1, int(round(q / 100 * len(values))) - 1))
+    return values[index]
+
+def read_rss_mb(pid: int) -> Optional[float]:
+    """Resident set size of a process in MB, from /proc (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def read_loop_lag(base_url: str) -> Tuple[Dict[float, float], float, float]:
+    """
+    Scrapes the event loop lag histogram from /metrics.
+
+    Returns:
+        Tuple of cumulative count per bucket bound, total count and sum in seconds
+    """
+    buckets: Dict[float, float] = {}
+    total = count = 0.0
+    for line in requests.get(f"{base_url}/metrics", timeout=10).text.splitlines():
+        match = LAG_BUCKET.match(line)
+        if match:
+            buckets[float(match.group(1))] = float(match.group(2))
+        elif line.startswith("clothing_event_loop_lag_seconds_sum"):
+            total = float(line.split()[-1])
+        elif line.startswith("clothing_event_loop_lag_seconds_count"):
+            count = float(line.split()[-1])
+    return buckets, count, total
+
+def lag_summary(before: Tuple[Dict[float, float], float, float],
+                after: Tuple[Dict[float, float], float, float]) -> Dict[str, Optional[float]]:
+    """Mean and p99 (bucket upper bound) loop lag in ms between two scrapes."""
+    count = after[1] - before[1]
+    if count <= 0:
+        return {"mean": None, "p99": None}
+    p99 = None
+    for bound in sorted(after[0]):
+        if after[0][bound] - before[0].get(bound, 0.0) >= 0.99 * count:
+            p99 = bound * 1000
+            break
+    return {"mean": round((after[2] - before[2]) / count * 1000, 3), "p99": p99}
+
+def load_images(pattern: str) -> List[Tuple[str, bytes, str]]:
+    images = []
+    for path in sorted(glob.glob(pattern)):
+        content_type = CONTENT_TYPES.get(os.path.splitext(path)[1].lower())
+        if content_type:
+            with open(path, "rb") as f:
+                images.append((os.path.basename(path), f.read(), content_type))
+    if not images:
+        sys.exit(f"No images match {pattern}")
+    return images
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"Server exited with code {process.returncode} before it was ready")
+        try:
+            if requests.get(url, timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    sys.exit(f"{url} not ready after {timeout}s")
+
+def git_commit() -> Tuple[Optional[str], bool]:
+    """Current commit hash and whether the tree has uncommitted changes."""
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, text=True).strip()
+        dirty = bool(subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"],
+                                             cwd=REPO_ROOT, text=True).strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+
+def run_level(base_url: str, images: List[Tuple[str, bytes, str]], model: str, concurrency: int,
+              total: int, unique: bool, server_pid: int) -> Dict[str, Any]:
+    """Sends total requests from concurrency closed-loop clients and summarizes the results."""
+    counter = iter(range(total))
+    lock = threading.Lock()
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    rss = [read_rss_mb(server_pid)]
+    done = threading.Event()
+
+    def sample_rss():
+        while not done.wait(0.5):
+            rss.append(read_rss_mb(server_pid))
+
+    def client():
+        session = requests.Session()
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            name, data, content_type = images[i % len(images)]
+            if unique:
+                # Trailing bytes are ignored by decoders but defeat the cache and request coalescing
+                data = data + f"load-test-{time.time_ns()}-{i}".encode()
+            started = time.perf_counter()
+            try:
+                response = session.post(f"{base_url}/analyze-clothing/", files={"image": (name, data, content_type)},
+                                        data={"model": model}, timeout=600)
+                status = str(response.status_code)
+            except requests.RequestException as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - started
+            with lock:
+                statuses[status] += 1
+                if status == "200":
+                    latencies.append(elapsed)
+
+    lag_before = read_loop_lag(base_url)
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(client)
+    wall = time.perf_counter() - started
+    done.set()
+    sampler.join()
+    lag_after = read_loop_lag(base_url)
+
+    latencies.sort()
+    rss_values = [value for value in rss if value is not None]
+    ms = lambda seconds: round(seconds * 1000, 1)
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "ok": len(latencies),
+        "statuses": dict(statuses),
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 3),
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "max": ms(latencies[-1]),
+            "mean": ms(statistics.mean(latencies)),
+        } if latencies else None,
+        "rss_mb": {"start": round(rss_values[0], 1), "peak": round(max(rss_values), 1)} if rss_values else None,
+        "loop_lag_ms": lag_summary(lag_before, lag_after),
+    }
+
+def print_level(result: Dict[str, Any]) -> None:
+    latency = result["latency_ms"] or {}
+    rss = result["rss_mb"] or {}
+    lag = result["loop_lag_ms"]
+    errors = {status: n for status, n in result["statuses"].items() if status != "200"}
+    print(f"{result['concurrency']:>5} {result['ok']:>6} {result['throughput_rps']:>8.2f} "
+          f"{latency.get('p50', '-'):>9} {latency.get('p95', '-'):>9} {latency.get('p99', '-'):>9} "
+          f"{rss.get('peak', '-'):>8} {lag['mean'] if lag['mean'] is not None else '-':>9} "
+          f"{lag['p99'] if lag['p99'] is not None else '-':>8}  {errors or ''}")
+
+def compare(previous: Dict[str, Any], current: Dict[str, Any]) -> None:
+    """Prints the change in throughput and p95 latency per concurrency level against an earlier run."""
+    print(f"\nCompared with {(previous.get('commit') or 'unknown')[:10]} ({previous['timestamp']}):")
+    earlier = {level["concurrency"]: level for level in previous["levels"]}
+    for level in current["levels"]:
+        old = earlier.get(level["concurrency"])
+        if not old or not old["latency_ms"] or not level["latency_ms"]:
+            continue
+        throughput = (level["throughput_rps"] / old["throughput_rps"] - 1) * 100 if old["throughput_rps"] else 0.0
+        p95 = (level["latency_ms"]["p95"] / old["latency_ms"]["p95"] - 1) * 100
+        print(f"  concurrency {level['concurrency']:>4}: throughput {throughput:+.1f}%, p95 latency {p95:+.1f}%")
+
+def previous_run(path: str, config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Returns the latest recorded run with the same configuration."""
+    if not os.path.exists(path):
+        return None
+    match = None
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("config") == config:
+                match = record
+    return match
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per concurrency level")
+    parser.add_argument("--images", default="samples/*", help="Glob of images to upload")
+    parser.add_argument("--model", default="llama3.2-vision:11b", help="Model named in each request")
+    parser.add_argument("--delay", type=float, default=0.5, help="Mean seconds the fake model takes per answer")
+    parser.add_argument("--jitter", type=float, default=0.25, help="Standard deviation of the delay, as a fraction of it")
+    parser.add_argument("--parallel", type=int, default=2, help="Requests the fake server answers at once")
+    parser.add_argument("--allow-duplicates", action="store_true",
+                        help="Upload the sample files unchanged, so the cache and coalescing take effect")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra app setting, e.g. CACHE_ENABLED=true (repeatable)")
+    parser.add_argument("--app-port", type=int, default=8100)
+    parser.add_argument("--ollama-port", type=int, default=11435)
+    parser.add_argument("--output", default=os.path.join(REPO_ROOT, "benchmarks", "results.jsonl"),
+                        help="JSON Lines file the results are appended to")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    os.chdir(REPO_ROOT)
+    images = load_images(args.images)
+    levels = [int(level) for level in args.concurrency.split(",")]
+    base_url = f"http://127.0.0.1:{args.app_port}"
+    ollama_url = f"http://127.0.0.1:{args.ollama_port}"
+    extra_env = dict(item.split("=", 1) for item in args.env)
+
+    workdir = tempfile.mkdtemp(prefix="load-test-")
+    env = {
+        **os.environ,
+        "OLLAMA_HOST": ollama_url,
+        "WARMUP_MODELS": json.dumps([args.model]),
+        "MAX_CONCURRENT_INFERENCES": str(args.parallel),
+        "JOBS_DB_PATH": os.path.join(workdir, "jobs.db"),
+        # Measure the full pipeline on every request unless asked otherwise
+        "CACHE_ENABLED": "false",
+        "PHASH_ENABLED": "false",
+        **extra_env,
+    }
+    fake = subprocess.Popen([
+        sys.executable, os.path.join(REPO_ROOT, "benchmarks", "fake_ollama.py"), "--port", str(args.ollama_port),
+        "--delay", str(args.delay), "--jitter", str(args.jitter), "--parallel", str(args.parallel),
+        "--models", args.model,
+    ])
+    server = None
+    try:
+        wait_until_ready(f"{ollama_url}/api/version", fake, 30)
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.app_port), "--log-level", "warning"],
+            env=env
+        )
+        wait_until_ready(f"{base_url}/ready", server, 120)
+
+        print(f"{len(images)} images, fake model delay {args.delay}s, {args.parallel} parallel, "
+              f"{args.requests} requests per level")
+        print(f"{'conc':>5} {'ok':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+              f"{'RSS MB':>8} {'lag ms':>9} {'lag p99':>8}")
+        results = []
+        for concurrency in levels:
+            result = run_level(base_url, images, args.model, concurrency, args.requests,
+                               not args.allow_duplicates, server.pid)
+            print_level(result)
+            results.append(result)
+    finally:
+        for process in (server, fake):
+            if process is not None:
+                process.terminate()
+                try:
+                    process.wait(timeout=15)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    commit, dirty = git_commit()
+    config = {
+        "requests": args.requests, "images": [name for name, _, _ in images], "model": args.model,
+        "delay": args.delay, "jitter": args.jitter, "parallel": args.parallel,
+        "allow_duplicates": args.allow_duplicates, "env": extra_env,
+    }
+    record = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "dirty": dirty,
+        "python": sys.version.split()[0],
+        "config": config,
+        "levels": results,
+    }
+    previous = previous_run(args.output, config)
+    if previous is not None:
+        compare(previous, record)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "a") as f:
+        f.write(json.dumps(record) + "\n")
+    print(f"\nResults appended to {args.output}")
+
+if __name__ == "__main__":
+    main()
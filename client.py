@@ -1,7 +1,10 @@
+import json
+import os
 import requests
 
 # Replace with the actual URL your FastAPI server is running on
 API_URL = "http://localhost:8000/analyze-clothing/"
+BATCH_API_URL = "http://localhost:8000/analyze-clothing/batch"
 
 # Path to the image file you want to send
 IMAGE_PATH = "samples/F2.JPG"
@@ -19,5 +22,30 @@ def analyze_clothing(image_path: str, model: str = "llama3.2-vision:11b"):
         print(f"❌ Request failed with status code {response.status_code}")
         print(response.text)
 
+def analyze_clothing_batch(image_paths: list, model: str = "llama3.2-vision:11b"):
+    """Send many images in one request and print each result as it arrives."""
+    files = []
+    for path in image_paths:
+        content_type = "image/png" if path.lower().endswith(".png") else "image/jpeg"
+        files.append(("images", (os.path.basename(path), open(path, "rb"), content_type)))
+
+    try:
+        with requests.post(BATCH_API_URL, files=files, data={"model": model}, stream=True) as response:
+            if response.status_code != 200:
+                print(f"❌ Request failed with status code {response.status_code}")
+                print(response.text)
+                return
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                item = json.loads(line)
+                if item["status"] == "ok":
+                    print(f"✅ {item['filename']}: {item['result']}")
+                else:
+                    print(f"❌ {item['filename']}: {item['error']}")
+    finally:
+        for _, (_, f, _) in files:
+            f.close()
+
 if __name__ == "__main__":
     analyze_clothing(IMAGE_PATH)
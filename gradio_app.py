@@ -4,11 +4,49 @@ import json
 import io
 from PIL import Image
 
+FIELD_LABELS = [
+    ("description", "Description"),
+    ("clothing_type", "Clothing Type"),
+    ("sleeve_length", "Sleeve Length"),
+    ("color", "Color"),
+    ("glasses", "Wearing Glasses"),
+    ("headwear", "Wearing Headwear"),
+    ("accessories", "Accessories"),
+    ("clo_insulation_text", "Insulation"),
+]
+
+def format_fields(fields, model, pending=""):
+    """Render the fields received so far, followed by the text still being generated."""
+    lines = []
+    for name, label in FIELD_LABELS:
+        if name not in fields:
+            continue
+        value = fields[name]
+        if isinstance(value, bool):
+            value = 'Yes' if value else 'No'
+        elif isinstance(value, list):
+            value = ', '.join(value) if value else 'None'
+        lines.append(f"{label}: {value}")
+    lines.append(f"\nModel Used: {model}")
+    if pending:
+        lines.append(f"\nGenerating... {pending}")
+    return "\n".join(lines)
+
+def iter_sse(response):
+    """Yield (event, data) pairs from a Server-Sent Events response."""
+    event = None
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            yield event, json.loads(line[len("data:"):])
+
 def analyze_clothing(image, model):
     if image is None:
-        return "No image provided"
+        yield "No image provided"
+        return
     
-    API_URL = "http://localhost:8000/analyze-clothing/"
+    API_URL = "http://localhost:8000/analyze-clothing/stream"
     
     # Convert image to bytes
     img_byte_arr = io.BytesIO()
@@ -34,27 +72,28 @@ def analyze_clothing(image, model):
         img_byte_arr.seek(0)
         files = {"image": (filename, img_byte_arr, content_type)}
         data = {"model": model}
-        response = requests.post(API_URL, files=files, data=data)
-        
-        if response.status_code == 200:
-            result = response.json()
-            output = f"""
-            Description: {result['description']}
-            
-            Clothing Type: {', '.join(result['clothing_type'])}
-            Sleeve Length: {result['sleeve_length']}
-            Color: {result['color']}
-            Wearing Glasses: {'Yes' if result['glasses'] else 'No'}
-            Wearing Headwear: {'Yes' if result['headwear'] else 'No'}
-            Accessories: {', '.join(result['accessories']) if result['accessories'] else 'None'}
-            
-            Model Used: {model}
-            """
-            return output
-        else:
-            return f"Error: {response.text}"
+        with requests.post(API_URL, files=files, data=data, stream=True) as response:
+            if response.status_code != 200:
+                yield f"Error: {response.text}"
+                return
+
+            # Show each field as soon as the model has finished it
+            fields = {}
+            pending = ""
+            for event, payload in iter_sse(response):
+                if event == "token":
+                    pending += payload
+                    yield format_fields(fields, model, pending[-200:])
+                elif event == "field":
+                    fields[payload["name"]] = payload["value"]
+                    pending = ""
+                    yield format_fields(fields, model)
+                elif event == "result":
+                    yield format_fields(payload, model)
+                elif event == "error":
+                    yield f"Error: {payload['detail']}"
     except Exception as e:
-        return f"Error processing image: {str(e)}"
+        yield f"Error processing image: {str(e)}"
 
 # Create Gradio interface
 demo = gr.Interface(
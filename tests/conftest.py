@@ -0,0 +1,25 @@
+import json
+from typing import Any, Dict
+import pytest
+from app.schemas.clothing import ClothingAnalysis
+
+SAMPLE_ANSWER: Dict[str, Any] = {
+    "description": "A person in a blue t-shirt and jeans.",
+    "clothing_type": ["t-shirt", "jeans"],
+    "sleeve_length": "short",
+    "color": "blue",
+    "glasses": False,
+    "headwear": False,
+    "accessories": ["none"],
+    "clo_insulation": 0.5,
+    "clo_insulation_text": "CLO value of 0.5 provides light insulation.",
+}
+
+def make_analysis(**fields: Any) -> ClothingAnalysis:
+    """Returns a valid ClothingAnalysis, with fields overriding the sample answer."""
+    return ClothingAnalysis(**{**SAMPLE_ANSWER, **fields})
+
+@pytest.fixture
+def sample_answer() -> str:
+    """The sample answer as the model would return it."""
+    return json.dumps(SAMPLE_ANSWER)
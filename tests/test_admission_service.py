@@ -0,0 +1,107 @@
+import asyncio
+from contextlib import ExitStack
+import pytest
+from app.core.settings import settings
+from app.services import analysis_service, ollama_service
+from app.services.cache_service import AnalysisCache, make_cache_key
+from app.services.admission_service import (
+    AdmissionController, AdmissionQueueFullError, DeadlineExceededError,
+    parse_deadline, queue_timeout, remaining_time,
+)
+from conftest import make_analysis
+
+@pytest.fixture
+def controller(monkeypatch):
+    monkeypatch.setattr(settings, "admission_enabled", True)
+    monkeypatch.setattr(settings, "admission_initial_latency", 2.0)
+    monkeypatch.setattr(settings, "inference_queue_timeout", 60.0)
+    return AdmissionController(capacity=2, max_queue=3)
+
+@pytest.mark.parametrize("value, budget", [(None, None), ("2.5", 2.5), ("30", 30.0)])
+def test_parse_deadline(value, budget):
+    assert parse_deadline(value) == budget
+
+@pytest.mark.parametrize("value", ["0", "-1", "nan", "inf", "soon"])
+def test_parse_deadline_rejects_bad_values(value):
+    with pytest.raises(ValueError):
+        parse_deadline(value)
+
+def test_calls_outside_a_request_are_not_admission_controlled(controller):
+    with controller.admit("m"):
+        assert controller.in_flight == {}
+    assert controller.admitted == 0
+
+def test_admitted_calls_count_until_they_finish(controller):
+    with controller.request(None):
+        with controller.admit("m"), controller.admit("m"):
+            assert controller.in_flight == {"m": 2}
+    assert controller.in_flight == {}
+    assert controller.admitted == 2
+
+def test_queue_full_is_rejected_per_model(controller):
+    with controller.request(None), ExitStack() as calls:
+        for _ in range(3):
+            calls.enter_context(controller.admit("m"))
+        with pytest.raises(AdmissionQueueFullError) as rejected:
+            calls.enter_context(controller.admit("m"))
+        # Another model has its own queue
+        calls.enter_context(controller.admit("other"))
+    assert rejected.value.retry_after >= 1
+    assert controller.rejected == {"queue_full": 1, "deadline": 0}
+    assert controller.in_flight == {}
+
+def test_call_that_cannot_meet_the_deadline_is_rejected(controller):
+    # Idle: 2s expected latency fits a 3s budget
+    with controller.request(3.0), controller.admit("m"):
+        pass
+    # Both slots busy: 2 x 2s of backlog over 2 slots plus 2s of its own overruns 3s
+    with controller.request(None), controller.admit("m"), controller.admit("m"):
+        with controller.request(3.0):
+            with pytest.raises(DeadlineExceededError) as rejected:
+                with controller.admit("m"):
+                    pass
+    # About 1s over the budget, rounded up
+    assert 1 <= rejected.value.retry_after <= 2
+    assert controller.rejected["deadline"] == 1
+
+def test_estimate_follows_observed_latency(controller, monkeypatch):
+    monkeypatch.setattr(settings, "admission_latency_smoothing", 0.5)
+    controller.observe("m", 4.0)
+    controller.observe("m", 2.0)
+    assert controller.expected_latency("m") == 3.0
+    assert controller.expected_latency("unseen") == 2.0
+    controller.in_flight = {"m": 2, "unseen": 2}
+    assert controller.estimate_wait() == (2 * 3.0 + 2 * 2.0) / 2
+
+def test_request_sets_and_restores_the_deadline(controller):
+    assert remaining_time() is None
+    with controller.request(5.0):
+        assert 4.9 < remaining_time() <= 5.0
+        assert queue_timeout() == pytest.approx(remaining_time(), abs=0.01)
+    assert remaining_time() is None
+    assert queue_timeout() == 60.0
+
+def test_disabled_controller_admits_everything(controller, monkeypatch):
+    monkeypatch.setattr(settings, "admission_enabled", False)
+    with controller.request(0.001), ExitStack() as calls:
+        for _ in range(10):
+            calls.enter_context(controller.admit("m"))
+    assert controller.admitted == 0 and controller.rejected == {"queue_full": 0, "deadline": 0}
+
+def test_cache_hits_are_served_when_the_model_queue_is_full(controller, monkeypatch):
+    cache = AnalysisCache(max_entries=4)
+    monkeypatch.setattr(analysis_service, "analysis_cache", cache)
+    monkeypatch.setattr(settings, "cache_enabled", True)
+    monkeypatch.setattr(settings, "phash_enabled", False)
+    monkeypatch.setattr(ollama_service, "_admission", controller)
+    key = make_cache_key("cached", "m", analysis_service.pipeline_version("m"), settings.model_temperature)
+    asyncio.run(cache.set(key, make_analysis()))
+    controller.in_flight = {"m": controller.max_queue}
+
+    async def analyze(digest: str):
+        with controller.request(None):
+            return await analysis_service.analyze_cached(b"image", digest, "m")
+
+    assert asyncio.run(analyze("cached"))[1]["cache"] == "HIT"
+    with pytest.raises(AdmissionQueueFullError):
+        asyncio.run(analyze("uncached"))
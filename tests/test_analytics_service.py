@@ -0,0 +1,58 @@
+import numpy as np
+from app.services.analytics_service import AnalysisStore, garment_frequencies, rolling_percentiles, summarize
+from conftest import make_analysis
+
+TIMES = np.array([0.0, 10.0, 20.0, 30.0, 40.0])
+VALUES = np.array([1.0, 2.0, 3.0, 4.0, 5.0])
+
+def test_rolling_percentiles_over_a_sliding_window():
+    points = rolling_percentiles(TIMES, VALUES, start=20, end=40, window=20, step=10)
+    # Each window covers [end - 20, end]: three samples
+    assert points == [
+        {"t": 20.0, "count": 3, "p10": 1.2, "p50": 2.0, "p90": 2.8},
+        {"t": 30.0, "count": 3, "p10": 2.2, "p50": 3.0, "p90": 3.8},
+        {"t": 40.0, "count": 3, "p10": 3.2, "p50": 4.0, "p90": 4.8},
+    ]
+
+def test_rolling_percentiles_leave_empty_windows_blank():
+    points = rolling_percentiles(TIMES, VALUES, start=45, end=70, window=5, step=25, percentiles=(50,))
+    assert points == [{"t": 45.0, "count": 1, "p50": 5.0}, {"t": 70.0, "count": 0, "p50": None}]
+
+def test_garment_frequencies_count_and_share_most_frequent_first():
+    garments = np.array(["scarf", "coat", "jeans", "coat"], dtype=object)
+    assert garment_frequencies(garments, records=3) == {
+        "coat": {"count": 2, "share": 0.6667},
+        "jeans": {"count": 1, "share": 0.3333},
+        "scarf": {"count": 1, "share": 0.3333},
+    }
+
+def test_store_columns_feed_the_summary(tmp_path):
+    store = AnalysisStore(str(tmp_path / "analyses.db"))
+    try:
+        store.record(make_analysis(clothing_type=["coat", "jeans"], clo_insulation=1.0), "d1", "m", "cam-1")
+        store.record(make_analysis(clothing_type=["t-shirt"], clo_insulation=0.5), "d2", "m", "cam-2")
+        store.record(make_analysis(clothing_type=["coat"], clo_insulation=1.5), "d3", "other", "cam-1")
+
+        columns = store.columns(model="m")
+        assert columns["clo"].tolist() == [1.0, 0.5]
+        assert sorted(columns["garments"]) == ["coat", "jeans", "t-shirt"]
+        assert store.columns(garment="coat")["clo"].tolist() == [1.0, 1.5]
+        assert store.columns(source_id="cam-2")["clo"].tolist() == [0.5]
+
+        columns = store.columns()
+        start, end = columns["created_at"][0], columns["created_at"][-1]
+        summary = summarize(columns, start, end, window=3600, step=3600)
+        assert summary["count"] == 3
+        assert summary["clo"]["mean"] == 1.0
+        assert summary["clo"]["p50"] == 1.0
+        assert summary["garments"]["coat"] == {"count": 2, "share": 0.6667}
+        assert summary["rolling"]["points"][0]["count"] == 3
+    finally:
+        store.close()
+
+def test_summary_of_no_records():
+    empty = {"created_at": np.array([]), "clo": np.array([]), "garments": np.array([], dtype=object)}
+    summary = summarize(empty, 0, 60, window=60, step=60)
+    assert summary["count"] == 0
+    assert summary["clo"] == {"mean": None, "p10": None, "p50": None, "p90": None}
+    assert summary["garments"] == {}
@@ -0,0 +1,105 @@
+import asyncio
+from types import SimpleNamespace
+import httpx
+import pytest
+from app.core.settings import OllamaBackend
+from app.services.backend_pool import BackendPool
+
+class FakeClient:
+    """Stands in for ollama.AsyncClient, answering or failing every chat."""
+
+    def __init__(self, host: str, error: Exception = None):
+        self.host = host
+        self.error = error
+        self.chats = 0
+        self.models = []
+        self.loaded = []
+
+    async def chat(self, model: str, **kwargs):
+        self.chats += 1
+        if self.error is not None:
+            raise self.error
+        return {"message": {"content": f"from {self.host}"}}
+
+    async def list(self):
+        return SimpleNamespace(models=[SimpleNamespace(model=name) for name in self.models])
+
+    async def ps(self):
+        return SimpleNamespace(models=[SimpleNamespace(model=name) for name in self.loaded])
+
+def make_pool(*hosts: str) -> BackendPool:
+    pool = BackendPool([OllamaBackend(host=host) for host in hosts], timeout=5)
+    for backend in pool.backends:
+        backend.client = FakeClient(backend.host)
+    return pool
+
+def test_pick_prefers_a_backend_with_the_model_loaded():
+    pool = make_pool("http://a", "http://b", "http://c")
+    a, b, c = pool.backends
+    b.loaded_models = {"llava:latest"}
+    b.in_flight = 1
+    assert pool.pick("llava") is b
+    # Then hosts that have it installed
+    b.loaded_models = set()
+    for backend in (a, b):
+        backend.available_models = {"other:latest"}
+    c.available_models = {"llava:latest"}
+    assert pool.pick("llava") is c
+
+def test_pick_skips_unhealthy_backends():
+    pool = make_pool("http://a", "http://b")
+    a, b = pool.backends
+    a.loaded_models = {"llava:latest"}
+    a.healthy = False
+    assert pool.pick("llava") is b
+    # With no healthy backend left, stale health is better than nothing
+    b.healthy = False
+    assert pool.pick("llava") is a
+
+def test_pick_balances_load_by_weight():
+    pool = make_pool("http://a", "http://b")
+    a, b = pool.backends
+    a.in_flight, a.weight = 1, 1.0
+    b.in_flight, b.weight = 1, 4.0
+    assert pool.pick("m") is b
+    assert pool.pick("m", exclude={"http://b"}) is a
+
+def test_chat_fails_over_on_connection_errors():
+    pool = make_pool("http://a", "http://b")
+    a, b = pool.backends
+    a.loaded_models = {"llava:latest"}
+    a.client.error = httpx.ConnectError("connection refused")
+
+    response = asyncio.run(pool.chat("llava", messages=[]))
+    assert response["message"]["content"] == "from http://b"
+    assert (a.client.chats, b.client.chats) == (1, 1)
+    assert not a.healthy and a.failures == 1
+    assert a.in_flight == b.in_flight == 0
+    assert "llava:latest" in b.loaded_models
+
+def test_chat_raises_when_every_backend_is_unreachable():
+    pool = make_pool("http://a", "http://b")
+    for backend in pool.backends:
+        backend.client.error = ConnectionError("down")
+    with pytest.raises(ConnectionError):
+        asyncio.run(pool.chat("llava", messages=[]))
+    assert [backend.client.chats for backend in pool.backends] == [1, 1]
+
+def test_chat_does_not_retry_model_errors():
+    pool = make_pool("http://a", "http://b")
+    for backend in pool.backends:
+        backend.client.error = ValueError("model not found")
+    with pytest.raises(ValueError):
+        asyncio.run(pool.chat("llava", messages=[]))
+    assert sum(backend.client.chats for backend in pool.backends) == 1
+
+def test_health_check_refreshes_model_lists_and_health():
+    pool = make_pool("http://a")
+    backend = pool.backends[0]
+    backend.healthy = False
+    backend.client.models = ["llava:latest", "gemma3:4b"]
+    backend.client.loaded = ["llava:latest"]
+    asyncio.run(pool.check_all())
+    assert backend.healthy
+    assert backend.available_models == {"llava:latest", "gemma3:4b"}
+    assert backend.loaded_models == {"llava:latest"}
@@ -0,0 +1,130 @@
+import asyncio
+import io
+import json
+import tarfile
+import zipfile
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core.settings import settings
+from app.routes import analyze
+from app.services import batch_service
+from app.services.batch_service import BatchError, analyze_batch, iter_archive_images, rejected_item
+from conftest import make_analysis
+
+def make_zip(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+def make_tar(files):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+ARCHIVE_FILES = {
+    "a.jpg": b"first",
+    "photos/b.PNG": b"second",
+    "notes.txt": b"not an image",
+    ".hidden.jpg": b"dotfile",
+    "__MACOSX/photos/._b.png": b"resource fork",
+}
+
+@pytest.fixture
+def fake_analysis(monkeypatch):
+    seen = []
+
+    async def analyze_cached(image_bytes, image_digest, model, *args):
+        seen.append(image_bytes)
+        if image_bytes == b"broken":
+            raise ValueError("cannot decode image")
+        return make_analysis(), {"cache": "miss", "prompt_version": "v1"}
+
+    monkeypatch.setattr(batch_service, "analyze_cached", analyze_cached)
+    return seen
+
+@pytest.mark.parametrize("make_archive", [make_zip, make_tar])
+def test_iter_archive_images_lists_only_images(make_archive):
+    items = list(iter_archive_images(make_archive(ARCHIVE_FILES), "photos"))
+    assert [name for name, _ in items] == ["a.jpg", "photos/b.PNG"]
+    assert [load() for _, load in items] == [b"first", b"second"]
+
+@pytest.mark.parametrize("make_archive", [make_zip, make_tar])
+def test_iter_archive_images_rejects_oversized_members(make_archive, monkeypatch):
+    monkeypatch.setattr(settings, "max_upload_bytes", 5)
+    (_, small), (name, large) = iter_archive_images(make_archive({"a.jpg": b"12345", "b.jpg": b"123456"}), "x")
+    assert small() == b"12345"
+    with pytest.raises(BatchError, match="b.jpg exceeds the 5 byte limit"):
+        large()
+
+def test_iter_archive_images_rejects_other_files():
+    with pytest.raises(BatchError, match="not a zip or tar archive"):
+        list(iter_archive_images(b"plain bytes", "upload.bin"))
+
+def test_analyze_batch_reports_failing_items_and_carries_on(fake_analysis):
+    items = [
+        ("a.jpg", lambda: b"first"),
+        ("b.jpg", lambda: b"broken"),
+        rejected_item("c.txt", "c.txt is not an image"),
+        ("d.jpg", lambda: b"fourth"),
+    ]
+
+    async def collect():
+        return [result async for result in analyze_batch(items, "m", concurrency=2)]
+
+    results = sorted(asyncio.run(collect()), key=lambda result: result["index"])
+    assert [result["status"] for result in results] == ["ok", "error", "error", "ok"]
+    assert results[1]["error"] == "cannot decode image"
+    assert results[2]["error"] == "c.txt is not an image"
+    assert results[3]["filename"] == "d.jpg"
+    assert sorted(fake_analysis) == [b"broken", b"first", b"fourth"]
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(analyze.router)
+    return TestClient(app)
+
+def post_batch(client, files):
+    response = client.post("/batch", files=files)
+    lines = [json.loads(line) for line in response.text.splitlines()] if response.status_code == 200 else []
+    return response, sorted(lines, key=lambda line: line["index"])
+
+def test_batch_route_refuses_too_many_images(client, fake_analysis, monkeypatch):
+    monkeypatch.setattr(settings, "batch_max_items", 2)
+    files = [("images", (f"{i}.jpg", b"x", "image/jpeg")) for i in range(3)]
+    response, _ = post_batch(client, files)
+    assert response.status_code == 413
+    assert fake_analysis == []
+
+def test_batch_route_counts_archive_members_against_the_item_limit(client, fake_analysis, monkeypatch):
+    monkeypatch.setattr(settings, "batch_max_items", 2)
+    archive = make_zip({"a.jpg": b"1", "b.jpg": b"2", "c.jpg": b"3"})
+    response, _ = post_batch(client, [("archive", ("photos.zip", archive, "application/zip"))])
+    assert response.status_code == 413
+
+def test_batch_route_refuses_batches_over_the_total_size(client, fake_analysis, monkeypatch):
+    monkeypatch.setattr(settings, "batch_max_total_bytes", 10)
+    files = [("images", ("a.jpg", b"123456", "image/jpeg")), ("images", ("b.jpg", b"123456", "image/jpeg"))]
+    response, _ = post_batch(client, files)
+    assert response.status_code == 413
+    assert "total limit" in response.json()["detail"]
+
+def test_batch_route_reports_bad_parts_per_item(client, fake_analysis, monkeypatch):
+    monkeypatch.setattr(settings, "max_upload_bytes", 5)
+    files = [
+        ("images", ("a.jpg", b"first", "image/jpeg")),
+        ("images", ("b.txt", b"text", "text/plain")),
+        ("images", ("c.jpg", b"too large", "image/jpeg")),
+    ]
+    response, lines = post_batch(client, files)
+    assert response.status_code == 200
+    assert [line["status"] for line in lines] == ["ok", "error", "error"]
+    assert lines[1]["error"] == "b.txt is not an image"
+    assert lines[2]["filename"] == "c.jpg"
@@ -0,0 +1,74 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from app.services import cache_service
+from app.services.cache_service import AnalysisCache, make_cache_key
+from conftest import make_analysis
+
+DIGEST = "ab" * 32
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replaces the cache's wall clock with one the test moves by hand."""
+    now = SimpleNamespace(value=1_000_000.0)
+    monkeypatch.setattr(cache_service, "time", SimpleNamespace(time=lambda: now.value))
+    return now
+
+def test_cache_key_is_stable():
+    assert make_cache_key(DIGEST, "m", "v1", 0.0) == make_cache_key(DIGEST, "m", "v1", 0.0)
+
+@pytest.mark.parametrize("changed", [
+    ("cd" * 32, "m", "v1", 0.0),
+    (DIGEST, "other", "v1", 0.0),
+    (DIGEST, "m", "v2", 0.0),
+    (DIGEST, "m", "v1", 0.7),
+])
+def test_cache_key_changes_with_every_input(changed):
+    assert make_cache_key(*changed) != make_cache_key(DIGEST, "m", "v1", 0.0)
+
+def test_hit_returns_a_copy():
+    cache = AnalysisCache(max_entries=4)
+    asyncio.run(cache.set("k", make_analysis()))
+    first = asyncio.run(cache.get("k"))
+    first.clothing_type.append("coat")
+    assert asyncio.run(cache.get("k")).clothing_type == ["t-shirt", "jeans"]
+    assert cache.stats()["hits"] == 2
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AnalysisCache(max_entries=2)
+
+    async def main():
+        await cache.set("a", make_analysis())
+        await cache.set("b", make_analysis())
+        await cache.get("a")
+        await cache.set("c", make_analysis())
+        return [await cache.get(key) is not None for key in ("a", "b", "c")]
+
+    assert asyncio.run(main()) == [True, False, True]
+
+def test_entries_expire_after_ttl(clock):
+    cache = AnalysisCache(max_entries=4, ttl_seconds=60)
+    asyncio.run(cache.set("k", make_analysis()))
+    clock.value += 59
+    assert asyncio.run(cache.get("k")) is not None
+    clock.value += 2
+    assert asyncio.run(cache.get("k")) is None
+    assert cache.stats()["misses"] == 1
+
+def test_zero_ttl_never_expires(clock):
+    cache = AnalysisCache(max_entries=4, ttl_seconds=0)
+    asyncio.run(cache.set("k", make_analysis()))
+    clock.value += 10 ** 9
+    assert asyncio.run(cache.get("k")) is not None
+
+def test_disk_tier_survives_a_restart_and_expires(tmp_path, clock):
+    path = str(tmp_path / "cache.db")
+    asyncio.run(AnalysisCache(max_entries=4, ttl_seconds=60, db_path=path).set("k", make_analysis()))
+
+    restarted = AnalysisCache(max_entries=4, ttl_seconds=60, db_path=path)
+    assert asyncio.run(restarted.get("k")).color == "blue"
+    assert restarted.stats()["disk_hits"] == 1
+
+    clock.value += 61
+    expired = AnalysisCache(max_entries=4, ttl_seconds=60, db_path=path)
+    assert asyncio.run(expired.get("k")) is None
@@ -0,0 +1,102 @@
+import asyncio
+import pytest
+from app.core.settings import settings
+from app.services import cascade_service
+from app.services.cascade_service import (
+    CASCADE_TIERS, agreement, analyze_cascade, cascade_stats, field_agreement, sanity_issues,
+)
+from conftest import make_analysis
+
+@pytest.fixture
+def cascade(monkeypatch):
+    monkeypatch.setattr(settings, "cascade_enabled", True)
+    monkeypatch.setattr(settings, "cascade_small_model", "small:1b")
+    monkeypatch.setattr(settings, "cascade_samples", 3)
+    monkeypatch.setattr(settings, "cascade_min_agreement", 0.8)
+    monkeypatch.setattr(cascade_service, "cascade_totals", {"small": 0, "large": 0})
+    calls = []
+    prepared = []
+
+    def install(small_answers):
+        answers = iter(small_answers)
+
+        async def analyze_image_async(image, model, temperature=None):
+            calls.append(model)
+            if model == "small:1b":
+                answer = next(answers)
+                if isinstance(answer, Exception):
+                    raise answer
+                return answer
+            return make_analysis(description="large model answer")
+
+        monkeypatch.setattr(cascade_service, "analyze_image_async", analyze_image_async)
+
+    async def image_for(model):
+        prepared.append(model)
+        return f"image for {model}".encode()
+
+    def run():
+        return asyncio.run(analyze_cascade(image_for, "large:70b"))
+
+    return install, run, calls, prepared
+
+def test_field_agreement_scores_each_structured_field():
+    a = make_analysis()
+    assert field_agreement(a, make_analysis(description="other words", color="red")) == 1.0
+    # Clothing type Jaccard 1/3, sleeve length differs, the other three agree
+    b = make_analysis(clothing_type=["t-shirt", "shorts"], sleeve_length="long")
+    assert field_agreement(a, b) == pytest.approx((1 / 3 + 0 + 1 + 1 + 1) / 5)
+
+def test_agreement_averages_over_sample_pairs():
+    a, b = make_analysis(), make_analysis(glasses=True)
+    assert agreement([a]) == 1.0
+    assert agreement([a, a, b]) == pytest.approx((1.0 + 0.8 + 0.8) / 3)
+
+def test_sanity_issues_flag_implausible_answers():
+    assert sanity_issues(make_analysis()) == []
+    issues = sanity_issues(make_analysis(clothing_type=["jacket"], sleeve_length="sleeveless",
+                                         accessories=["none", "scarf"]))
+    assert issues == ["sleeveless answer with sleeved garments", "'none' listed with other accessories"]
+
+def test_agreeing_samples_are_answered_by_the_small_model(cascade):
+    install, run, calls, prepared = cascade
+    install([make_analysis()] * 3)
+    before = CASCADE_TIERS.value("large:70b", "small")
+
+    analysis, metadata = run()
+    assert metadata == {"tier": "small", "model": "small:1b", "agreement": 1.0, "reasons": []}
+    assert calls == ["small:1b"] * 3
+    # The large model's image is never prepared
+    assert prepared == ["small:1b"]
+    assert cascade_stats()["small"] == 1
+    assert cascade_stats()["escalation_rate"] == 0.0
+    assert CASCADE_TIERS.value("large:70b", "small") == before + 1
+
+def test_disagreeing_samples_escalate(cascade):
+    install, run, calls, prepared = cascade
+    install([make_analysis(), make_analysis(clothing_type=["coat"], sleeve_length="long"),
+             make_analysis(headwear=True, glasses=True)])
+
+    analysis, metadata = run()
+    assert analysis.description == "large model answer"
+    assert metadata["tier"] == "large"
+    assert metadata["agreement"] < 0.8
+    assert metadata["reasons"][0].startswith("agreement")
+    assert calls == ["small:1b"] * 3 + ["large:70b"]
+    assert prepared == ["small:1b", "large:70b"]
+    stats = cascade_stats()
+    assert (stats["small"], stats["large"], stats["escalation_rate"]) == (0, 1, 1.0)
+
+def test_invalid_small_model_output_escalates(cascade):
+    install, run, calls, _ = cascade
+    install([make_analysis(), ValueError("bad json"), make_analysis()])
+    _, metadata = run()
+    assert metadata["tier"] == "large"
+    assert metadata["reasons"] == ["invalid output from small:1b: ValueError"]
+
+def test_other_small_model_errors_are_raised(cascade):
+    install, run, calls, _ = cascade
+    install([make_analysis(), ConnectionError("backend down"), make_analysis()])
+    with pytest.raises(ConnectionError):
+        run()
+    assert "large:70b" not in calls
@@ -0,0 +1,110 @@
+import os
+import random
+from typing import List, get_args
+import pytest
+import yaml
+from app.schemas.clothing import ClothingAnalysis
+from app.services.clo_service import CLO_VALUES_PATH, CloEngine, calculate_clo_value
+from conftest import make_analysis
+
+CLOTHING_TYPES = get_args(get_args(ClothingAnalysis.model_fields["clothing_type"].annotation)[0])
+ACCESSORIES = get_args(get_args(ClothingAnalysis.model_fields["accessories"].annotation)[0])
+SLEEVE_LENGTHS = get_args(ClothingAnalysis.model_fields["sleeve_length"].annotation)
+
+def legacy_clo_value(analysis: ClothingAnalysis, yaml_file: str = CLO_VALUES_PATH) -> float:
+    """The original calculate_clo_value, which re-read the YAML on every call; the reference for CloEngine."""
+    with open(yaml_file) as f:
+        clo_data = yaml.safe_load(f)
+    clo_mapping = clo_data.get('clo_values', {})
+    total_clo = clo_data.get('base_clo', 0.0)
+    lower_body_items = ["pants", "dress pants", "jeans", "trousers", "shorts", "skirt", "leggings", "joggers"]
+    has_lower_body = any(item.lower() in lower_body_items for item in analysis.clothing_type)
+    processed_shirt = False
+    for item in analysis.clothing_type:
+        item_lower = item.lower()
+        if (item_lower == "t-shirt" or item_lower == "polo t-shirt") and analysis.sleeve_length == 'long' and not processed_shirt:
+            if "shirt" in clo_mapping:
+                total_clo += clo_mapping["shirt"]
+                processed_shirt = True
+        elif item_lower == "shirt" and analysis.sleeve_length == 'short' and not processed_shirt:
+            if "t-shirt" in clo_mapping:
+                total_clo += clo_mapping["t-shirt"]
+                processed_shirt = True
+        elif item_lower in clo_mapping and not (processed_shirt and (item_lower == "t-shirt" or item_lower == "shirt" or item_lower == "polo t-shirt")):
+            total_clo += clo_mapping[item_lower]
+            if item_lower == "t-shirt" or item_lower == "shirt" or item_lower == "polo t-shirt":
+                processed_shirt = True
+    if not has_lower_body and "jeans" in clo_mapping:
+        total_clo += clo_mapping["jeans"]
+    for accessory in analysis.accessories:
+        if accessory.lower() in clo_mapping and accessory.lower() != "none":
+            total_clo += clo_mapping[accessory.lower()]
+    if analysis.headwear and "headwear" in clo_mapping:
+        total_clo += clo_mapping["headwear"]
+    if analysis.glasses and "glasses" in clo_mapping:
+        total_clo += clo_mapping["glasses"]
+    return round(total_clo, 2)
+
+def random_analyses(count: int, seed: int = 0) -> List[ClothingAnalysis]:
+    rng = random.Random(seed)
+    return [
+        make_analysis(
+            clothing_type=rng.sample(CLOTHING_TYPES, rng.randint(0, 5)),
+            sleeve_length=rng.choice(SLEEVE_LENGTHS),
+            glasses=rng.random() < 0.5,
+            headwear=rng.random() < 0.5,
+            accessories=rng.sample(ACCESSORIES, rng.randint(0, 3)),
+        )
+        for _ in range(count)
+    ]
+
+@pytest.fixture
+def clo_file(tmp_path):
+    path = tmp_path / "clo_values.yaml"
+    path.write_text("base_clo: 0.1\nclo_values:\n  t-shirt: 0.2\n  jeans: 0.3\n")
+    return path
+
+def test_engine_matches_the_legacy_calculation():
+    engine = CloEngine()
+    for analysis in random_analyses(500):
+        assert engine.score(analysis) == legacy_clo_value(analysis), analysis
+
+@pytest.mark.parametrize("clothing_type, sleeve_length", [
+    (["t-shirt", "shirt", "polo t-shirt"], "long"),
+    (["shirt", "t-shirt"], "short"),
+    (["polo t-shirt", "t-shirt", "jeans"], "sleeveless"),
+    (["T-Shirt", "Jeans"], "short"),
+    ([], "unknown"),
+])
+def test_shirt_rules_match_the_legacy_calculation(clothing_type, sleeve_length):
+    # Built without validation, so items outside the schema's literals (other casing) get through
+    fields = {**make_analysis().model_dump(), "clothing_type": clothing_type, "sleeve_length": sleeve_length}
+    analysis = ClothingAnalysis.model_construct(**fields)
+    assert CloEngine().score(analysis) == legacy_clo_value(analysis)
+
+def test_score_many_matches_score():
+    engine = CloEngine()
+    analyses = random_analyses(500, seed=1)
+    assert list(engine.score_many(analyses)) == [engine.score(analysis) for analysis in analyses]
+
+def test_calculate_clo_value_uses_the_shared_engine():
+    analysis = make_analysis()
+    assert calculate_clo_value(analysis) == legacy_clo_value(analysis) == 0.5
+
+def test_engine_reloads_a_changed_file(clo_file):
+    engine = CloEngine(str(clo_file), check_interval=0)
+    assert engine.score(make_analysis()) == 0.6
+    clo_file.write_text("base_clo: 0.1\nclo_values:\n  t-shirt: 0.4\n  jeans: 0.3\n")
+    os.utime(clo_file, (1, 1))
+    assert engine.score(make_analysis()) == 0.8
+
+def test_broken_edit_keeps_the_previous_table(clo_file):
+    engine = CloEngine(str(clo_file), check_interval=0)
+    clo_file.write_text("base_clo: -1\nclo_values: {}\n")
+    os.utime(clo_file, (1, 1))
+    assert engine.score(make_analysis()) == 0.6
+
+def test_malformed_table_is_rejected_on_load(clo_file):
+    clo_file.write_text("clo_values:\n  jeans: lots\n")
+    with pytest.raises(ValueError):
+        CloEngine(str(clo_file))
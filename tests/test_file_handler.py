@@ -0,0 +1,52 @@
+import asyncio
+import io
+import os
+import pytest
+from fastapi import UploadFile
+from app.utils import file_handler
+from app.utils.file_handler import (
+    UploadTooLargeError, file_sha256, image_suffix, read_upload_bytes, remove_temp_image, save_temp_image,
+)
+
+def upload(data: bytes, size=None) -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), size=size, filename="photo.jpg")
+
+def test_read_upload_bytes_returns_the_whole_upload(monkeypatch):
+    monkeypatch.setattr(file_handler, "UPLOAD_CHUNK_SIZE", 4)
+    assert asyncio.run(read_upload_bytes(upload(b"0123456789"), 10)) == b"0123456789"
+    assert asyncio.run(read_upload_bytes(upload(b""), 10)) == b""
+
+def test_read_upload_bytes_stops_at_the_limit(monkeypatch):
+    monkeypatch.setattr(file_handler, "UPLOAD_CHUNK_SIZE", 4)
+    with pytest.raises(UploadTooLargeError, match="9 byte limit"):
+        asyncio.run(read_upload_bytes(upload(b"0123456789"), 9))
+
+def test_read_upload_bytes_trusts_a_declared_size():
+    # Refused before reading anything
+    with pytest.raises(UploadTooLargeError):
+        asyncio.run(read_upload_bytes(upload(b"small", size=100), 10))
+
+@pytest.mark.parametrize("content_type, filename, suffix", [
+    ("image/png", "photo.jpg", ".png"),
+    ("application/octet-stream", "photo.WEBP", ".webp"),
+    (None, None, ".jpg"),
+])
+def test_image_suffix(content_type, filename, suffix):
+    assert image_suffix(content_type, filename) == suffix
+
+def test_temp_images_are_written_and_removed():
+    path = save_temp_image(b"image", ".png")
+    try:
+        assert path.endswith(".png")
+        with open(path, "rb") as f:
+            assert f.read() == b"image"
+    finally:
+        remove_temp_image(path)
+    assert not os.path.exists(path)
+    # Removing twice is harmless
+    remove_temp_image(path)
+
+def test_file_sha256(tmp_path):
+    path = tmp_path / "image.jpg"
+    path.write_bytes(b"abc")
+    assert file_sha256(str(path)) == "ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad"
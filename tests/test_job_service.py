@@ -0,0 +1,156 @@
+import asyncio
+import socket
+import time
+import pytest
+from app.core.settings import settings
+from app.services import job_service
+from app.services.job_service import JobStore, JobWorkerPool, check_webhook_url
+from conftest import make_analysis
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "jobs_max_attempts", 2)
+    monkeypatch.setattr(settings, "jobs_lease_seconds", 60.0)
+    monkeypatch.setattr(settings, "jobs_retry_backoff", 5.0)
+    return JobStore(str(tmp_path / "jobs.db"))
+
+def expire_lease(store, job_id):
+    store._db.execute("UPDATE jobs SET lease_until = ? WHERE id = ?", (time.time() - 1, job_id))
+
+def test_claim_takes_the_highest_priority_job_once(store):
+    low = store.submit(b"a", "m")
+    high = store.submit(b"b", "m", priority=5)
+    assert store.claim()["id"] == high
+    assert store.claim()["id"] == low
+    assert store.claim() is None
+    assert store.get(high).status == "running"
+
+def test_claim_takes_a_job_again_after_its_lease_expires(store):
+    job_id = store.submit(b"a", "m")
+    assert store.claim()["attempts"] == 1
+    assert store.claim() is None
+    expire_lease(store, job_id)
+    job = store.claim()
+    assert job["id"] == job_id
+    assert job["attempts"] == 2
+
+def test_failed_attempts_are_retried_with_exponential_backoff(store, monkeypatch):
+    async def broken(*args):
+        raise RuntimeError("model crashed")
+    monkeypatch.setattr(job_service, "analyze_cached", broken)
+    pool = JobWorkerPool(store, workers=1)
+    job_id = store.submit(b"a", "m")
+
+    before = time.time()
+    asyncio.run(pool._run(store.claim()))
+    row = store._db.execute("SELECT status, next_run_at FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    assert row["status"] == "queued"
+    assert before + 5.0 <= row["next_run_at"] <= time.time() + 5.0
+    assert store.claim() is None
+
+    store._db.execute("UPDATE jobs SET next_run_at = 0 WHERE id = ?", (job_id,))
+    asyncio.run(pool._run(store.claim()))
+    status = store.get(job_id)
+    assert status.status == "failed"
+    assert status.error == "model crashed"
+    assert status.attempts == 2
+
+def test_fail_abandoned_fails_jobs_that_died_on_their_last_attempt(store):
+    job_id = store.submit(b"a", "m", webhook_url="https://example.com/hook")
+    for _ in range(settings.jobs_max_attempts):
+        store.claim()
+        expire_lease(store, job_id)
+    assert store.claim() is None
+
+    abandoned = store.fail_abandoned()
+    assert [row["id"] for row in abandoned] == [job_id]
+    status = store.get(job_id)
+    assert status.status == "failed"
+    assert status.webhook_status == "pending"
+    assert store.fail_abandoned() == []
+
+def test_final_states_leave_the_webhook_pending_until_delivered(store):
+    done = store.submit(b"a", "m", webhook_url="https://example.com/hook")
+    quiet = store.submit(b"b", "m")
+    store.claim()
+    store.claim()
+    store.complete(done, make_analysis())
+    store.complete(quiet, make_analysis())
+    assert store.get(quiet).webhook_status is None
+    assert store.pending_webhooks() == [{"id": done, "webhook_url": "https://example.com/hook"}]
+
+    store.set_webhook_status(done, "delivered")
+    assert store.pending_webhooks() == []
+
+def test_start_resumes_pending_webhooks(store, monkeypatch):
+    job_id = store.submit(b"a", "m", webhook_url="https://example.com/hook")
+    store.claim()
+    store.complete(job_id, make_analysis())
+    delivered = []
+
+    async def main():
+        done = asyncio.Event()
+
+        async def deliver(self, job_id, url):
+            delivered.append((job_id, url))
+            done.set()
+
+        monkeypatch.setattr(JobWorkerPool, "_deliver", deliver)
+        pool = JobWorkerPool(store, workers=1)
+        pool.start()
+        await asyncio.wait_for(done.wait(), timeout=5)
+        await pool.stop()
+
+    asyncio.run(main())
+    assert delivered == [(job_id, "https://example.com/hook")]
+
+def test_worker_survives_store_errors(store, monkeypatch):
+    monkeypatch.setattr(settings, "jobs_poll_interval", 0.01)
+    claims = 0
+    claimed = None
+
+    def claim():
+        nonlocal claims
+        claims += 1
+        if claims == 1:
+            raise RuntimeError("database is locked")
+        return None
+
+    async def main():
+        nonlocal claimed
+        pool = JobWorkerPool(store, workers=1)
+        monkeypatch.setattr(store, "claim", claim)
+        pool.start()
+        while claims < 3:
+            await asyncio.sleep(0.01)
+        claimed = [task.done() for task in pool._tasks]
+        await pool.stop()
+
+    asyncio.run(main())
+    assert claimed == [False]
+
+@pytest.mark.parametrize("url", [
+    "ftp://example.com/hook",
+    "file:///etc/passwd",
+    "http://127.0.0.1/hook",
+    "http://localhost:8080/hook",
+    "http://10.0.0.5/hook",
+    "http://192.168.1.1/hook",
+    "http://169.254.169.254/latest/meta-data",
+    "http://[::1]/hook",
+])
+def test_check_webhook_url_rejects_internal_targets(url):
+    with pytest.raises(ValueError):
+        check_webhook_url(url)
+
+def test_check_webhook_url_accepts_public_hosts(monkeypatch):
+    monkeypatch.setattr(socket, "getaddrinfo",
+                        lambda host, port, **kwargs: [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("93.184.216.34", port))])
+    check_webhook_url("https://example.com/hook")
+
+def test_check_webhook_url_honours_the_allowed_hosts(monkeypatch):
+    monkeypatch.setattr(settings, "jobs_webhook_allowed_hosts", ["hooks.internal"])
+    monkeypatch.setattr(settings, "jobs_webhook_allow_private", True)
+    check_webhook_url("http://hooks.internal/job")
+    with pytest.raises(ValueError):
+        check_webhook_url("http://other.internal/job")
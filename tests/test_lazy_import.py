@@ -0,0 +1,43 @@
+import json
+import subprocess
+import sys
+import pytest
+from app.core.settings import settings
+from app.services import detection_service
+from app.utils import lazy_import
+from app.utils.lazy_import import MissingDependencyError, import_optional
+from benchmarks.bench_startup import LAZY_MODULES, REPO_ROOT, parse_importtime
+
+def test_import_optional_returns_installed_modules():
+    assert import_optional("json", "requirements/api.txt") is json
+
+def test_import_optional_names_the_requirements_file():
+    with pytest.raises(MissingDependencyError, match="install requirements/vision.txt"):
+        import_optional("no_such_module_here", "requirements/vision.txt")
+
+def test_person_cropping_fails_fast_without_opencv(monkeypatch):
+    def missing(name, requirements):
+        raise MissingDependencyError(f"{name} is not installed; install {requirements}")
+
+    monkeypatch.setattr(lazy_import, "import_optional", missing)
+    monkeypatch.setattr(settings, "person_crop_enabled", False)
+    detection_service.check_person_detection()
+    monkeypatch.setattr(settings, "person_crop_enabled", True)
+    with pytest.raises(MissingDependencyError, match="cv2"):
+        detection_service.check_person_detection()
+
+def test_importing_the_app_leaves_lazy_modules_unloaded():
+    probe = "import json, sys; import app.main; print(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run([sys.executable, "-c", probe], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    modules = set(json.loads(result.stdout.strip().splitlines()[-1]))
+    assert not modules & set(LAZY_MODULES)
+
+def test_parse_importtime_sums_self_time_per_package():
+    stderr = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       120 |        120 |   numpy.core",
+        "import time:       380 |        500 | numpy",
+        "import time:      1000 |       1000 | fastapi",
+        "unrelated line",
+    ])
+    assert parse_importtime(stderr) == {"numpy": 0.5, "fastapi": 1.0}
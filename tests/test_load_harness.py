@@ -0,0 +1,58 @@
+import json
+import random
+from fastapi.testclient import TestClient
+from app.schemas.clothing import ClothingAnalysis
+from benchmarks.fake_ollama import create_app, fake_analysis, parse_args
+from benchmarks.load_test import lag_summary, percentile, previous_run
+
+def test_fake_answers_always_validate():
+    rng = random.Random(0)
+    for _ in range(200):
+        ClothingAnalysis(**fake_analysis(rng))
+
+def test_fake_ollama_answers_chats_like_ollama():
+    args = parse_args(["--delay", "0", "--models", "llava:7b"])
+    with TestClient(create_app(args)) as client:
+        assert [model["name"] for model in client.get("/api/tags").json()["models"]] == ["llava:7b"]
+        assert client.get("/api/ps").json()["models"] == []
+
+        body = client.post("/api/chat", json={"model": "llava:7b", "stream": False, "messages": []}).json()
+        assert body["done"]
+        assert body["eval_count"] > 0
+        ClothingAnalysis.model_validate_json(body["message"]["content"])
+        assert [model["name"] for model in client.get("/api/ps").json()["models"]] == ["llava:7b"]
+
+def test_fake_ollama_streams_the_answer_in_chunks():
+    args = parse_args(["--delay", "0"])
+    with TestClient(create_app(args)) as client:
+        response = client.post("/api/chat", json={"model": "gemma3:4b", "messages": []})
+        chunks = [json.loads(line) for line in response.text.splitlines()]
+    assert len(chunks) > 2
+    assert [chunk["done"] for chunk in chunks] == [False] * (len(chunks) - 1) + [True]
+    ClothingAnalysis.model_validate_json("".join(chunk["message"]["content"] for chunk in chunks))
+
+def test_percentile_is_nearest_rank():
+    values = [float(v) for v in range(1, 11)]
+    assert percentile(values, 50) == 5.0
+    assert percentile(values, 95) == 10.0
+    assert percentile(values, 0) == 1.0
+    assert percentile([3.0], 99) == 3.0
+
+def test_lag_summary_between_two_scrapes():
+    before = ({0.001: 10.0, 0.01: 10.0, 0.1: 10.0}, 10.0, 0.005)
+    # 100 new samples: 98 under 1 ms, 2 more under 100 ms
+    after = ({0.001: 108.0, 0.01: 108.0, 0.1: 110.0}, 110.0, 0.105)
+    assert lag_summary(before, after) == {"mean": 1.0, "p99": 100.0}
+    assert lag_summary(before, before) == {"mean": None, "p99": None}
+
+def test_previous_run_matches_the_configuration(tmp_path):
+    path = tmp_path / "results.jsonl"
+    runs = [
+        {"config": {"delay": 0.5}, "timestamp": "1"},
+        {"config": {"delay": 1.0}, "timestamp": "2"},
+        {"config": {"delay": 0.5}, "timestamp": "3"},
+    ]
+    path.write_text("\n".join(json.dumps(run) for run in runs) + "\nnot json\n")
+    assert previous_run(str(path), {"delay": 0.5})["timestamp"] == "3"
+    assert previous_run(str(path), {"delay": 2.0}) is None
+    assert previous_run(str(tmp_path / "missing.jsonl"), {}) is None
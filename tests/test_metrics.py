@@ -0,0 +1,66 @@
+import asyncio
+import json
+from app.core.settings import settings
+from app.services import analysis_service, ollama_service
+from app.services.analysis_service import analyze_cached
+from app.services.metrics import server_timing_header, start_request_timings, timed
+from app.services.ollama_service import analyze_image_stream
+from app.services.scheduler import ModelScheduler
+from conftest import SAMPLE_ANSWER, make_analysis
+
+def test_server_timing_header_lists_stages_in_milliseconds():
+    assert server_timing_header({"upload_read": 0.0012, "inference": 1.5}) == "upload_read;dur=1.2, inference;dur=1500.0"
+
+def test_coalesced_callers_get_the_timings_of_the_shared_call(monkeypatch):
+    monkeypatch.setattr(settings, "cache_enabled", False)
+    monkeypatch.setattr(settings, "preprocess_enabled", False)
+    calls = 0
+
+    async def analyze_image_async(image, model):
+        nonlocal calls
+        calls += 1
+        with timed("inference", model):
+            await asyncio.sleep(0.05)
+        return make_analysis()
+
+    monkeypatch.setattr(analysis_service, "analyze_image_async", analyze_image_async)
+
+    async def request():
+        timings = start_request_timings()
+        await analyze_cached(b"image", "digest", "m")
+        return timings
+
+    async def main():
+        return await asyncio.gather(request(), request(), request())
+
+    results = asyncio.run(main())
+    assert calls == 1
+    for timings in results:
+        assert timings["inference"] >= 0.05
+    assert len({timings["inference"] for timings in results}) == 1
+
+class StreamingPool:
+    """Streams the sample answer in a few chunks, each available at once."""
+
+    async def chat_stream(self, model: str, **kwargs):
+        text = json.dumps(SAMPLE_ANSWER)
+        pieces = [text[i:i + 40] for i in range(0, len(text), 40)]
+        for i, piece in enumerate(pieces):
+            yield {"message": {"content": piece}, "done": i == len(pieces) - 1}
+
+def test_stream_inference_leaves_out_time_spent_waiting_on_the_client(monkeypatch):
+    monkeypatch.setattr(ollama_service, "get_backend_pool", lambda: StreamingPool())
+    monkeypatch.setattr(ollama_service, "_scheduler", ModelScheduler(1, settings.scheduler_max_wait))
+
+    async def main():
+        timings = start_request_timings()
+        events = 0
+        async for event, data in analyze_image_stream(b"image", "m"):
+            events += 1
+            # A slow client reading the stream
+            await asyncio.sleep(0.02)
+        return timings, events
+
+    timings, events = asyncio.run(main())
+    client_wait = 0.02 * events
+    assert timings["inference"] < client_wait / 2
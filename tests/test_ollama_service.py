@@ -0,0 +1,84 @@
+import asyncio
+from typing import Optional
+import pytest
+from app.core.settings import settings
+from app.services import ollama_service
+from app.services.ollama_service import InferenceQueueFullError, analyze_image_async
+from app.services.scheduler import ModelScheduler
+
+class FakePool:
+    """Stands in for the BackendPool: answers every chat after a fixed delay, or once opened."""
+
+    def __init__(self, answer: str, delay: float, capacity: int):
+        self.answer = answer
+        self.delay = delay
+        self.capacity = capacity
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        # When set, chats wait for it instead of sleeping
+        self.gate: Optional[asyncio.Event] = None
+
+    async def chat(self, model: str, **kwargs):
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            if self.gate is not None:
+                await self.gate.wait()
+            else:
+                await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return {"message": {"content": self.answer}}
+
+@pytest.fixture
+def fake_pool(monkeypatch, sample_answer):
+    def install(delay: float = 0.2, capacity: int = 2) -> FakePool:
+        pool = FakePool(sample_answer, delay, capacity)
+        monkeypatch.setattr(ollama_service, "get_backend_pool", lambda: pool)
+        monkeypatch.setattr(ollama_service, "_scheduler", ModelScheduler(capacity, settings.scheduler_max_wait))
+        return pool
+    return install
+
+def test_slow_calls_do_not_block_the_event_loop(fake_pool):
+    pool = fake_pool(capacity=2)
+
+    async def main():
+        pool.gate = asyncio.Event()
+        calls = asyncio.gather(analyze_image_async(b"image", "m"), analyze_image_async(b"image", "m"))
+        # This loop only runs if the pending calls leave the event loop free
+        while pool.active < 2:
+            await asyncio.sleep(0)
+        pool.gate.set()
+        return await calls
+
+    results = asyncio.run(asyncio.wait_for(main(), timeout=5))
+    # Both calls were in flight at once
+    assert pool.peak == 2
+    assert all(result.clothing_type == ["t-shirt", "jeans"] for result in results)
+
+def test_clo_value_is_calculated_not_taken_from_the_model(fake_pool):
+    fake_pool(delay=0)
+    analysis = asyncio.run(analyze_image_async(b"image", "m"))
+    # base 0.16 + t-shirt 0.19 + jeans 0.15
+    assert analysis.clo_insulation == 0.5
+    assert analysis.clo_insulation_text.startswith("CLO value of 0.5 provides")
+
+def test_calls_beyond_capacity_time_out_in_the_queue(fake_pool, monkeypatch):
+    pool = fake_pool(capacity=1)
+    monkeypatch.setattr(settings, "inference_queue_timeout", 0.05)
+
+    async def main():
+        pool.gate = asyncio.Event()
+        first = asyncio.ensure_future(analyze_image_async(b"image", "m"))
+        while pool.active < 1:
+            await asyncio.sleep(0)
+        with pytest.raises(InferenceQueueFullError):
+            await analyze_image_async(b"image", "m")
+        pool.gate.set()
+        return await first
+
+    assert asyncio.run(asyncio.wait_for(main(), timeout=5)).clothing_type == ["t-shirt", "jeans"]
+    assert pool.calls == 1
+    assert pool.peak == 1
@@ -0,0 +1,65 @@
+import json
+import random
+import pytest
+from app.utils.partial_json import PartialObjectParser
+from conftest import SAMPLE_ANSWER
+
+DOCUMENT = {
+    "description": "Says \"hi\", wears {braces} and [brackets], a comma, and a colon: here.",
+    "clothing_type": ["t-shirt", "jeans"],
+    "nested": {"a": [1, {"b": "}"}], "c": None},
+    "count": -12.5e1,
+    "glasses": False,
+    "headwear": True,
+    "nothing": None,
+    "unicode": "caf\u00e9 \\ end",
+}
+
+def feed_in_chunks(text: str, sizes) -> list:
+    parser = PartialObjectParser()
+    fields = []
+    position = 0
+    for size in sizes:
+        fields.extend(parser.feed(text[position:position + size]))
+        position += size
+    fields.extend(parser.feed(text[position:]))
+    return fields
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_every_field_is_reported_once_with_its_value(indent):
+    text = json.dumps(DOCUMENT, indent=indent)
+    assert feed_in_chunks(text, []) == list(DOCUMENT.items())
+
+@pytest.mark.parametrize("seed", range(20))
+def test_chunk_boundaries_do_not_matter(seed):
+    text = json.dumps(DOCUMENT)
+    rng = random.Random(seed)
+    sizes = [rng.randint(1, 7) for _ in range(len(text))]
+    assert feed_in_chunks(text, sizes) == list(DOCUMENT.items())
+
+def test_one_character_at_a_time():
+    text = json.dumps(SAMPLE_ANSWER, indent=1)
+    assert feed_in_chunks(text, [1] * len(text)) == list(SAMPLE_ANSWER.items())
+
+def test_fields_complete_as_soon_as_their_value_closes():
+    parser = PartialObjectParser()
+    assert parser.feed('{"clothing_type": ["coat", "jea') == []
+    assert parser.feed('ns"], "glas') == [("clothing_type", ["coat", "jeans"])]
+    # A number or literal is only complete once a delimiter follows it
+    assert parser.feed('ses": true') == []
+    assert parser.feed(', "clo_insulation": 1.2') == [("glasses", True)]
+    assert parser.feed('5}') == [("clo_insulation", 1.25)]
+
+def test_escaped_quote_split_across_chunks():
+    parser = PartialObjectParser()
+    assert parser.feed('{"description": "a \\') == []
+    assert parser.feed('"quoted\\" word", "color": "red"}') == [
+        ("description", 'a "quoted" word'),
+        ("color", "red"),
+    ]
+
+def test_truncated_stream_reports_only_complete_fields():
+    text = json.dumps(SAMPLE_ANSWER)
+    cut = text.index('"sleeve_length"') + len('"sleeve_length": "sh')
+    fields = feed_in_chunks(text[:cut], [5] * (cut // 5))
+    assert fields == [("description", SAMPLE_ANSWER["description"]), ("clothing_type", SAMPLE_ANSWER["clothing_type"])]
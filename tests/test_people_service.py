@@ -0,0 +1,59 @@
+import io
+import pytest
+from app.core.settings import settings
+from app.services import people_service
+from app.services.detection_service import pad_box
+from app.services.people_service import ImageDecodeError, crop_people
+
+Image = pytest.importorskip("PIL.Image")
+
+def encode(image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def decoded_size(data: bytes):
+    return Image.open(io.BytesIO(data)).size
+
+@pytest.fixture
+def detections(monkeypatch):
+    boxes = []
+    monkeypatch.setattr(people_service, "detect_people", lambda rgb: list(boxes))
+    monkeypatch.setattr(settings, "person_crop_padding", 0.1)
+    return boxes
+
+@pytest.fixture
+def frame() -> bytes:
+    return encode(Image.new("RGB", (400, 300), "white"))
+
+def test_pad_box_grows_the_box_on_every_side():
+    assert pad_box((100, 100, 50, 100), 0.1, 400, 300) == (95, 90, 60, 120)
+
+def test_pad_box_clamps_to_the_image():
+    assert pad_box((0, 10, 100, 280), 0.2, 400, 300) == (0, 0, 120, 300)
+    assert pad_box((350, 250, 50, 50), 0.5, 400, 300) == (325, 225, 75, 75)
+
+def test_crop_people_cuts_one_padded_crop_per_person(frame, detections):
+    detections.extend([(100, 50, 100, 200), (380, 0, 20, 40)])
+    size, crops = crop_people(frame, "llama3.2-vision:11b")
+    assert size == (400, 300)
+    assert [box for box, _ in crops] == [(90, 30, 120, 240), (378, 0, 22, 44)]
+    assert [decoded_size(crop) for _, crop in crops] == [(120, 240), (22, 44)]
+
+def test_crop_people_stops_at_the_per_frame_limit(frame, detections, monkeypatch):
+    monkeypatch.setattr(settings, "people_max_per_frame", 1)
+    detections.extend([(100, 50, 100, 200), (10, 10, 20, 40)])
+    _, crops = crop_people(frame, "llama3.2-vision:11b")
+    assert [box for box, _ in crops] == [(90, 30, 120, 240)]
+
+def test_crop_people_without_detections_returns_the_whole_frame(frame, detections):
+    size, crops = crop_people(frame, "llama3.2-vision:11b")
+    assert size == (400, 300)
+    assert len(crops) == 1
+    box, crop = crops[0]
+    assert box is None
+    assert decoded_size(crop) == (400, 300)
+
+def test_crop_people_rejects_undecodable_images(detections):
+    with pytest.raises(ImageDecodeError):
+        crop_people(b"not an image", "llama3.2-vision:11b")
@@ -0,0 +1,92 @@
+import io
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core.settings import settings
+from app.routes import analyze
+from app.services.phash_service import PerceptualHashIndex, hamming_distances, perceptual_hash
+from conftest import make_analysis
+
+Image = pytest.importorskip("PIL.Image")
+
+def encode(image, **options) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, **options)
+    return buffer.getvalue()
+
+@pytest.fixture
+def photo():
+    # Smooth structure the low DCT frequencies can pick up, plus noise
+    rng = np.random.RandomState(0)
+    y, x = np.mgrid[0:480, 0:640]
+    pixels = np.stack([x / 640 * 255, y / 480 * 255, (x + y) % 256], axis=-1)
+    pixels += rng.normal(0, 8, pixels.shape)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+def distance(a: int, b: int) -> int:
+    return int(hamming_distances(np.array([a], dtype=np.uint64), np.array([b], dtype=np.uint64))[0, 0])
+
+def test_hamming_distances_count_differing_bits():
+    hashes = np.array([0, 0xFF, 2 ** 64 - 1], dtype=np.uint64)
+    queries = np.array([0, 1], dtype=np.uint64)
+    assert hamming_distances(hashes, queries).tolist() == [[0, 8, 64], [1, 7, 63]]
+
+def test_reencoded_and_resized_copies_stay_close(photo):
+    original = perceptual_hash(encode(photo, format="PNG"))
+    assert distance(original, perceptual_hash(encode(photo, format="JPEG", quality=60))) <= 4
+    assert distance(original, perceptual_hash(encode(photo.resize((320, 240)), format="JPEG"))) <= 4
+
+def test_different_images_are_far_apart(photo):
+    flipped = photo.transpose(Image.FLIP_LEFT_RIGHT).transpose(Image.FLIP_TOP_BOTTOM)
+    assert distance(perceptual_hash(encode(photo, format="PNG")), perceptual_hash(encode(flipped, format="PNG"))) > 10
+
+def test_undecodable_bytes_raise_oserror():
+    with pytest.raises(OSError):
+        perceptual_hash(b"not an image")
+
+def test_index_finds_the_nearest_entry_within_distance():
+    index = PerceptualHashIndex(max_entries=10)
+    index.add(0b1111, "scope", make_analysis(color="red"))
+    index.add(0b0000, "scope", make_analysis(color="green"))
+    distance_found, analysis = index.query(0b0001, "scope", max_distance=2)
+    assert (distance_found, analysis.color) == (1, "green")
+    assert index.query(0b0001, "scope", max_distance=0) is None
+    assert index.stats()["hits"] == 1 and index.stats()["misses"] == 1
+
+def test_index_matches_only_within_the_scope():
+    index = PerceptualHashIndex(max_entries=10)
+    index.add(42, "model-a", make_analysis())
+    assert index.query(42, "model-b", max_distance=4) is None
+    assert index.query(42, "model-a", max_distance=4) is not None
+
+def test_full_index_drops_the_oldest_entries():
+    index = PerceptualHashIndex(max_entries=20)
+    for value in range(25):
+        index.add(value << 8, "scope", make_analysis(color=str(value)))
+    assert len(index) <= 20
+    assert index.query(0, "scope", max_distance=0) is None
+    assert index.query(24 << 8, "scope", max_distance=0)[1].color == "24"
+
+def test_index_round_trips_through_its_file(tmp_path):
+    path = str(tmp_path / "index.npz")
+    index = PerceptualHashIndex(max_entries=10, path=path)
+    index.add(7, "scope", make_analysis(color="teal"))
+    index.save()
+    reloaded = PerceptualHashIndex(max_entries=10, path=path)
+    assert len(reloaded) == 1
+    assert reloaded.query(7, "scope", max_distance=0)[1].color == "teal"
+    reloaded.add(8, "scope", make_analysis())
+    assert len(reloaded) == 2
+
+def test_near_duplicates_route_checks_uploads_before_reading(monkeypatch):
+    app = FastAPI()
+    app.include_router(analyze.router)
+    client = TestClient(app)
+    monkeypatch.setattr(settings, "batch_max_items", 2)
+    monkeypatch.setattr(analyze, "perceptual_hash", lambda data: pytest.fail("upload was read"))
+
+    too_many = [("images", (f"{i}.jpg", b"x", "image/jpeg")) for i in range(3)]
+    assert client.post("/near-duplicates", files=too_many).status_code == 413
+    not_image = [("images", ("a.jpg", b"x", "image/jpeg")), ("images", ("b.txt", b"x", "text/plain"))]
+    assert client.post("/near-duplicates", files=not_image).status_code == 400
@@ -0,0 +1,73 @@
+import io
+import numpy as np
+import pytest
+from app.core.settings import settings
+from app.services import detection_service, preprocess_service
+from app.services.detection_service import find_crop_subject
+from app.services.preprocess_service import crop_to_person, preprocess_image, preprocess_stats
+
+Image = pytest.importorskip("PIL.Image")
+
+MODEL = "llama3.2-vision:11b"
+
+def encode(image, **options) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, **options)
+    return buffer.getvalue()
+
+def decoded_size(data: bytes):
+    return Image.open(io.BytesIO(data)).size
+
+@pytest.fixture
+def photo():
+    rng = np.random.RandomState(0)
+    return Image.fromarray(rng.randint(0, 255, (600, 800, 3), dtype=np.uint8))
+
+@pytest.fixture
+def subject(monkeypatch):
+    monkeypatch.setattr(settings, "person_crop_padding", 0.1)
+    found = {"box": None}
+    monkeypatch.setattr(preprocess_service, "find_crop_subject", lambda rgb: found["box"])
+    return found
+
+def test_crop_to_person_pads_the_largest_person(photo, subject):
+    subject["box"] = (300, 100, 200, 400)
+    cropped, box = crop_to_person(photo)
+    assert box == (280, 60, 240, 480)
+    assert cropped.size == (240, 480)
+
+def test_crop_to_person_keeps_the_image_without_a_subject(photo, subject):
+    cropped, box = crop_to_person(photo)
+    assert box is None
+    assert cropped is photo
+
+def test_preprocess_reports_the_crop_and_counts_it(photo, subject, monkeypatch):
+    monkeypatch.setattr(settings, "person_crop_enabled", True)
+    monkeypatch.setattr(preprocess_service, "preprocess_totals", dict.fromkeys(preprocess_service.preprocess_totals, 0))
+    subject["box"] = (300, 100, 200, 400)
+    output, report = preprocess_image(encode(photo, format="PNG"), MODEL)
+    assert report["crop_box"] == [280, 60, 240, 480]
+    assert decoded_size(output) == (240, 480)
+
+    subject["box"] = None
+    _, report = preprocess_image(encode(photo, format="PNG"), MODEL)
+    assert report["crop_box"] is None
+    stats = preprocess_stats()
+    assert (stats["images"], stats["person_crops"]) == (2, 1)
+
+def test_preprocess_without_cropping_downscales_to_the_profile(photo, monkeypatch):
+    monkeypatch.setattr(settings, "person_crop_enabled", False)
+    output, report = preprocess_image(encode(photo.resize((2400, 1800)), format="PNG"), MODEL)
+    assert "crop_box" not in report
+    assert decoded_size(output) == (1120, 840)
+    assert report["size_in"] == [2400, 1800]
+
+def test_close_ups_are_not_cropped(monkeypatch):
+    monkeypatch.setattr(detection_service, "_detection_image", lambda rgb: (rgb[..., 0], 1.0))
+    monkeypatch.setattr(detection_service, "detect_people", lambda rgb: [(10, 10, 50, 100)])
+    rgb = np.zeros((200, 200, 3), dtype=np.uint8)
+
+    monkeypatch.setattr(detection_service, "is_close_up", lambda gray: True)
+    assert find_crop_subject(rgb) is None
+    monkeypatch.setattr(detection_service, "is_close_up", lambda gray: False)
+    assert find_crop_subject(rgb) == (10, 10, 50, 100)
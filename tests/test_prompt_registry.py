@@ -0,0 +1,53 @@
+import json
+import pytest
+from app.core.settings import settings
+from app.schemas.clothing import ClothingAnalysis
+from app.services import prompt_registry
+from app.services.prompt_registry import PROMPT_TEMPLATES, SERVER_FIELDS, PromptTemplate, get_prompt, trim_schema
+from conftest import SAMPLE_ANSWER
+
+def test_trim_schema_removes_fields_without_touching_the_original():
+    schema = ClothingAnalysis.model_json_schema()
+    trimmed = trim_schema(schema, ["clo_insulation", "clo_insulation_text"])
+    assert "clo_insulation" not in trimmed["properties"]
+    assert "clo_insulation_text" not in trimmed.get("required", [])
+    assert "clothing_type" in trimmed["properties"]
+    assert "clo_insulation" in schema["properties"]
+
+def test_trimmed_template_parses_answers_without_the_server_fields():
+    template = PROMPT_TEMPLATES["v1-trimmed"]
+    assert set(SERVER_FIELDS).isdisjoint(template.schema["properties"])
+    answer = {key: value for key, value in SAMPLE_ANSWER.items() if key not in SERVER_FIELDS}
+    analysis = template.parse(json.dumps(answer))
+    assert analysis.clothing_type == ["t-shirt", "jeans"]
+    assert analysis.clo_insulation == 0.0
+    assert analysis.clo_insulation_text == ""
+
+def test_full_template_requires_every_field():
+    template = PROMPT_TEMPLATES["v1"]
+    assert template.parse(json.dumps(SAMPLE_ANSWER)).clo_insulation == 0.5
+    with pytest.raises(ValueError):
+        template.parse(json.dumps({"description": "no fields"}))
+
+def test_hash_changes_with_the_prompts_and_schema():
+    schema = ClothingAnalysis.model_json_schema()
+    base = PromptTemplate("v", "system", "user", schema, {})
+    assert PromptTemplate("v", "system", "user", schema, {}).hash == base.hash
+    assert PromptTemplate("v", "system!", "user", schema, {}).hash != base.hash
+    assert PromptTemplate("v", "system", "user?", schema, {}).hash != base.hash
+    assert PromptTemplate("v", "system", "user", trim_schema(schema, ["color"]), {}).hash != base.hash
+    assert PROMPT_TEMPLATES["v1"].hash != PROMPT_TEMPLATES["v1-trimmed"].hash
+
+def test_versions_are_looked_up_by_model_then_family(monkeypatch):
+    monkeypatch.setattr(prompt_registry, "_registry", {})
+    monkeypatch.setattr(settings, "prompt_version", "v1")
+    monkeypatch.setattr(settings, "model_prompt_versions", {"gemma3": "v1-trimmed", "gemma3:27b": "v1"})
+    assert get_prompt("gemma3:4b").version == "v1-trimmed"
+    assert get_prompt("gemma3:27b").version == "v1"
+    assert get_prompt("llava:7b").version == "v1"
+
+def test_unknown_versions_are_rejected(monkeypatch):
+    monkeypatch.setattr(prompt_registry, "_registry", {})
+    monkeypatch.setattr(settings, "model_prompt_versions", {"llava": "v9"})
+    with pytest.raises(ValueError, match="Unknown prompt version 'v9'"):
+        get_prompt("llava:7b")
@@ -0,0 +1,107 @@
+import asyncio
+from typing import Optional
+import pytest
+from app.services.scheduler import ModelScheduler
+
+async def request(scheduler: ModelScheduler, model: str, order: list, done: Optional[asyncio.Event] = None) -> None:
+    """Acquires a slot, records the grant and holds the slot until done is set."""
+    await scheduler.acquire(model, timeout=5)
+    order.append(model)
+    if done is not None:
+        await done.wait()
+    scheduler.release(model)
+
+async def settle() -> None:
+    """Lets every task that is ready run until it blocks again."""
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+def test_requests_for_the_loaded_model_are_served_first():
+    async def main():
+        scheduler = ModelScheduler(slots=1, max_wait=30)
+        order = []
+        await scheduler.acquire("a", timeout=1)
+        tasks = [asyncio.ensure_future(request(scheduler, model, order)) for model in ("b", "a", "b", "a")]
+        await settle()
+        scheduler.release("a")
+        await asyncio.gather(*tasks)
+        return order, scheduler.stats()
+
+    order, stats = asyncio.run(main())
+    # The queued "a" requests jump the older "b" ones; then "b" runs in one go
+    assert order == ["a", "a", "b", "b"]
+    assert stats["swaps"] == 1
+
+def test_other_model_waits_while_the_loaded_one_holds_slots():
+    async def main():
+        scheduler = ModelScheduler(slots=2, max_wait=30)
+        order = []
+        await scheduler.acquire("a", timeout=1)
+        other = asyncio.ensure_future(request(scheduler, "b", order))
+        await settle()
+        # A slot is free, but "a" is still loaded and running
+        assert order == []
+        same = asyncio.ensure_future(request(scheduler, "a", order))
+        await settle()
+        assert order == ["a"]
+        await same
+        scheduler.release("a")
+        await other
+        return order
+
+    assert asyncio.run(main()) == ["a", "b"]
+
+def test_waiting_model_is_forced_in_after_max_wait():
+    async def main():
+        scheduler = ModelScheduler(slots=2, max_wait=0.05)
+        order = []
+        done = asyncio.Event()
+        # "a" keeps a slot busy until "b" got its own
+        busy = asyncio.ensure_future(request(scheduler, "a", order, done))
+        await settle()
+        await scheduler.acquire("b", timeout=5)
+        order.append("b")
+        running = dict(scheduler.stats()["running"])
+        scheduler.release("b")
+        done.set()
+        await busy
+        return order, running, scheduler.stats()
+
+    order, running, stats = asyncio.run(main())
+    assert order == ["a", "b"]
+    assert running == {"a": 1, "b": 1}
+    assert stats["forced_swaps"] == 1
+
+def test_starved_model_preempts_a_busy_queue():
+    async def main():
+        scheduler = ModelScheduler(slots=1, max_wait=0.05)
+        order = []
+        await scheduler.acquire("a", timeout=1)
+        starved = asyncio.ensure_future(request(scheduler, "b", order))
+        await settle()
+        # A steady stream of "a" requests would otherwise keep "b" waiting
+        stream = [asyncio.ensure_future(request(scheduler, "a", order)) for _ in range(10)]
+        await settle()
+        # Only the age of "b"'s request matters, not how long this takes
+        await asyncio.sleep(scheduler.max_wait * 2)
+        scheduler.release("a")
+        await asyncio.gather(starved, *stream)
+        return order
+
+    order = asyncio.run(main())
+    assert order[0] == "b"
+    assert order.count("a") == 10
+
+def test_timed_out_request_leaves_the_queue():
+    async def main():
+        scheduler = ModelScheduler(slots=1, max_wait=30)
+        await scheduler.acquire("a", timeout=1)
+        with pytest.raises(asyncio.TimeoutError):
+            await scheduler.acquire("a", timeout=0.01)
+        stats = scheduler.stats()
+        scheduler.release("a")
+        return stats, scheduler.stats()
+
+    waiting, released = asyncio.run(main())
+    assert waiting["queue_depth"] == {}
+    assert released["free_slots"] == 1 and released["running"] == {}
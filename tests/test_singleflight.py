@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+from app.services.singleflight import SingleFlight
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("k", work) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["answer"] * 5
+    assert len(runs) == 1
+    assert flight.stats() == {"executed": 1, "collapsed": 4, "in_flight": 0}
+
+def test_errors_reach_every_caller_and_are_not_remembered():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("bad answer")
+
+    async def main():
+        results = await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+        retried = await flight.do("k", lambda: asyncio.sleep(0, result="ok"))
+        return results, retried
+
+    results, retried = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert retried == "ok"
+
+def test_cancelled_follower_does_not_cancel_the_shared_call():
+    flight = SingleFlight()
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do("k", lambda: asyncio.sleep(0.05, result="done")))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("k", lambda: asyncio.sleep(0.05, result="other")))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    assert asyncio.run(main()) == "done"
+
+def test_last_waiter_cancelling_stops_the_work_and_frees_the_key():
+    flight = SingleFlight()
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            # Cleanup takes a while; the key must be free meanwhile
+            await asyncio.sleep(0.05)
+            cancelled.append(True)
+            raise
+        return "stale"
+
+    async def main():
+        waiter = asyncio.ensure_future(flight.do("k", slow))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        assert flight.stats()["in_flight"] == 0
+        fresh = await flight.do("k", lambda: asyncio.sleep(0, result="fresh"))
+        await asyncio.sleep(0.1)
+        return fresh
+
+    assert asyncio.run(main()) == "fresh"
+    assert cancelled == [True]
+    assert flight.stats()["executed"] == 2
@@ -0,0 +1,93 @@
+import asyncio
+import numpy as np
+import pytest
+from app.services import video_service
+from app.services.video_service import analyze_video, frame_difference, frame_signature, iter_sampled_frames
+from conftest import make_analysis
+
+cv2 = pytest.importorskip("cv2")
+
+class FakeCapture:
+    """Plays frames from a list at a fixed frame rate, like a video file."""
+
+    def __init__(self, frames, fps: float = 10.0):
+        self.frames = frames
+        self.fps = fps
+        self.index = -1
+        self.retrieved = []
+        self.released = False
+
+    def grab(self) -> bool:
+        self.index += 1
+        return self.index < len(self.frames)
+
+    def retrieve(self):
+        self.retrieved.append(self.index)
+        return True, self.frames[self.index]
+
+    def get(self, prop) -> float:
+        assert prop == cv2.CAP_PROP_POS_MSEC
+        return self.index / self.fps * 1000
+
+    def release(self) -> None:
+        self.released = True
+
+def solid(value: int) -> np.ndarray:
+    return np.full((48, 64, 3), value, dtype=np.uint8)
+
+def test_files_are_sampled_on_their_own_timeline():
+    capture = FakeCapture([solid(0)] * 25, fps=10)
+    frames = list(iter_sampled_frames(capture, live=False, interval=1.0, max_frames=10))
+    assert [timestamp for timestamp, _ in frames] == [0.0, 1.0, 2.0]
+    # Skipped frames are grabbed but never decoded
+    assert capture.retrieved == [0, 10, 20]
+    assert capture.released
+
+def test_sampling_stops_at_max_frames():
+    capture = FakeCapture([solid(0)] * 25, fps=10)
+    frames = list(iter_sampled_frames(capture, live=False, interval=0.5, max_frames=2))
+    assert [timestamp for timestamp, _ in frames] == [0.0, 0.5]
+    assert capture.released
+
+def test_frame_difference_of_signatures():
+    assert frame_difference(frame_signature(solid(0)), frame_signature(solid(0))) == 0.0
+    assert frame_difference(frame_signature(solid(0)), frame_signature(solid(255))) == pytest.approx(1.0)
+
+def test_only_changed_frames_are_analyzed_and_clo_is_smoothed(monkeypatch):
+    answers = iter([make_analysis(clo_insulation=1.0), make_analysis(clo_insulation=2.0)])
+
+    async def analyze_cached(image_bytes, image_digest, model, content_type, source_id):
+        return next(answers), {"cache": "MISS"}
+
+    monkeypatch.setattr(video_service, "analyze_cached", analyze_cached)
+    capture = FakeCapture([solid(0), solid(2), solid(0), solid(255)], fps=1)
+
+    async def main():
+        return [point async for point in analyze_video(capture, False, "m", 1.0, 0.1, 0.5, 10)]
+
+    *points, summary = asyncio.run(main())
+    assert [point["analyzed"] for point in points] == [True, False, False, True]
+    assert [point["clo"] for point in points] == [1.0, 1.0, 1.0, 2.0]
+    assert [point["clo_smoothed"] for point in points] == [1.0, 1.0, 1.0, 1.5]
+    assert summary == {"type": "summary", "frames_sampled": 4, "frames_analyzed": 2, "clo_smoothed": 1.5}
+
+def test_failed_frames_are_reported_and_retried_on_the_next_sample(monkeypatch):
+    calls = 0
+
+    async def analyze_cached(*args):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise RuntimeError("model crashed")
+        return make_analysis(clo_insulation=0.8), {"cache": "MISS"}
+
+    monkeypatch.setattr(video_service, "analyze_cached", analyze_cached)
+    capture = FakeCapture([solid(0), solid(0)], fps=1)
+
+    async def main():
+        return [point async for point in analyze_video(capture, False, "m", 1.0, 0.1, 1.0, 10)]
+
+    first, second, summary = asyncio.run(main())
+    assert first == {"type": "point", "timestamp": 0.0, "analyzed": False, "error": "model crashed"}
+    assert second["analyzed"] and second["clo"] == 0.8
+    assert summary["frames_analyzed"] == 1
@@ -0,0 +1,95 @@
+import asyncio
+import time
+from app.core.settings import OllamaBackend, settings
+from app.services.backend_pool import BackendPool
+from app.services.warmup_service import WarmupManager
+
+class NotFound(Exception):
+    status_code = 404
+
+class FakeClient:
+    """Stands in for ollama.AsyncClient, loading the models it has installed."""
+
+    def __init__(self, installed):
+        self.installed = set(installed)
+        self.chats = []
+        self.generated = []
+
+    async def chat(self, model: str, **kwargs):
+        self.chats.append(model)
+        if model not in self.installed:
+            raise NotFound(f"model '{model}' not found")
+        return {"message": {"content": "gray"}}
+
+    async def generate(self, model: str, **kwargs):
+        self.generated.append(model)
+
+def make_manager(models, **installed) -> WarmupManager:
+    pool = BackendPool([OllamaBackend(host=host) for host in installed], timeout=5)
+    for backend in pool.backends:
+        backend.client = FakeClient(installed[backend.host])
+    manager = WarmupManager(pool, models)
+    manager._image = b"jpeg"
+    return manager
+
+def test_warm_all_loads_every_model_on_every_backend():
+    manager = make_manager(["llava:latest", "gemma3:4b"], a=["llava:latest", "gemma3:4b"], b=["llava:latest"])
+    assert asyncio.run(manager.warm_all())
+    assert manager.status == {
+        "llava:latest": {"a": "warm", "b": "warm"},
+        "gemma3:4b": {"a": "warm", "b": "not installed"},
+    }
+    a, b = manager.pool.backends
+    assert a.loaded_models == {"llava:latest", "gemma3:4b"}
+    # Already warm models are not loaded again
+    assert asyncio.run(manager.warm_all())
+    assert a.client.chats == ["llava:latest", "gemma3:4b"]
+
+def test_known_model_lists_skip_the_chat():
+    manager = make_manager(["llava:latest"], a=["llava:latest"])
+    backend = manager.pool.backends[0]
+    backend.available_models = {"gemma3:4b"}
+    assert not asyncio.run(manager.warm(backend, "llava:latest"))
+    assert manager.status["llava:latest"]["a"] == "not installed"
+    assert backend.client.chats == []
+
+def test_readiness_waits_for_installed_models_only(monkeypatch):
+    monkeypatch.setattr(settings, "warmup_max_attempts", 2)
+    monkeypatch.setattr(settings, "warmup_retry_interval", 0)
+    monkeypatch.setattr(settings, "keep_alive_interval", 3600)
+    manager = make_manager(["llava:latest", "missing:7b"], a=["llava:latest"], b=[])
+
+    async def main():
+        await manager.start()
+        try:
+            while not manager.warmed:
+                await asyncio.sleep(0.001)
+        finally:
+            await manager.stop()
+
+    asyncio.run(asyncio.wait_for(main(), timeout=5))
+    assert manager.ready
+    assert manager.missing == {"missing:7b"}
+    assert manager.stats()["missing_models"] == ["missing:7b"]
+    # Tried once per allowed attempt, then given up on
+    assert manager.pool.backends[0].client.chats.count("missing:7b") == 2
+
+def test_not_ready_without_a_healthy_backend():
+    manager = make_manager([], a=[])
+    manager.warmed = True
+    manager.pool.backends[0].healthy = False
+    assert not manager.ready
+
+def test_refresh_keeps_only_recently_used_models_loaded(monkeypatch):
+    monkeypatch.setattr(settings, "keep_alive_idle_timeout", 60)
+    manager = make_manager([], a=[], b=[])
+    a, b = manager.pool.backends
+    now = time.monotonic()
+    a.last_used = {"recent:7b": now - 10, "idle:7b": now - 600}
+    b.last_used = {"recent:7b": now}
+    b.healthy = False
+
+    asyncio.run(manager.refresh())
+    assert a.client.generated == ["recent:7b"]
+    assert b.client.generated == []
+    assert manager.refreshes == 1